@@ -1,45 +1,150 @@
+import json
 import os
-from flask import Flask, render_template, request, jsonify
+import secrets
+import threading
+import time
+from flask import Flask, Response, g, render_template, request, jsonify, stream_with_context
+
+import classifier as intent_classifier
+from history import make_store
+from intents import IntentMatcher, ResponseCache, normalize
 
 app = Flask(__name__)
 
+# Intent rules (keywords, priority, responses); see intents.py
+INTENTS_FILE = os.environ.get("INTENTS_FILE", os.path.join(os.path.dirname(__file__), "intents.json"))
+matcher = IntentMatcher.from_file(INTENTS_FILE)
+# intents.json is re-read when its mtime changes, checked at most this often
+RULES_CHECK_SECONDS = 2.0
+_rules_mtime = os.path.getmtime(INTENTS_FILE)
+_rules_checked = time.monotonic()
+_rules_lock = threading.Lock()
+
+# Normalized message -> intent; cleared whenever the rules are reloaded
+response_cache = ResponseCache(int(os.environ.get("RESPONSE_CACHE_SIZE", 4096)))
+
+# Optional fuzzy classifier (needs numpy); see classifier.py. When enabled it
+# answers first and the keyword rules handle messages scoring below the threshold.
+# The threshold defaults to one calibrated on typos of the keywords (about 0.18
+# for the shipped intents.json); INTENT_THRESHOLD overrides it.
+USE_CLASSIFIER = os.environ.get("INTENT_CLASSIFIER", "0") == "1"
+CLASSIFIER_THRESHOLD = float(os.environ["INTENT_THRESHOLD"]) if os.environ.get("INTENT_THRESHOLD") else None
+MAX_CLASSIFY_BATCH = 10000
+_classifier = None
+
+# Per-session chat history: at most HISTORY_CAP messages per session.
+# The sqlite backend is shared by all gunicorn workers; "memory" is per process.
+HISTORY_BACKEND = os.environ.get("HISTORY_BACKEND", "sqlite")
+HISTORY_DB = os.environ.get("HISTORY_DB", os.path.join(os.path.dirname(__file__), "chat_history.db"))
+HISTORY_CAP = int(os.environ.get("HISTORY_CAP", 200))
+MAX_SESSIONS = int(os.environ.get("MAX_SESSIONS", 10000))
+history = make_store(HISTORY_BACKEND, HISTORY_CAP, MAX_SESSIONS, HISTORY_DB)
+
+SESSION_COOKIE = "chat_id"
+
+# Server-sent event streams (/stream). Each open stream holds a worker thread,
+# so MAX_STREAMS per process must stay below gunicorn's --threads.
+MAX_STREAMS = int(os.environ.get("MAX_STREAMS", 16))
+HEARTBEAT_SECONDS = 15
+# Streams end after this long; EventSource reconnects with Last-Event-ID.
+STREAM_SECONDS = 300
+stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
+
+
+def get_classifier():
+    """Return the intent classifier, building it on first use (None without numpy)."""
+    global _classifier
+    if _classifier is None and intent_classifier.available():
+        _classifier = intent_classifier.IntentClassifier.from_matcher(matcher)
+    return _classifier
+
+
+def classifier_threshold(clf) -> float:
+    """Score a classifier prediction needs before it is used."""
+    return clf.threshold if CLASSIFIER_THRESHOLD is None else CLASSIFIER_THRESHOLD
+
+
+def reload_rules():
+    """Re-read intents.json; drops the classifier and the response cache."""
+    global matcher, _classifier, _rules_mtime
+    with _rules_lock:
+        _rules_mtime = os.path.getmtime(INTENTS_FILE)
+        matcher = IntentMatcher.from_file(INTENTS_FILE)
+        _classifier = None
+        response_cache.clear()
+
+
+def check_rules():
+    """Reload the rules if intents.json changed since they were loaded."""
+    global _rules_checked
+    now = time.monotonic()
+    if now - _rules_checked < RULES_CHECK_SECONDS:
+        return
+    _rules_checked = now
+    try:
+        if os.path.getmtime(INTENTS_FILE) != _rules_mtime:
+            reload_rules()
+    except (OSError, ValueError):
+        # keep serving the old rules until the file is fixed
+        app.logger.exception("Could not reload %s", INTENTS_FILE)
+
+
+def find_intent(key: str):
+    """Return the intent for a normalized message, or None for the fallback."""
+    generation = response_cache.generation
+    found, intent = response_cache.get(key)
+    if found:
+        return intent
 
-# In-memory chat history: list of (speaker, text) tuples
-chat_history = []
+    intent = None
+    clf = get_classifier() if USE_CLASSIFIER else None
+    if clf is not None:
+        best, score = clf.predict(key)
+        if best is not None and score >= classifier_threshold(clf):
+            intent = best
+    if intent is None:
+        intent = matcher.match(key)
+    response_cache.put(key, intent, generation)
+    return intent
 
 
 def get_response(message: str) -> str:
     if not message:
-        return "Please say something so I can help."
+        return matcher.empty
+    check_rules()
+    intent = find_intent(normalize(message))
+    if intent is None:
+        return matcher.fallback
+    return intent.respond(message)
 
-    text = message.lower()
 
-    # how are you
-    if "how are you" in text:
-        return "I'm good! How are you?"
+def session_id() -> str:
+    """Return the caller's chat id, issuing a new one if the cookie is missing."""
+    if "chat_id" not in g:
+        chat_id = request.cookies.get(SESSION_COOKIE, "")
+        g.new_chat = not chat_id or len(chat_id) > 64
+        g.chat_id = secrets.token_urlsafe(16) if g.new_chat else chat_id
+    return g.chat_id
 
-    # joke
-    if "joke" in text or "tell me a joke" in text:
-        return "A guy walks into a bar and orders a glass of water. Haha!"
 
-    # greetings
-    if any(g in text for g in ("hi", "hello", "hey")):
-        return "Hello! I am a simple chatbot. How can I help you today?"
+@app.after_request
+def set_session_cookie(response):
+    if g.get("new_chat"):
+        response.set_cookie(SESSION_COOKIE, g.chat_id, httponly=True, samesite="Lax")
+    return response
 
-    # weather
-    if "weather" in text:
-        return "I can't check live weather yet, but it's always a good day to learn Python!"
 
-    # help
-    if "help" in text or "commands" in text:
-        return "Try typing: hi, how are you, joke, weather, help, or bye."
+def cursor() -> int:
+    """Id of the last message the client already has (`after` parameter)."""
+    try:
+        return max(0, int(request.values.get("after", 0)))
+    except ValueError:
+        return 0
 
-    # goodbye
-    if any(w in text for w in ("bye", "goodbye", "see ya", "exit")):
-        return "Goodbye! Have a great day."
 
-    # fallback
-    return "Sorry, I don't understand that yet. Try 'help' for suggestions."
+def messages_after(after: int):
+    messages, last_id = history.since(session_id(), after, HISTORY_CAP)
+    return jsonify({"messages": messages, "lastId": last_id})
 
 
 @app.route("/", methods=["GET", "POST"])
@@ -51,23 +156,105 @@ def index():
         user_message = request.form.get("message", "").strip()
         # special fetch token: return existing history without recording or replying
         if user_message == "__fetch_history__":
-            return jsonify({"history": chat_history})
+            return messages_after(cursor())
 
         bot_reply = get_response(user_message)
         # store messages in history
-        chat_history.append(("user", user_message))
-        chat_history.append(("bot", bot_reply))
-        # return JSON response including full chat history
-        return jsonify({"history": chat_history})
+        history.append_many(session_id(), [("user", user_message), ("bot", bot_reply)])
+        # return only the messages the client has not seen yet
+        return messages_after(cursor())
 
     return render_template("index.html", user_message=user_message, bot_reply=bot_reply)
 
 
+@app.route("/history", methods=["GET"])
+def get_history():
+    """Return the messages after the `after` cursor for this session."""
+    return messages_after(cursor())
+
+
+@app.route("/stream", methods=["GET"])
+def stream():
+    """Push this session's new messages as server-sent events.
+
+    The starting cursor is the Last-Event-ID header sent by a reconnecting
+    EventSource, else the `after` parameter. A comment line is sent every
+    HEARTBEAT_SECONDS so proxies keep idle streams open.
+    """
+    if not stream_slots.acquire(blocking=False):
+        return jsonify({"error": "Too many open streams."}), 503, {"Retry-After": "5"}
+
+    try:
+        chat_id = session_id()
+        try:
+            after = max(0, int(request.headers.get("Last-Event-ID", "")))
+        except ValueError:
+            after = cursor()
+
+        def events(after):
+            yield "retry: 3000\n\n"
+            end = time.monotonic() + STREAM_SECONDS
+            while time.monotonic() < end:
+                messages, _ = history.wait(chat_id, after, HEARTBEAT_SECONDS, HISTORY_CAP)
+                if not messages:
+                    yield ": ping\n\n"
+                    continue
+                for message in messages:
+                    yield f"id: {message['id']}\ndata: {json.dumps(message)}\n\n"
+                after = messages[-1]["id"]
+
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        response = Response(stream_with_context(events(after)), mimetype="text/event-stream", headers=headers)
+    except BaseException:
+        # the slot is only released by call_on_close below
+        stream_slots.release()
+        raise
+    # runs when the stream ends or the client goes away, even before the first event
+    response.call_on_close(stream_slots.release)
+    return response
+
+
+@app.route("/classify_batch", methods=["POST"])
+def classify_batch():
+    """Classify a JSON list of messages (or {"messages": [...]}) in one call.
+
+    Meant for offline log analysis: nothing is recorded in the chat history.
+    Each result has the best intent, its score and whether it clears the
+    confidence threshold.
+    """
+    clf = get_classifier()
+    if clf is None:
+        return jsonify({"error": "Classifier unavailable: numpy is not installed."}), 501
+
+    payload = request.get_json(silent=True)
+    messages = payload.get("messages") if isinstance(payload, dict) else payload
+    if not isinstance(messages, list) or not all(isinstance(m, str) for m in messages):
+        return jsonify({"error": "Expected a list of message strings."}), 400
+    if len(messages) > MAX_CLASSIFY_BATCH:
+        return jsonify({"error": f"At most {MAX_CLASSIFY_BATCH} messages per batch."}), 413
+
+    threshold = classifier_threshold(clf)
+    results = []
+    for intent, score in clf.classify(messages):
+        results.append({
+            "intent": intent.name if intent is not None else None,
+            "score": round(score, 4),
+            "confident": intent is not None and score >= threshold,
+        })
+    return jsonify({"results": results, "threshold": round(threshold, 4)})
+
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    """Response cache counters for this worker process."""
+    return jsonify({"responseCache": response_cache.stats()})
+
+
 @app.route("/reset", methods=["GET", "POST"])
 def reset():
-    """Clear the in-memory chat history and return a success message."""
-    chat_history.clear()
-    return jsonify({"success": True, "message": "Chat history cleared."})
+    """Clear this session's chat history and return a success message."""
+    last_id = history.clear(session_id())
+    return jsonify({"success": True, "message": "Chat history cleared.", "lastId": last_id})
 
 
 if __name__ == "__main__":
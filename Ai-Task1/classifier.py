@@ -0,0 +1,137 @@
+"""Fuzzy intent classifier based on hashed character n-gram TF-IDF vectors.
+
+Every keyword and example of every intent is embedded as a TF-IDF weighted
+vector of character 3- to 5-grams hashed into a fixed number of buckets (so
+no vocabulary has to be stored). Classifying a batch of messages is then one
+matrix product between the message vectors and those of the training texts;
+the intent of the most similar text wins, and its cosine similarity is the
+confidence. (Scoring against one centroid per intent instead dilutes short
+keywords: "helo" scored 0.17 against the greeting centroid, 0.30 against
+"hello".)
+
+Character n-grams tolerate typos and word-order changes that the keyword
+rules in intents.py miss. `typo_threshold` calibrates the confidence cut-off
+on one-character typos of the keywords. The classifier needs NumPy;
+`available()` reports whether it can be used.
+"""
+
+import zlib
+
+try:
+    import numpy as np
+except ImportError:  # the classifier is optional
+    np = None
+
+from intents import normalize
+
+
+DIM = 2 ** 14
+NGRAM_RANGE = (3, 5)
+# messages embedded per matrix product, bounds memory for large batches
+CHUNK = 512
+# share of keyword typos that may score below `typo_threshold`
+TYPO_QUANTILE = 0.1
+
+
+def available() -> bool:
+    return np is not None
+
+
+def _buckets(text: str, dim: int):
+    """Hashed bucket of every character n-gram of `text` (with repeats)."""
+    padded = f" {normalize(text)} "
+    lo, hi = NGRAM_RANGE
+    out = []
+    for n in range(lo, hi + 1):
+        for i in range(len(padded) - n + 1):
+            out.append(zlib.crc32(padded[i:i + n].encode("utf-8")) % dim)
+    return out
+
+
+def _typos(word: str):
+    """Every one-character deletion, adjacent transposition and doubling of `word`."""
+    out = set()
+    for i in range(len(word)):
+        out.add(word[:i] + word[i + 1:])
+        out.add(word[:i] + word[i] + word[i:])
+        if i + 1 < len(word):
+            out.add(word[:i] + word[i + 1] + word[i] + word[i + 2:])
+    out.discard(word)
+    return {typo for typo in out if typo.strip()}
+
+
+class IntentClassifier:
+    def __init__(self, intents, dim: int = DIM):
+        if np is None:
+            raise RuntimeError("the intent classifier requires numpy")
+        self.intents = list(intents)
+        self.dim = dim
+
+        texts = [(row, text) for row, intent in enumerate(self.intents) for text in intent.keywords + intent.examples]
+        docs = [_buckets(text, dim) for _, text in texts]
+        df = np.zeros(dim, dtype=np.float32)
+        for d in docs:
+            df[np.unique(d)] += 1
+        # smoothed idf; buckets never seen in training get the largest weight
+        self.idf = (np.log((1 + len(docs)) / (1 + df)) + 1).astype(np.float32)
+
+        self.vectors = self._embed(docs)
+        # intent row of every training text
+        self.owners = np.array([row for row, _ in texts], dtype=np.int64)
+        # default confidence cut-off, see typo_threshold
+        self.threshold = self.typo_threshold()
+
+    @classmethod
+    def from_matcher(cls, matcher, dim: int = DIM) -> "IntentClassifier":
+        return cls(matcher.intents, dim)
+
+    def _embed(self, bucket_lists):
+        vectors = np.zeros((len(bucket_lists), self.dim), dtype=np.float32)
+        for row, buckets in enumerate(bucket_lists):
+            if buckets:
+                vectors[row] = np.bincount(buckets, minlength=self.dim)
+        # sublinear tf, then idf, then L2 normalisation
+        np.log1p(vectors, out=vectors)
+        vectors *= self.idf
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def embed(self, messages):
+        """Return the unit-length TF-IDF vectors of `messages` (one per row)."""
+        return self._embed([_buckets(m, self.dim) for m in messages])
+
+    def classify(self, messages):
+        """Return (best intent or None, cosine score) for every message."""
+        results = []
+        for start in range(0, len(messages), CHUNK):
+            scores = self.embed(messages[start:start + CHUNK]) @ self.vectors.T
+            if not len(self.owners):
+                results.extend((None, 0.0) for _ in range(len(scores)))
+                continue
+            best = scores.argmax(axis=1)
+            for row, col in enumerate(best):
+                score = float(scores[row, col])
+                # no shared n-grams with any intent
+                results.append((self.intents[self.owners[col]] if score > 0 else None, score))
+        return results
+
+    def typo_threshold(self, quantile: float = TYPO_QUANTILE) -> float:
+        """Score reached by all but `quantile` of the one-typo keyword variants.
+
+        Every deletion, transposition and doubling of a keyword character is
+        classified; variants that still go to the keyword's own intent set the
+        scale of a "confident" typo.
+        """
+        variants, expected = [], []
+        for intent in self.intents:
+            for keyword in intent.keywords:
+                for typo in sorted(_typos(keyword)):
+                    variants.append(typo)
+                    expected.append(intent)
+        scores = [score for (got, score), want in zip(self.classify(variants), expected) if got is want]
+        if not scores:
+            return 0.0
+        return float(np.quantile(scores, quantile))
+
+    def predict(self, message: str):
+        return self.classify([message])[0]
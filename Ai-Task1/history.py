@@ -0,0 +1,309 @@
+"""Per-session chat history with a bounded length and cursor-based reads.
+
+Each session keeps at most `cap` messages; older ones fall off the front.
+Messages get ids that increase by one per message and never repeat within a
+session (not even after a reset), so a client can ask for "everything after
+id N" and receive only what it has not seen.
+
+Two backends implement the same interface:
+
+- MemoryHistoryStore: ring buffers in process memory, with the number of
+  sessions bounded by LRU eviction. Fast, but private to one process and lost
+  on restart, so only suited to tests and single-process development.
+- SQLiteHistoryStore: one SQLite database in WAL mode shared by every
+  gunicorn worker on the host. Readers never block the writer, each request
+  writes its messages in one short transaction, and trimming to `cap` and
+  evicting sessions beyond `max_sessions` are amortised over many appends.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from itertools import count, islice
+
+
+class History:
+    def __init__(self, cap: int):
+        self.messages = deque(maxlen=cap)
+        self.last_id = 0
+
+    def append(self, speaker: str, text: str) -> dict:
+        self.last_id += 1
+        message = {"id": self.last_id, "speaker": speaker, "text": text, "ts": time.time()}
+        self.messages.append(message)
+        return message
+
+    def since(self, after: int, limit: int):
+        """Return up to `limit` messages with an id greater than `after`."""
+        if not self.messages:
+            return []
+        # ids in the buffer are contiguous, so the offset is arithmetic
+        start = max(0, after - self.messages[0]["id"] + 1)
+        return list(islice(self.messages, start, start + limit))
+
+    def clear(self):
+        self.messages.clear()
+
+
+class HistoryStore:
+    """Interface shared by the history backends.
+
+    `wait` lets a stream block until a session has new messages. Appends in
+    this process wake waiters directly; backends shared with other processes
+    also re-check every `poll_interval` seconds via `_changed_elsewhere`.
+    """
+
+    poll_interval = None
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._version = 0
+
+    def _notify(self):
+        with self._cond:
+            self._version += 1
+            self._cond.notify_all()
+
+    def _changed_elsewhere(self) -> bool:
+        return False
+
+    def wait(self, session_id: str, after: int, timeout: float, limit: int = 200):
+        """Like `since`, but wait up to `timeout` seconds for a message."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                version = self._version
+            messages, last_id = self.since(session_id, after, limit)
+            if messages:
+                return messages, last_id
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return messages, last_id
+                with self._cond:
+                    if self._version == version:
+                        self._cond.wait(min(remaining, self.poll_interval or remaining))
+                    if self._version != version:
+                        break
+                if self._changed_elsewhere():
+                    break
+
+    def append(self, session_id: str, speaker: str, text: str) -> dict:
+        return self.append_many(session_id, [(speaker, text)])[0]
+
+    def append_many(self, session_id: str, items):
+        """Append (speaker, text) pairs in order and return the new messages."""
+        raise NotImplementedError
+
+    def since(self, session_id: str, after: int = 0, limit: int = 200):
+        """Return (messages after `after`, last id) for the session."""
+        raise NotImplementedError
+
+    def clear(self, session_id: str) -> int:
+        """Drop the session's messages and return its last id."""
+        raise NotImplementedError
+
+
+class MemoryHistoryStore(HistoryStore):
+    def __init__(self, cap: int = 200, max_sessions: int = 10000):
+        super().__init__()
+        self.cap = cap
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, session_id: str) -> History:
+        history = self._sessions.get(session_id)
+        if history is None:
+            history = self._sessions[session_id] = History(self.cap)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        return history
+
+    def append_many(self, session_id: str, items):
+        with self._lock:
+            history = self._get(session_id)
+            messages = [history.append(speaker, text) for speaker, text in items]
+        self._notify()
+        return messages
+
+    def since(self, session_id: str, after: int = 0, limit: int = 200):
+        # reads neither create a session nor refresh its LRU position, like
+        # the SQLite store, where only appends update a session
+        with self._lock:
+            history = self._sessions.get(session_id)
+            if history is None:
+                return [], 0
+            return history.since(after, limit), history.last_id
+
+    def clear(self, session_id: str) -> int:
+        with self._lock:
+            history = self._sessions.get(session_id)
+            if history is None:
+                return 0
+            history.clear()
+        self._notify()
+        return history.last_id
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL,
+    updated REAL NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    speaker TEXT NOT NULL,
+    text TEXT NOT NULL,
+    ts REAL NOT NULL,
+    PRIMARY KEY (session_id, id)
+) WITHOUT ROWID;
+"""
+
+
+class SQLiteHistoryStore(HistoryStore):
+    """History in an SQLite database shared between processes.
+
+    Every thread gets its own connection. Appends reserve their ids by bumping
+    `sessions.last_id` inside a BEGIN IMMEDIATE transaction, so ids stay unique
+    and ordered across workers. Messages older than `cap` are hidden from reads
+    straight away and deleted every `cap // 4` appends.
+
+    `sessions.updated` records each session's last append. Every
+    `max_sessions // 16` new sessions (per process), sessions beyond the
+    `max_sessions` most recently updated are deleted with their messages, like
+    the LRU eviction of MemoryHistoryStore.
+
+    Waiting streams notice commits from other processes through
+    `PRAGMA data_version`, so an idle stream costs one pragma per poll rather
+    than a query.
+    """
+
+    poll_interval = 0.5
+
+    def __init__(self, path: str, cap: int = 200, max_sessions: int = 10000, timeout: float = 5.0):
+        super().__init__()
+        self.path = path
+        self.cap = cap
+        self.max_sessions = max_sessions
+        self.timeout = timeout
+        self._trim_every = max(1, cap // 4)
+        self._evict_every = max(1, max_sessions // 16)
+        self._new_sessions = count(1)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(sessions)")]
+            if "updated" not in columns:
+                # database created before sessions were evicted
+                conn.execute("ALTER TABLE sessions ADD COLUMN updated REAL NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            # isolation_level=None: transactions are managed explicitly below
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL only syncs at checkpoints; commits stay cheap
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def append_many(self, session_id: str, items):
+        items = list(items)
+        if not items:
+            return []
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            (last_id,) = conn.execute(
+                "INSERT INTO sessions (session_id, last_id, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET "
+                "last_id = last_id + excluded.last_id, updated = excluded.updated "
+                "RETURNING last_id",
+                (session_id, len(items), now),
+            ).fetchone()
+            first = last_id - len(items) + 1
+            messages = [
+                {"id": first + n, "speaker": speaker, "text": text, "ts": now}
+                for n, (speaker, text) in enumerate(items)
+            ]
+            conn.executemany(
+                "INSERT INTO messages (session_id, id, speaker, text, ts) VALUES (?, ?, ?, ?, ?)",
+                [(session_id, m["id"], m["speaker"], m["text"], m["ts"]) for m in messages],
+            )
+            if last_id // self._trim_every != (first - 1) // self._trim_every:
+                conn.execute(
+                    "DELETE FROM messages WHERE session_id = ? AND id <= ?",
+                    (session_id, last_id - self.cap),
+                )
+            if last_id == len(items) and next(self._new_sessions) % self._evict_every == 0:
+                # this append created the session
+                self._evict(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._notify()
+        return messages
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Delete the sessions beyond the `max_sessions` most recently updated."""
+        stale = "SELECT session_id FROM sessions ORDER BY updated DESC LIMIT -1 OFFSET ?"
+        conn.execute(f"DELETE FROM messages WHERE session_id IN ({stale})", (self.max_sessions,))
+        conn.execute(f"DELETE FROM sessions WHERE session_id IN ({stale})", (self.max_sessions,))
+
+    def since(self, session_id: str, after: int = 0, limit: int = 200):
+        conn = self._connect()
+        # one read transaction so the messages and last_id agree
+        conn.execute("BEGIN")
+        try:
+            self._local.data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            row = conn.execute("SELECT last_id FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            last_id = row[0] if row else 0
+            rows = conn.execute(
+                "SELECT id, speaker, text, ts FROM messages "
+                "WHERE session_id = ? AND id > ? ORDER BY id LIMIT ?",
+                (session_id, max(after, last_id - self.cap), limit),
+            ).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        messages = [{"id": i, "speaker": speaker, "text": text, "ts": ts} for i, speaker, text, ts in rows]
+        return messages, last_id
+
+    def clear(self, session_id: str) -> int:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            row = conn.execute("SELECT last_id FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._notify()
+        return row[0] if row else 0
+
+    def _changed_elsewhere(self) -> bool:
+        # data_version changes when another connection commits to the database
+        version = self._connect().execute("PRAGMA data_version").fetchone()[0]
+        return version != getattr(self._local, "data_version", None)
+
+
+def make_store(backend: str, cap: int, max_sessions: int, path: str) -> HistoryStore:
+    """Build the history backend named by `backend` ("memory" or "sqlite")."""
+    if backend == "memory":
+        return MemoryHistoryStore(cap=cap, max_sessions=max_sessions)
+    if backend == "sqlite":
+        return SQLiteHistoryStore(path, cap=cap, max_sessions=max_sessions)
+    raise ValueError(f"unknown history backend {backend!r}")
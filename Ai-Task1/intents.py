@@ -0,0 +1,191 @@
+"""Intent rules for the chatbot, compiled into a single regular expression.
+
+Rules live in intents.json: each intent has a name, a priority, a list of
+keywords (words or phrases) and one or more response templates, which may
+use `{message}` for the user's text. All keywords
+are merged into one trie-shaped alternation wrapped in word boundaries, so a
+message is scanned once no matter how many intents are loaded, and the regex
+engine never retries keywords that share a prefix. The alternation sits in a
+lookahead, so keywords that overlap (e.g. "new york weather" and "weather")
+are all found.
+
+When several intents match, the one with the highest priority wins (ties go
+to the intent listed first in the file). Intents may also list `examples`
+(sample phrasings) for the fuzzy classifier in classifier.py.
+"""
+
+import json
+import random
+import re
+import threading
+from collections import OrderedDict
+
+
+class Intent:
+    def __init__(self, name, priority, keywords, responses, order, examples=()):
+        self.name = name
+        self.priority = priority
+        self.keywords = keywords
+        self.responses = responses
+        self.order = order
+        # sample phrasings, used to train the optional classifier
+        self.examples = list(examples)
+
+    def respond(self, message: str) -> str:
+        return random.choice(self.responses).format(message=message)
+
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+
+
+def normalize(text: str) -> str:
+    """Case-fold, turn punctuation into spaces and collapse whitespace.
+
+    Keywords and messages go through the same function, so the result is
+    also the cache key for a message.
+    """
+    return " ".join(_PUNCTUATION.sub(" ", text.casefold()).split())
+
+
+def _trie_pattern(words) -> str:
+    """Build a regex alternation for `words` that shares common prefixes."""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node):
+        ends = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not ends:
+            return branches[0]
+        body = "(?:" + "|".join(branches) + ")"
+        # branches come first so the longest keyword wins at each position
+        return body + "?" if ends else body
+
+    return build(trie)
+
+
+class IntentMatcher:
+    def __init__(self, intents, fallback, empty):
+        self.intents = intents
+        self.fallback = fallback
+        self.empty = empty
+        self._by_keyword = {}
+        for intent in intents:
+            for keyword in intent.keywords:
+                self._by_keyword.setdefault(keyword, []).append(intent)
+        # the regex reports the longest keyword at each position; shorter
+        # keywords it starts with (whole words) match there as well
+        self._intents_at = {}
+        for keyword in self._by_keyword:
+            words = keyword.split(" ")
+            self._intents_at[keyword] = [
+                intent
+                for n in range(1, len(words) + 1)
+                for intent in self._by_keyword.get(" ".join(words[:n]), ())
+            ]
+        if self._by_keyword:
+            # zero-width, so a match starts at every position, not only after
+            # the end of the previous one
+            self._pattern = re.compile(r"(?=\b(" + _trie_pattern(self._by_keyword) + r")\b)")
+        else:
+            self._pattern = None
+
+    @classmethod
+    def from_file(cls, path: str) -> "IntentMatcher":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        intents = []
+        for order, item in enumerate(data.get("intents", [])):
+            keywords = sorted({normalize(k) for k in item.get("keywords", []) if normalize(k)})
+            responses = item.get("responses") or []
+            if not keywords or not responses:
+                raise ValueError(f"intent {item.get('name')!r} needs keywords and responses")
+            examples = [normalize(e) for e in item.get("examples", []) if normalize(e)]
+            intents.append(Intent(item["name"], item.get("priority", 0), keywords, responses, order, examples))
+        return cls(intents, data["fallback"], data["empty"])
+
+    def matches(self, message: str):
+        """Return every intent with a keyword in `message`, best first."""
+        if self._pattern is None:
+            return []
+        found = {}
+        for m in self._pattern.finditer(normalize(message)):
+            for intent in self._intents_at[m.group(1)]:
+                found[intent.order] = intent
+        return sorted(found.values(), key=lambda i: (-i.priority, i.order))
+
+    def match(self, message: str):
+        found = self.matches(message)
+        return found[0] if found else None
+
+    def respond(self, message: str) -> str:
+        if not message:
+            return self.empty
+        intent = self.match(message)
+        if intent is None:
+            return self.fallback
+        return intent.respond(message)
+
+
+_MISSING = object()
+
+
+class ResponseCache:
+    """LRU map of normalized message -> matched intent (or None), with counters.
+
+    `clear` starts a new generation; a `put` computed against an older
+    generation is dropped so a rules reload cannot be undone by a request
+    that was still using the old rules.
+    """
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """Return (found, intent) for `key`."""
+        with self._lock:
+            value = self._items.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return False, None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def put(self, key: str, value, generation: int):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.generation += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._items),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
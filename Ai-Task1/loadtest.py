@@ -0,0 +1,237 @@
+"""Load test for the chatbot app.
+
+Drives the message, history-fetch and reset paths and reports requests/sec,
+latency percentiles, response sizes and memory growth as the history grows.
+
+Two modes:
+
+- client: Flask's test client in this process (no network, measures the app)
+- http: a threaded local server plus a pool of client threads, one chat
+  session (cookie) per thread
+
+Examples:
+
+    python loadtest.py --mode client --messages 2000
+    python loadtest.py --mode http --threads 8 --messages 500 --backend sqlite
+    python loadtest.py --mode both --json > results.json
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+MESSAGES = [
+    "hi", "hello there", "how are you?", "tell me a joke", "what's the weather",
+    "help", "commands", "bye", "see ya", "something the bot does not know",
+]
+FORM = {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of `samples`."""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def rss_mb():
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.sizes = {}
+        self._lock = threading.Lock()
+
+    def add(self, path, seconds, size):
+        with self._lock:
+            self.latencies.setdefault(path, []).append(seconds)
+            self.sizes.setdefault(path, []).append(size)
+
+    def summary(self, elapsed):
+        out = {}
+        for path, samples in self.latencies.items():
+            sizes = self.sizes[path]
+            out[path] = {
+                "requests": len(samples),
+                "rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+                "p50_ms": round(percentile(samples, 50) * 1000, 3),
+                "p95_ms": round(percentile(samples, 95) * 1000, 3),
+                "p99_ms": round(percentile(samples, 99) * 1000, 3),
+                "mean_bytes": round(sum(sizes) / len(sizes)),
+                "last_bytes": sizes[-1],
+            }
+        return out
+
+
+def conversation(send, messages, fetch_every, reset_every, rng, checkpoint=None):
+    """Play one chat session through `send(method, path, body)`.
+
+    Every `fetch_every` messages the full history is fetched (the old
+    polling pattern) and the incremental /history is fetched from the
+    client's cursor. The session is reset every `reset_every` messages, or
+    once at the end when `reset_every` is 0.
+    """
+    after = 0
+    for n in range(1, messages + 1):
+        data = send("POST", "/", {"message": rng.choice(MESSAGES), "after": after}, "message")
+        after = data.get("lastId", after)
+        if fetch_every and n % fetch_every == 0:
+            send("POST", "/", {"message": "__fetch_history__", "after": 0}, "fetch-full")
+            send("GET", f"/history?after={after}", None, "fetch-cursor")
+        if reset_every and n % reset_every == 0:
+            send("POST", "/reset", None, "reset")
+        if checkpoint:
+            checkpoint(n)
+    if not reset_every:
+        send("POST", "/reset", None, "reset")
+
+
+def run_client(app, args):
+    """Single-threaded run through the Flask test client."""
+    recorder = Recorder()
+    client = app.test_client()
+    rng = random.Random(args.seed)
+    memory = []
+
+    def send(method, path, form, label):
+        start = time.perf_counter()
+        response = client.open(path, method=method, data=form)
+        recorder.add(label, time.perf_counter() - start, len(response.data))
+        return response.get_json(silent=True) or {}
+
+    def checkpoint(n):
+        if n % args.sample_every == 0:
+            current, _ = tracemalloc.get_traced_memory()
+            memory.append({"messages": n, "traced_mb": round(current / 2 ** 20, 3), "rss_mb": round(rss_mb(), 1)})
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    conversation(send, args.messages, args.fetch_every, args.reset_every, rng, checkpoint)
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    return {"elapsed_s": round(elapsed, 3), "paths": recorder.summary(elapsed), "memory": memory}
+
+
+def run_http(app, args):
+    """Threaded local server driven by `args.threads` concurrent sessions."""
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    recorder = Recorder()
+    rss_before = rss_mb()
+
+    def session(index):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        rng = random.Random(args.seed + index)
+        cookie = {}
+
+        def send(method, path, form, label):
+            headers = dict(FORM) if form is not None else {}
+            if cookie:
+                headers["Cookie"] = cookie["value"]
+            body = urlencode(form) if form is not None else None
+            start = time.perf_counter()
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            payload = response.read()
+            recorder.add(label, time.perf_counter() - start, len(payload))
+            set_cookie = response.getheader("Set-Cookie")
+            if set_cookie:
+                cookie["value"] = set_cookie.split(";", 1)[0]
+            try:
+                return json.loads(payload)
+            except ValueError:
+                return {}
+
+        try:
+            conversation(send, args.messages, args.fetch_every, args.reset_every, rng)
+        finally:
+            conn.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(session, range(args.threads)))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    total = sum(len(samples) for samples in recorder.latencies.values())
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "threads": args.threads,
+        "total_rps": round(total / elapsed, 1),
+        "paths": recorder.summary(elapsed),
+        "rss_growth_mb": round(rss_mb() - rss_before, 1),
+    }
+
+
+def print_report(name, result):
+    print(f"== {name}: {result['elapsed_s']}s" + (f", {result['total_rps']} req/s total" if "total_rps" in result else ""))
+    for path, row in result["paths"].items():
+        print(
+            f"  {path:13} n={row['requests']:<6} rps={row['rps']:<8} p50={row['p50_ms']:>8.3f}ms "
+            f"p95={row['p95_ms']:>8.3f}ms p99={row['p99_ms']:>8.3f}ms bytes(mean/last)={row['mean_bytes']}/{row['last_bytes']}"
+        )
+    for point in result.get("memory", []):
+        print(f"  after {point['messages']:>6} messages: traced={point['traced_mb']}MB peak rss={point['rss_mb']}MB")
+    if "rss_growth_mb" in result:
+        print(f"  peak rss growth: {result['rss_growth_mb']}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=("client", "http", "both"), default="both")
+    parser.add_argument("--messages", type=int, default=1000, help="messages per session")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent sessions in http mode")
+    parser.add_argument("--fetch-every", type=int, default=5, help="fetch history every N messages (0 = never)")
+    parser.add_argument("--reset-every", type=int, default=0, help="reset the session every N messages (0 = once at the end)")
+    parser.add_argument("--sample-every", type=int, default=250, help="memory sample interval in client mode")
+    parser.add_argument("--backend", choices=("memory", "sqlite"), default="memory")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    # app.py reads its configuration at import time
+    tmpdir = tempfile.TemporaryDirectory()
+    os.environ["HISTORY_BACKEND"] = args.backend
+    os.environ["HISTORY_DB"] = os.path.join(tmpdir.name, "loadtest.db")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from app import app
+
+    results = {"backend": args.backend, "messages": args.messages}
+    if args.mode in ("client", "both"):
+        results["client"] = run_client(app, args)
+    if args.mode in ("http", "both"):
+        results["http"] = run_http(app, args)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name in ("client", "http"):
+            if name in results:
+                print_report(name, results[name])
+    tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# Checks the Flask endpoints with the test client and in-memory history.
+# Run with:  python -m unittest  (from this folder)
+
+import os
+import threading
+import unittest
+from unittest import mock
+
+os.environ.setdefault("HISTORY_BACKEND", "memory")
+
+import app  # noqa: E402  (reads the environment on import)
+import classifier  # noqa: E402
+
+
+def read_events(response, count):
+    """The next `count` server-sent events of a streamed response."""
+    chunks = iter(response.response)
+    return [next(chunks).decode() for _ in range(count)]
+
+
+class StreamTest(unittest.TestCase):
+    def setUp(self):
+        self.client = app.app.test_client()
+        self.client.set_cookie(app.SESSION_COOKIE, "stream-test")
+        app.history.clear("stream-test")
+        app.history.append_many("stream-test", [("user", "a"), ("bot", "b"), ("user", "c")])
+        self.base = app.history.since("stream-test")[1] - 3
+        self.slots = threading.BoundedSemaphore(2)
+        patcher = mock.patch.object(app, "stream_slots", self.slots)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def open_stream(self, *args, **kwargs):
+        response = self.client.get(*args, buffered=False, **kwargs)
+        self.addCleanup(response.close)
+        return response
+
+    def test_resumes_from_last_event_id(self):
+        response = self.open_stream("/stream", headers={"Last-Event-ID": str(self.base + 1)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "text/event-stream")
+        retry, first, second = read_events(response, 3)
+        self.assertEqual(retry, "retry: 3000\n\n")
+        self.assertTrue(first.startswith(f"id: {self.base + 2}\n"))
+        self.assertTrue(second.startswith(f"id: {self.base + 3}\n"))
+        self.assertIn('"text": "c"', second)
+
+    def test_resumes_from_after_parameter(self):
+        response = self.open_stream(f"/stream?after={self.base + 2}")
+        _, event = read_events(response, 2)
+        self.assertTrue(event.startswith(f"id: {self.base + 3}\n"))
+
+    def test_last_event_id_wins_over_after(self):
+        response = self.open_stream(f"/stream?after={self.base + 2}", headers={"Last-Event-ID": str(self.base)})
+        _, event = read_events(response, 2)
+        self.assertTrue(event.startswith(f"id: {self.base + 1}\n"))
+
+    def assert_slots_free(self, count):
+        for _ in range(count):
+            self.assertTrue(self.slots.acquire(blocking=False))
+        self.assertFalse(self.slots.acquire(blocking=False))
+        for _ in range(count):
+            self.slots.release()
+
+    def test_refuses_streams_past_the_cap(self):
+        # streams of other requests hold both slots
+        self.slots.acquire()
+        self.slots.acquire()
+        refused = self.client.get("/stream")
+        self.assertEqual(refused.status_code, 503)
+        self.assertEqual(refused.headers["Retry-After"], "5")
+        self.slots.release()
+        response = self.client.get("/stream", buffered=False)
+        self.assertEqual(response.status_code, 200)
+        # closing the stream gives its slot back
+        response.close()
+        self.slots.release()
+        self.assert_slots_free(2)
+
+    def test_releases_slot_when_setup_fails(self):
+        with mock.patch.object(app, "session_id", side_effect=RuntimeError("boom")):
+            for _ in range(3):
+                self.assertEqual(self.client.get("/stream").status_code, 500)
+        self.assert_slots_free(2)
+
+
+
+@unittest.skipUnless(classifier.available(), "numpy is not installed")
+class ClassifierTest(unittest.TestCase):
+    def setUp(self):
+        self.client = app.app.test_client()
+        app.response_cache.clear()
+        self.addCleanup(app.response_cache.clear)
+
+    def test_classify_batch(self):
+        response = self.client.post("/classify_batch", json=["helo", "tell me a joke", "qwerty"])
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertAlmostEqual(body["threshold"], app.get_classifier().threshold, places=4)
+        self.assertEqual([r["intent"] for r in body["results"]], ["greeting", "joke", "greeting"])
+        self.assertEqual([r["confident"] for r in body["results"]], [True, True, False])
+        self.assertEqual(body["results"][1]["score"], 1.0)
+
+        response = self.client.post("/classify_batch", json={"messages": ["bye"]})
+        self.assertEqual(response.get_json()["results"][0]["intent"], "goodbye")
+
+    def test_classify_batch_rejects_bad_input(self):
+        self.assertEqual(self.client.post("/classify_batch", json={"messages": "hi"}).status_code, 400)
+        self.assertEqual(self.client.post("/classify_batch", json=["hi", 3]).status_code, 400)
+        self.assertEqual(self.client.post("/classify_batch", data="hi").status_code, 400)
+        with mock.patch.object(app, "MAX_CLASSIFY_BATCH", 2):
+            self.assertEqual(self.client.post("/classify_batch", json=["a", "b"]).status_code, 200)
+            self.assertEqual(self.client.post("/classify_batch", json=["a", "b", "c"]).status_code, 413)
+
+    def test_threshold_override(self):
+        with mock.patch.object(app, "CLASSIFIER_THRESHOLD", 0.99):
+            body = self.client.post("/classify_batch", json=["helo"]).get_json()
+        self.assertEqual(body["threshold"], 0.99)
+        self.assertFalse(body["results"][0]["confident"])
+
+    def test_typos_reach_the_classifier(self):
+        with mock.patch.object(app, "USE_CLASSIFIER", True):
+            self.assertEqual(app.find_intent("helo").name, "greeting")
+        app.response_cache.clear()
+        self.assertIsNone(app.find_intent("helo"))
+
+    def test_falls_back_to_rules_below_threshold(self):
+        with mock.patch.object(app, "USE_CLASSIFIER", True), mock.patch.object(app, "CLASSIFIER_THRESHOLD", 1.01):
+            # the classifier is never confident enough; the keyword rules answer
+            self.assertEqual(app.find_intent("hi how are you").name, "how_are_you")
+            self.assertIsNone(app.find_intent("helo"))
+
+
+class ClassifierUnavailableTest(unittest.TestCase):
+    def test_classify_batch_without_numpy(self):
+        with mock.patch.object(classifier, "np", None), mock.patch.object(app, "_classifier", None):
+            response = app.app.test_client().post("/classify_batch", json=["hi"])
+            self.assertEqual(response.status_code, 501)
+            with mock.patch.object(app, "USE_CLASSIFIER", True):
+                app.response_cache.clear()
+                # the rules still answer
+                self.assertEqual(app.find_intent("hello").name, "greeting")
+        app.response_cache.clear()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+# Checks the fuzzy intent classifier's scores and its typo-calibrated threshold.
+# Run with:  python -m unittest  (from this folder)
+
+import os
+import unittest
+
+import classifier
+from intents import Intent, IntentMatcher
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@unittest.skipUnless(classifier.available(), "numpy is not installed")
+class IntentClassifierTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.matcher = IntentMatcher.from_file(os.path.join(HERE, "intents.json"))
+        cls.clf = classifier.IntentClassifier.from_matcher(cls.matcher)
+
+    def predict(self, message):
+        intent, score = self.clf.predict(message)
+        return (intent.name if intent else None), score
+
+    def test_keywords_and_examples_score_one(self):
+        for intent in self.matcher.intents:
+            for text in intent.keywords + intent.examples:
+                name, score = self.predict(text)
+                self.assertEqual(name, intent.name, text)
+                self.assertAlmostEqual(score, 1.0, places=5)
+
+    def test_typos_clear_the_threshold(self):
+        self.assertGreater(self.clf.threshold, 0)
+        self.assertLess(self.clf.threshold, 0.25)
+        typos = {"helo": "greeting", "jokez": "joke", "wether": "weather", "goodby": "goodbye", "comands": "help"}
+        for message, expected in typos.items():
+            name, score = self.predict(message)
+            self.assertEqual(name, expected, message)
+            self.assertGreaterEqual(score, self.clf.threshold, message)
+
+    def test_unrelated_messages_stay_below_the_threshold(self):
+        for message in ("qwerty", "banana", "play music", "i like turtles"):
+            self.assertLess(self.predict(message)[1], self.clf.threshold, message)
+        self.assertEqual(self.predict("123"), (None, 0.0))
+
+    def test_typo_threshold_quantiles(self):
+        self.assertLessEqual(self.clf.typo_threshold(0.0), self.clf.threshold)
+        self.assertLessEqual(self.clf.threshold, self.clf.typo_threshold(0.5))
+
+    def test_typos(self):
+        self.assertEqual(classifier._typos("hi"), {"h", "i", "hhi", "hii", "ih"})
+
+    def test_batches_match_single_predictions(self):
+        messages = [f"helo {n}" if n % 2 else f"xyz {n}" for n in range(classifier.CHUNK + 10)]
+        batch = self.clf.classify(messages)
+        for message, (intent, score) in zip(messages[::97], batch[::97]):
+            single_intent, single_score = self.clf.predict(message)
+            self.assertIs(intent, single_intent)
+            self.assertAlmostEqual(score, single_score, places=5)
+
+    def test_without_intents(self):
+        clf = classifier.IntentClassifier([])
+        self.assertEqual(clf.classify(["hello"]), [(None, 0.0)])
+        empty = classifier.IntentClassifier([Intent("empty", 0, [], ["reply"], 0)])
+        self.assertEqual(empty.predict("hello"), (None, 0.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
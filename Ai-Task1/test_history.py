@@ -0,0 +1,179 @@
+# Checks the chat history stores: the cap, id order and the `after` cursor.
+# Run with:  python -m unittest  (from this folder)
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import closing
+from itertools import count
+from unittest import mock
+
+from history import MemoryHistoryStore, SQLiteHistoryStore
+
+
+def ids(messages):
+    return [m["id"] for m in messages]
+
+
+class HistoryStoreMixin:
+    """Behaviour shared by every backend; `make_store(cap, max_sessions)` builds one."""
+
+    def test_ids_increase_by_one(self):
+        store = self.make_store(cap=10)
+        first = store.append("s", "user", "hi")
+        pair = store.append_many("s", [("user", "a"), ("bot", "b")])
+        self.assertEqual([first["id"]] + ids(pair), [1, 2, 3])
+        self.assertEqual([m["text"] for m in pair], ["a", "b"])
+        self.assertEqual(store.append("other", "user", "x")["id"], 1)
+
+    def test_keeps_the_last_cap_messages(self):
+        store = self.make_store(cap=5)
+        for n in range(23):
+            store.append("s", "user", str(n))
+        messages, last_id = store.since("s")
+        self.assertEqual(last_id, 23)
+        self.assertEqual(ids(messages), [19, 20, 21, 22, 23])
+        self.assertEqual([m["text"] for m in messages], ["18", "19", "20", "21", "22"])
+
+    def test_after_cursor(self):
+        store = self.make_store(cap=5)
+        for n in range(8):
+            store.append("s", "user", str(n))
+        self.assertEqual(ids(store.since("s", after=5)[0]), [6, 7, 8])
+        self.assertEqual(ids(store.since("s", after=1)[0]), [4, 5, 6, 7, 8])
+        self.assertEqual(ids(store.since("s", after=4, limit=2)[0]), [5, 6])
+        self.assertEqual(store.since("s", after=8), ([], 8))
+        self.assertEqual(store.since("s", after=50), ([], 8))
+
+    def test_ids_do_not_repeat_after_clear(self):
+        store = self.make_store(cap=5)
+        store.append_many("s", [("user", "a"), ("bot", "b")])
+        self.assertEqual(store.clear("s"), 2)
+        self.assertEqual(store.since("s"), ([], 2))
+        self.assertEqual(store.append("s", "user", "c")["id"], 3)
+
+    def test_wait_wakes_on_append(self):
+        store = self.make_store(cap=5)
+        store.append("s", "user", "old")
+        timer = threading.Timer(0.1, store.append, ("s", "bot", "new"))
+        timer.start()
+        self.addCleanup(timer.join)
+        start = time.monotonic()
+        messages, last_id = store.wait("s", after=1, timeout=5)
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual([m["text"] for m in messages], ["new"])
+        self.assertEqual(last_id, 2)
+
+    def test_wait_times_out(self):
+        store = self.make_store(cap=5)
+        store.append("s", "user", "old")
+        self.assertEqual(store.wait("s", after=1, timeout=0.05), ([], 1))
+        # messages already past the cursor are returned without waiting
+        self.assertEqual(ids(store.wait("s", after=0, timeout=5)[0]), [1])
+
+    def test_unknown_session_is_empty(self):
+        store = self.make_store(cap=5)
+        self.assertEqual(store.since("nobody", after=3), ([], 0))
+        self.assertEqual(store.clear("nobody"), 0)
+
+
+class MemoryHistoryStoreTest(HistoryStoreMixin, unittest.TestCase):
+    def make_store(self, cap, max_sessions=100):
+        return MemoryHistoryStore(cap=cap, max_sessions=max_sessions)
+
+    def test_reads_do_not_create_or_refresh_sessions(self):
+        store = self.make_store(cap=5, max_sessions=2)
+        store.append("a", "user", "1")
+        store.append("b", "user", "2")
+        store.since("missing")
+        store.since("a")
+        self.assertEqual(list(store._sessions), ["a", "b"])
+        # "a" was only read, so it is still the least recently used
+        store.append("c", "user", "3")
+        self.assertEqual(list(store._sessions), ["b", "c"])
+        self.assertEqual(store.since("a"), ([], 0))
+
+
+
+class SQLiteHistoryStoreTest(HistoryStoreMixin, unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "history.db")
+
+    def make_store(self, cap, max_sessions=100):
+        return SQLiteHistoryStore(self.path, cap=cap, max_sessions=max_sessions)
+
+    def rows(self, sql, *args):
+        with closing(sqlite3.connect(self.path)) as conn:
+            return conn.execute(sql, args).fetchall()
+
+    def test_ids_ordered_across_connections(self):
+        # every thread (and every store) has its own connection
+        stores = [self.make_store(cap=1000) for _ in range(2)]
+        got = []
+
+        def worker(n):
+            store = stores[n % 2]
+            for i in range(25):
+                pair = store.append_many("s", [("user", f"{n}-{i}"), ("bot", f"{n}-{i}")])
+                got.append(ids(pair))
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # each request's pair is contiguous and no id is handed out twice
+        self.assertTrue(all(b == a + 1 for a, b in got))
+        self.assertEqual(sorted(i for pair in got for i in pair), list(range(1, 201)))
+        messages, last_id = stores[0].since("s", limit=1000)
+        self.assertEqual(last_id, 200)
+        self.assertEqual(ids(messages), list(range(1, 201)))
+        for i in range(0, 200, 2):
+            self.assertEqual(messages[i]["text"], messages[i + 1]["text"])
+
+    def test_wait_sees_appends_from_other_connections(self):
+        store = self.make_store(cap=5)
+        other = self.make_store(cap=5)
+        timer = threading.Timer(0.1, other.append, ("s", "bot", "elsewhere"))
+        timer.start()
+        self.addCleanup(timer.join)
+        start = time.monotonic()
+        # `other` notifies only its own waiters; this one polls data_version
+        messages, _ = store.wait("s", after=0, timeout=5)
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual([m["text"] for m in messages], ["elsewhere"])
+
+    def test_trims_to_cap(self):
+        store = self.make_store(cap=8)
+        for n in range(50):
+            store.append("s", "user", str(n))
+        (stored,) = self.rows("SELECT COUNT(*) FROM messages WHERE session_id = 's'")[0]
+        # deleted every cap // 4 appends, so at most that many extra rows
+        self.assertLessEqual(stored, 8 + 2)
+        self.assertEqual(ids(store.since("s")[0]), list(range(43, 51)))
+
+    def test_evicts_least_recently_updated_sessions(self):
+        store = self.make_store(cap=5, max_sessions=16)
+        clock = count(1000)
+        with mock.patch("history.time.time", side_effect=lambda: float(next(clock))):
+            for n in range(20):
+                store.append(f"s{n}", "user", "hi")
+                # s0 keeps being updated, so it outlives newer sessions
+                store.append("s0", "user", "again")
+        sessions = {row[0] for row in self.rows("SELECT session_id FROM sessions")}
+        self.assertEqual(len(sessions), 16)
+        self.assertIn("s0", sessions)
+        self.assertEqual(sessions, {"s0"} | {f"s{n}" for n in range(5, 20)})
+        messages = {row[0] for row in self.rows("SELECT DISTINCT session_id FROM messages")}
+        self.assertEqual(messages, sessions)
+        self.assertEqual(store.since("s1"), ([], 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+# Checks the compiled intent regex: overlapping and nested keywords,
+# priorities, normalization and the shipped intents.json.
+# Run with:  python -m unittest  (from this folder)
+
+import json
+import os
+import tempfile
+import unittest
+
+from intents import IntentMatcher, normalize
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def make_matcher(*intents):
+    """IntentMatcher for `(name, priority, keywords)` tuples, loaded from a file."""
+    data = {
+        "fallback": "fallback",
+        "empty": "empty",
+        "intents": [
+            {"name": name, "priority": priority, "keywords": keywords, "responses": [name]}
+            for name, priority, keywords in intents
+        ],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "intents.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        return IntentMatcher.from_file(path)
+
+
+def names(matcher, message):
+    return [intent.name for intent in matcher.matches(message)]
+
+
+class OverlapTest(unittest.TestCase):
+    def setUp(self):
+        self.matcher = make_matcher(
+            ("city_weather", 30, ["new york weather"]),
+            ("city", 20, ["new york"]),
+            ("weather", 10, ["weather"]),
+        )
+
+    def test_reports_every_overlapping_keyword(self):
+        self.assertEqual(names(self.matcher, "new york weather today"), ["city_weather", "city", "weather"])
+
+    def test_backtracks_to_shorter_keyword(self):
+        # the longest keyword starts here but does not end on a word boundary
+        self.assertEqual(names(self.matcher, "new york times"), ["city"])
+        self.assertEqual(names(self.matcher, "new york weatherman"), ["city"])
+        self.assertEqual(names(self.matcher, "york weather"), ["weather"])
+
+    def test_keywords_match_whole_words(self):
+        self.assertEqual(names(self.matcher, "renew yorkshire weathers"), [])
+
+
+class WordPrefixTest(unittest.TestCase):
+    def setUp(self):
+        self.matcher = make_matcher(
+            ("morning", 20, ["good morning"]),
+            ("praise", 10, ["good"]),
+            ("farewell", 5, ["goodbye", "good night"]),
+        )
+
+    def test_phrase_and_its_first_word(self):
+        self.assertEqual(names(self.matcher, "good morning"), ["morning", "praise"])
+        self.assertEqual(names(self.matcher, "good night"), ["praise", "farewell"])
+
+    def test_longer_word_is_not_a_phrase_match(self):
+        self.assertEqual(names(self.matcher, "good mornings"), ["praise"])
+        self.assertEqual(names(self.matcher, "goodbye"), ["farewell"])
+        self.assertEqual(names(self.matcher, "goodness"), [])
+
+
+class PriorityTest(unittest.TestCase):
+    def test_higher_priority_wins(self):
+        matcher = make_matcher(("low", 1, ["cat"]), ("high", 9, ["dog"]))
+        self.assertEqual(matcher.match("cat and dog").name, "high")
+
+    def test_ties_go_to_the_first_intent_in_the_file(self):
+        matcher = make_matcher(("first", 5, ["cat"]), ("second", 5, ["dog"]))
+        self.assertEqual(names(matcher, "dog and cat"), ["first", "second"])
+        self.assertEqual(matcher.respond("dog then cat"), "first")
+
+
+class NormalizeTest(unittest.TestCase):
+    def test_folds_case_and_punctuation(self):
+        self.assertEqual(normalize("  HeLLo,   World!! "), "hello world")
+        self.assertEqual(normalize("how-are-you?"), "how are you")
+        self.assertEqual(normalize("STRASSE"), normalize("straße"))
+        self.assertEqual(normalize("?!"), "")
+
+    def test_keywords_and_messages_are_normalized_alike(self):
+        matcher = make_matcher(("bye", 1, ["See-Ya!"]), ("hi", 1, ["HELLO"]))
+        self.assertEqual(matcher.intents[0].keywords, ["see ya"])
+        self.assertEqual(names(matcher, "ok, SEE... ya"), ["bye"])
+        self.assertEqual(names(matcher, "Hello!!!"), ["hi"])
+
+
+class ShippedIntentsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.matcher = IntentMatcher.from_file(os.path.join(HERE, "intents.json"))
+
+    def test_plurals(self):
+        self.assertEqual(self.matcher.match("any good jokes?").name, "joke")
+        self.assertEqual(self.matcher.match("Goodbyes are hard").name, "goodbye")
+        self.assertIsNone(self.matcher.match("hellos"))
+
+    def test_priority_between_intents(self):
+        self.assertEqual(self.matcher.match("hi, how are you?").name, "how_are_you")
+        self.assertEqual(self.matcher.match("hey, tell me a joke").name, "joke")
+
+    def test_empty_and_unknown_messages(self):
+        self.assertEqual(self.matcher.respond(""), self.matcher.empty)
+        self.assertEqual(self.matcher.respond("qwerty"), self.matcher.fallback)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,27 +6,93 @@ Human is "X". AI is "O".
 Public API:
 - `get_best_move(board, difficulty='hard') -> int | None` : returns index (0-8)
   for the chosen move, or `None` if no moves available.
+- `get_best_move(board, difficulty, size=N, win_length=k)` : the same for an
+  N x N board won by k in a row, searched by `game.engine` within a time
+  budget.
+- difficulty 'mcts' uses the Monte Carlo Tree Search in `game.mcts` on any
+  board size.
+
+The list board is converted once at the API boundary; the search itself runs
+on the bitboard representation from `game.bitboard`. Search results are
+memoised in a bounded transposition table keyed on the canonical form of the
+board (the smallest of its 8 rotations/reflections). Positions searched to the
+end of the game are stored independently of where the search started (win
+scores relative to the node), so they are shared within a search and across
+requests in the same process, e.g. by the next turn of the same game.
 """
 
 import random
+import threading
+from collections import OrderedDict
 from typing import List, Optional, Tuple
 
+from . import bitboard as bb
+from . import engine, mcts
+from .lines import SIDE_AI, SIDE_HUMAN, Layout, LineState
+from .stats import SearchStats
 
-WIN_LINES = (
-	(0, 1, 2),
-	(3, 4, 5),
-	(6, 7, 8),
-	(0, 3, 6),
-	(1, 4, 7),
-	(2, 5, 8),
-	(0, 4, 8),
-	(2, 4, 6),
-)
+
+WIN_LINES = bb.WIN_LINES
+
+# Default k-in-a-row for each supported board size.
+DEFAULT_WIN_LENGTH = {3: 3, 4: 4, 5: 4, 6: 5, 7: 5, 15: 5}
+MIN_SIZE = 3
+MAX_SIZE = 15
 
 HUMAN = "X"
 AI = "O"
 EMPTY = " "
 
+# Line layout for 3x3; weights[n] = n gives the medium-mode heuristic below.
+_LAYOUT = Layout(WIN_LINES, (0, 1, 2, 3), 9)
+
+
+class TranspositionTable:
+	"""Bounded LRU cache of alpha-beta results.
+
+	Entries are `(flag, score, move)` where `flag` tells whether `score` is the
+	exact minimax value or only a lower/upper bound, and `move` is expressed in
+	canonical board coordinates. Safe to share between threads.
+	"""
+
+	EXACT = 0
+	LOWER = 1
+	UPPER = 2
+
+	def __init__(self, max_entries: int = 100_000):
+		self.max_entries = max_entries
+		self._entries: "OrderedDict[tuple, Tuple[int, int, Optional[int]]]" = OrderedDict()
+		self._lock = threading.Lock()
+
+	def __len__(self) -> int:
+		return len(self._entries)
+
+	def get(self, key: tuple) -> Optional[Tuple[int, int, Optional[int]]]:
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is not None:
+				self._entries.move_to_end(key)
+			return entry
+
+	def store(self, key: tuple, flag: int, score: int, move: Optional[int]) -> None:
+		with self._lock:
+			self._entries[key] = (flag, score, move)
+			self._entries.move_to_end(key)
+			if len(self._entries) > self.max_entries:
+				self._entries.popitem(last=False)
+
+	def clear(self) -> None:
+		with self._lock:
+			self._entries.clear()
+
+
+# Shared by every request handled by this process.
+_TT = TranspositionTable()
+
+
+def default_win_length(size: int) -> int:
+	return DEFAULT_WIN_LENGTH.get(size, min(size, 5))
+
 
 def is_winner(board: List[str], player: str) -> bool:
 	return any(all(board[i] == player for i in line) for line in WIN_LINES)
@@ -40,107 +106,351 @@ def available_moves(board: List[str]) -> List[int]:
 	return [i for i, v in enumerate(board) if v == EMPTY]
 
 
-def _heuristic(board: List[str]) -> int:
+def _to_bits(board: List[str]) -> Tuple[int, int]:
+	"""Convert a list board into `(x_bits, o_bits)`."""
+	x = o = 0
+	for i, cell in enumerate(board):
+		if cell == HUMAN:
+			x |= 1 << i
+		elif cell == AI:
+			o |= 1 << i
+	return x, o
+
+
+def line_state(board: List[str], size: int = 3, win_length: Optional[int] = None) -> LineState:
+	"""Return incremental line counts for `board`, for cheap result checks."""
+	win_length = win_length or default_win_length(size)
+	if size == 3 and win_length == 3:
+		layout = _LAYOUT
+	else:
+		layout = engine.geometry(size, win_length).layout
+	return LineState.from_bits(layout, *_to_bits(board))
+
+
+def _heuristic(state: LineState) -> int:
 	"""Simple heuristic used when minimax is cut off by depth for `medium`.
 
 	Counts potential line advantages: +1 for each AI mark in a line with no
-	HUMAN marks, -1 for each HUMAN mark in a line with no AI marks.
+	HUMAN marks, -1 for each HUMAN mark in a line with no AI marks. The sum is
+	maintained by `LineState` as moves are made and unmade.
 	"""
-	score = 0
-	for a, b, c in WIN_LINES:
-		vals = (board[a], board[b], board[c])
-		if HUMAN not in vals and AI in vals:
-			score += vals.count(AI)
-		if AI not in vals and HUMAN in vals:
-			score -= vals.count(HUMAN)
-	return score
-
-
-def _evaluate_terminal(board: List[str], depth: int) -> Optional[int]:
-	if is_winner(board, AI):
+	return state.score
+
+
+def _evaluate_terminal(state: LineState, depth: int) -> Optional[int]:
+	if state.has_won(SIDE_AI):
 		return 10 - depth
-	if is_winner(board, HUMAN):
+	if state.has_won(SIDE_HUMAN):
 		return -10 + depth
-	if is_full(board):
+	if state.is_full():
 		return 0
 	return None
 
 
+# Static move priority for the 3x3 board: centre, then corners, then edges.
+_CELL_PRIORITY = (2, 1, 2, 1, 3, 1, 2, 1, 2)
+
+
+class _Context:
+	"""Per-search state: line counts, counters and move-ordering tables."""
+
+	def __init__(self, x: int, o: int, ordering: bool = True):
+		self.ordering = ordering
+		self.lines = LineState.from_bits(_LAYOUT, x, o)
+		self.stats = SearchStats()
+		self.killers: List[List[int]] = [[] for _ in range(10)]
+		self.history = [0] * 9
+
+
+def _ordered_moves(x: int, o: int, maximizing: bool, depth: int, pv_move: Optional[int], ctx: _Context) -> List[int]:
+	"""Return legal moves, most promising first.
+
+	Order: the transposition-table (previous PV) move, immediate wins, forced
+	blocks, killer moves for this ply, then history score and cell priority.
+	"""
+	moves = list(bb.moves(x, o))
+	if not ctx.ordering:
+		return moves
+	me, opp = (o, x) if maximizing else (x, o)
+	killers = ctx.killers[depth]
+	history = ctx.history
+
+	def key(mv: int) -> int:
+		bit = 1 << mv
+		if mv == pv_move:
+			return 1 << 30
+		if bb.WINNING[me | bit]:
+			return 1 << 29
+		if bb.WINNING[opp | bit]:
+			return 1 << 28
+		if mv in killers:
+			return 1 << 27
+		return history[mv] * 4 + _CELL_PRIORITY[mv]
+
+	moves.sort(key=key, reverse=True)
+	return moves
+
+
 def _minimax(
-	board: List[str],
+	x: int,
+	o: int,
 	depth: int,
 	alpha: int,
 	beta: int,
 	maximizing: bool,
 	depth_limit: int,
+	ctx: Optional[_Context] = None,
 ) -> Tuple[Optional[int], int]:
-	"""Return tuple (best_move_index, score)."""
-	terminal = _evaluate_terminal(board, depth)
+	"""Return tuple (best_move_index, score) for the bitboard position `(x, o)`."""
+	if ctx is None:
+		ctx = _Context(x, o)
+	ctx.stats.nodes += 1
+
+	terminal = _evaluate_terminal(ctx.lines, depth)
 	if terminal is not None:
 		return None, terminal
 
 	if depth >= depth_limit:
 		# cutoff: use heuristic
-		return None, _heuristic(board)
+		return None, _heuristic(ctx.lines)
+
+	canon, perm = bb.canonical(x, o)
+	exhaustive = depth_limit - depth >= 9 - (x | o).bit_count()
+	if exhaustive:
+		# Searched to the end of the game: every score is a win/loss/draw, so
+		# it is stored relative to this node and reused at any depth.
+		key = (canon, maximizing)
+	else:
+		# heuristic leaves depend on the depth limit; keep the exact context
+		key = (canon, maximizing, depth, depth_limit)
+	pv_move: Optional[int] = None
+	entry = _TT.get(key)
+	if entry is not None:
+		flag, cached, cmove = entry
+		if exhaustive:
+			cached = _from_node(cached, depth)
+		pv_move = perm[cmove] if cmove is not None else None
+		if flag == TranspositionTable.EXACT:
+			ctx.stats.tt_hits += 1
+			return pv_move, cached
+		# Bounds are not used at the root: against a narrowed window every
+		# move may fail low with the same bound, so the best one is lost.
+		if depth > 0:
+			if flag == TranspositionTable.LOWER:
+				alpha = max(alpha, cached)
+			else:
+				beta = min(beta, cached)
+			if beta <= alpha:
+				ctx.stats.tt_hits += 1
+				return pv_move, cached
+
+	# flag against the window actually searched: a bound from the table may
+	# have narrowed it, and a result outside it is only a bound too
+	alpha_orig, beta_orig = alpha, beta
+	best_move, best_score = _search_children(x, o, depth, alpha, beta, maximizing, depth_limit, pv_move, ctx)
+
+	if best_score <= alpha_orig:
+		flag = TranspositionTable.UPPER
+	elif best_score >= beta_orig:
+		flag = TranspositionTable.LOWER
+	else:
+		flag = TranspositionTable.EXACT
+	stored = _to_node(best_score, depth) if exhaustive else best_score
+	_TT.store(key, flag, stored, perm.index(best_move) if best_move is not None else None)
+	return best_move, best_score
+
+
+def _to_node(score: int, depth: int) -> int:
+	"""Turn a root-relative end-of-game score into one relative to a node at `depth`."""
+	if score > 0:
+		return score + depth
+	if score < 0:
+		return score - depth
+	return 0
+
+
+def _from_node(score: int, depth: int) -> int:
+	"""Inverse of `_to_node`."""
+	if score > 0:
+		return score - depth
+	if score < 0:
+		return score + depth
+	return 0
+
 
+def _search_children(
+	x: int,
+	o: int,
+	depth: int,
+	alpha: int,
+	beta: int,
+	maximizing: bool,
+	depth_limit: int,
+	pv_move: Optional[int],
+	ctx: _Context,
+) -> Tuple[Optional[int], int]:
+	"""Principal-variation search over the children of `(x, o)`.
+
+	The first (best-ordered) child gets the full window; the rest are probed
+	with a null window and only re-searched when they might beat it.
+	"""
 	best_move: Optional[int] = None
+	first = True
+	lines = ctx.lines
 
 	if maximizing:
 		max_eval = -10_000
-		for mv in available_moves(board):
-			board[mv] = AI
-			_, score = _minimax(board, depth + 1, alpha, beta, False, depth_limit)
-			board[mv] = EMPTY
+		for mv in _ordered_moves(x, o, True, depth, pv_move, ctx):
+			child_o = o | 1 << mv
+			lines.make(mv, SIDE_AI)
+			if first:
+				_, score = _minimax(x, child_o, depth + 1, alpha, beta, False, depth_limit, ctx)
+				first = False
+			else:
+				_, score = _minimax(x, child_o, depth + 1, alpha, alpha + 1, False, depth_limit, ctx)
+				if alpha < score < beta:
+					_, score = _minimax(x, child_o, depth + 1, alpha, beta, False, depth_limit, ctx)
+			lines.unmake(mv, SIDE_AI)
 			if score > max_eval:
 				max_eval = score
 				best_move = mv
 			alpha = max(alpha, score)
 			if beta <= alpha:
+				_record_cutoff(ctx, mv, depth, depth_limit)
 				break
 		return best_move, max_eval
 	else:
 		min_eval = 10_000
-		for mv in available_moves(board):
-			board[mv] = HUMAN
-			_, score = _minimax(board, depth + 1, alpha, beta, True, depth_limit)
-			board[mv] = EMPTY
+		for mv in _ordered_moves(x, o, False, depth, pv_move, ctx):
+			child_x = x | 1 << mv
+			lines.make(mv, SIDE_HUMAN)
+			if first:
+				_, score = _minimax(child_x, o, depth + 1, alpha, beta, True, depth_limit, ctx)
+				first = False
+			else:
+				_, score = _minimax(child_x, o, depth + 1, beta - 1, beta, True, depth_limit, ctx)
+				if alpha < score < beta:
+					_, score = _minimax(child_x, o, depth + 1, alpha, beta, True, depth_limit, ctx)
+			lines.unmake(mv, SIDE_HUMAN)
 			if score < min_eval:
 				min_eval = score
 				best_move = mv
 			beta = min(beta, score)
 			if beta <= alpha:
+				_record_cutoff(ctx, mv, depth, depth_limit)
 				break
 		return best_move, min_eval
 
 
-def get_best_move(board: List[str], difficulty: str = "hard") -> Optional[int]:
+def _record_cutoff(ctx: _Context, mv: int, depth: int, depth_limit: int) -> None:
+	ctx.stats.cutoffs += 1
+	killers = ctx.killers[depth]
+	if mv not in killers:
+		killers.insert(0, mv)
+		del killers[2:]
+	remaining = min(depth_limit, 9) - depth
+	ctx.history[mv] += remaining * remaining
+
+
+def get_best_move(
+	board: List[str],
+	difficulty: str = "hard",
+	size: int = 3,
+	win_length: Optional[int] = None,
+	time_ms: Optional[int] = None,
+) -> Optional[int]:
 	"""Return best move index (0-8) for the AI depending on difficulty.
 
 	difficulty: 'easy' | 'medium' | 'hard'
 	- easy: random available move
 	- medium: minimax with depth limit (quick lookahead)
-	- hard: full minimax with alpha-beta (exhaustive)
+	- hard: precomputed perfect-play table (see `game.table`), falling back
+	  to full minimax with alpha-beta when the table is not loaded
+
+	Boards other than 3x3 (or 3x3 with a different `win_length`) are handed to
+	`engine.search`, where difficulty maps to a search time budget and depth
+	cap; `time_ms` overrides the budget.
+
+	difficulty 'mcts' runs `mcts.search` (parallel Monte Carlo Tree Search)
+	for `time_ms` on any board size.
 	"""
-	if not isinstance(board, list) or len(board) != 9:
-		raise ValueError("board must be a list of 9 elements")
+	move, _ = analyse(board, difficulty, size, win_length, time_ms)
+	return move
+
+
+def time_budget_ms(difficulty: str, size: int = 3, win_length: Optional[int] = None, time_ms: Optional[int] = None) -> int:
+	"""Upper bound on the search time `analyse` spends for these options, in ms.
+
+	Classic 3x3 and 'easy' searches are effectively free and count as 0.
+	"""
+	difficulty = (difficulty or "hard").lower()
+	win_length = win_length or default_win_length(size)
+	if difficulty == "mcts":
+		return max(1, min(int(time_ms or mcts.DEFAULT_TIME_MS), engine.MAX_TIME_MS))
+	if difficulty == "easy" or (size == 3 and win_length == 3):
+		return 0
+	budget, _ = engine.DIFFICULTY_SETTINGS.get(difficulty, engine.DIFFICULTY_SETTINGS["hard"])
+	if time_ms is not None:
+		budget = max(1, min(int(time_ms), engine.MAX_TIME_MS))
+	return budget
+
+
+def analyse(
+	board: List[str],
+	difficulty: str = "hard",
+	size: int = 3,
+	win_length: Optional[int] = None,
+	time_ms: Optional[int] = None,
+	ordering: bool = True,
+) -> Tuple[Optional[int], SearchStats]:
+	"""Like `get_best_move`, but also return the `SearchStats` of the search.
+
+	`ordering=False` searches moves in index order, to measure how much the
+	move-ordering heuristics reduce the node count.
+	"""
+	if not isinstance(size, int) or not MIN_SIZE <= size <= MAX_SIZE:
+		raise ValueError(f"size must be between {MIN_SIZE} and {MAX_SIZE}")
+	cells = size * size
+	if not isinstance(board, list) or len(board) != cells:
+		raise ValueError(f"board must be a list of {cells} elements")
+	win_length = win_length or default_win_length(size)
+	if not isinstance(win_length, int) or not 3 <= win_length <= size:
+		raise ValueError("win_length must be between 3 and the board size")
 
 	moves = available_moves(board)
 	if not moves:
-		return None
+		return None, SearchStats()
 
 	difficulty = (difficulty or "hard").lower()
+	if difficulty == "mcts":
+		x, o = _to_bits(board)
+		return mcts.search(x, o, size, win_length, time_ms)
+	if size != 3 or win_length != 3:
+		x, o = _to_bits(board)
+		return engine.search(x, o, size, win_length, difficulty, time_ms, ordering)
+
 	if difficulty == "easy":
-		return random.choice(moves)
+		return random.choice(moves), SearchStats()
 
 	if difficulty == "medium":
 		depth_limit = 3  # shallow lookahead
 	else:
+		# imported here: game.table builds itself on top of this module
+		from . import table
+
+		solved = table.lookup(board)
+		if solved is not None:
+			stats = SearchStats()
+			stats.table_hits = 1
+			return solved, stats
 		depth_limit = 9  # full search
 
-	best_move, _ = _minimax(board, depth=0, alpha=-10_000, beta=10_000, maximizing=True, depth_limit=depth_limit)
+	x, o = _to_bits(board)
+	ctx = _Context(x, o, ordering)
+	best_move, _ = _minimax(x, o, depth=0, alpha=-10_000, beta=10_000, maximizing=True, depth_limit=depth_limit, ctx=ctx)
+	ctx.stats.depth = min(depth_limit, len(moves))
 	# Fallback to random move if minimax didn't pick one (shouldn't happen)
-	return best_move if best_move is not None else random.choice(moves)
-
+	return (best_move if best_move is not None else random.choice(moves)), ctx.stats
 
-__all__ = ["get_best_move"]
 
+__all__ = ["get_best_move", "analyse", "time_budget_ms"]
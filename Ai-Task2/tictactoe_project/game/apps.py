@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class GameConfig(AppConfig):
     name = 'game'
+
+    def ready(self):
+        # Map the perfect-play table once per process; the OS shares its
+        # pages between workers. Hard mode falls back to search without it.
+        from . import table
+
+        table.load_table()
@@ -0,0 +1,192 @@
+"""Benchmark corpus and measurements for the game AI.
+
+Used by `manage.py bench_ai`. Positions are generated from a fixed seed so
+every run searches the same boards: openings, midgames and near-terminal
+positions for each board variant. Engine cases call `ai.analyse` directly
+(with the transposition table cleared first, so each search is cold) and
+report latency percentiles and nodes/sec; request cases drive `move/` and
+`move/batch/` through the Django test client.
+
+Results are plain dicts so they can be saved as a JSON baseline and compared
+against later runs with `compare`.
+"""
+
+import json
+import platform
+import random
+import time
+from typing import Dict, List, Optional, Sequence
+
+from . import ai
+from . import table
+
+
+SEED = 20240601
+
+# (name, size, difficulty, time_ms)
+ENGINE_CASES = (
+	("3x3-medium", 3, "medium", None),
+	("3x3-hard", 3, "hard", None),
+	("4x4-hard", 4, "hard", 100),
+	("5x5-medium", 5, "medium", None),
+	("15x15-medium", 15, "medium", None),
+	("15x15-hard", 15, "hard", 200),
+	("7x7-mcts", 7, "mcts", 100),
+)
+
+# phase -> marks already on the board
+PHASES = {"opening": (1, 1), "midgame": (3, 5), "endgame": (5, 7)}
+POSITIONS_PER_PHASE = 4
+
+
+def _random_position(rng: random.Random, size: int, marks: int) -> Optional[List[str]]:
+	"""Play `marks` random moves (X first) without anyone winning; AI to move."""
+	lines = ai.line_state([ai.EMPTY] * (size * size), size)
+	board = [ai.EMPTY] * (size * size)
+	cells = list(range(size * size))
+	rng.shuffle(cells)
+	player = ai.HUMAN
+	placed = 0
+	for cell in cells:
+		if placed == marks:
+			break
+		side = 0 if player == ai.HUMAN else 1
+		lines.make(cell, side)
+		if lines.has_won(side):
+			lines.unmake(cell, side)
+			continue
+		board[cell] = player
+		player = ai.AI if player == ai.HUMAN else ai.HUMAN
+		placed += 1
+	if placed != marks or lines.is_full():
+		return None
+	return board
+
+
+def corpus(size: int) -> Dict[str, List[List[str]]]:
+	"""Return the fixed positions for `size`, grouped by game phase."""
+	rng = random.Random(SEED + size)
+	out: Dict[str, List[List[str]]] = {}
+	for phase, (lo, hi) in PHASES.items():
+		positions = []
+		while len(positions) < POSITIONS_PER_PHASE:
+			# odd mark counts leave the AI (O) to move
+			marks = rng.choice([n for n in range(lo, hi + 1) if n % 2 == 1])
+			board = _random_position(rng, size, min(marks, size * size - 1))
+			if board is not None:
+				positions.append(board)
+		out[phase] = positions
+	return out
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+	"""Nearest-rank percentile of `samples`."""
+	ordered = sorted(samples)
+	if not ordered:
+		return 0.0
+	rank = max(1, int(round(pct / 100 * len(ordered))))
+	return ordered[min(rank, len(ordered)) - 1]
+
+
+def _summary(latencies: List[float], nodes: int) -> dict:
+	total = sum(latencies)
+	return {
+		"samples": len(latencies),
+		"p50_ms": round(percentile(latencies, 50) * 1000, 3),
+		"p99_ms": round(percentile(latencies, 99) * 1000, 3),
+		"mean_ms": round(total / len(latencies) * 1000, 3) if latencies else 0.0,
+		"nodes": nodes,
+		"nodes_per_sec": round(nodes / total) if total else 0,
+	}
+
+
+def bench_engine(repeat: int = 3, cases=ENGINE_CASES) -> Dict[str, dict]:
+	results = {}
+	for name, size, difficulty, time_ms in cases:
+		positions = [b for boards in corpus(size).values() for b in boards]
+		latencies: List[float] = []
+		nodes = 0
+		for _ in range(repeat):
+			for board in positions:
+				ai._TT.clear()
+				start = time.perf_counter()
+				_, stats = ai.analyse(list(board), difficulty, size, time_ms=time_ms)
+				latencies.append(time.perf_counter() - start)
+				nodes += stats.nodes
+		results[name] = _summary(latencies, nodes)
+	return results
+
+
+def bench_requests(repeat: int = 3) -> Dict[str, dict]:
+	"""Measure `move/` and `move/batch/` end to end via the test client."""
+	from django.test import Client
+	from django.urls import reverse
+
+	client = Client()
+	move_url = reverse("game:move")
+	batch_url = reverse("game:move-batch")
+	positions = [b for boards in corpus(3).values() for b in boards]
+
+	results = {}
+	for difficulty in ("easy", "medium", "hard"):
+		latencies = []
+		for _ in range(repeat):
+			for board in positions:
+				body = json.dumps({"board": board, "difficulty": difficulty})
+				start = time.perf_counter()
+				response = client.post(move_url, body, content_type="application/json")
+				latencies.append(time.perf_counter() - start)
+				if response.status_code != 200:
+					raise RuntimeError(f"move/ returned {response.status_code}: {response.content!r}")
+		results[f"move-{difficulty}"] = _summary(latencies, 0)
+
+	items = [{"board": b, "difficulty": "medium"} for b in positions] * 25
+	body = json.dumps({"items": items})
+	latencies = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		response = client.post(batch_url, body, content_type="application/json")
+		latencies.append(time.perf_counter() - start)
+		if response.status_code != 200:
+			raise RuntimeError(f"move/batch/ returned {response.status_code}: {response.content!r}")
+	summary = _summary(latencies, 0)
+	summary["positions_per_sec"] = round(len(items) * len(latencies) / sum(latencies))
+	results["batch-medium"] = summary
+	return results
+
+
+def run(repeat: int = 3, requests: bool = True) -> dict:
+	report = {
+		"meta": {
+			"python": platform.python_version(),
+			"machine": platform.machine(),
+			"table_loaded": table.lookup([ai.EMPTY] * 9) is not None,
+			"repeat": repeat,
+		},
+		"engine": bench_engine(repeat),
+	}
+	if requests:
+		report["requests"] = bench_requests(repeat)
+	return report
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+	"""Return a message for every metric that regressed by more than `threshold`.
+
+	Latencies may grow and nodes/sec may shrink by at most `threshold`
+	(0.2 = 20%) relative to the baseline. Cases missing from either side are
+	skipped.
+	"""
+	regressions = []
+	for section in ("engine", "requests"):
+		for name, base in baseline.get(section, {}).items():
+			now = current.get(section, {}).get(name)
+			if now is None:
+				continue
+			for metric in ("p50_ms", "p99_ms"):
+				if base[metric] and now[metric] > base[metric] * (1 + threshold):
+					regressions.append(f"{section}/{name} {metric}: {base[metric]} -> {now[metric]}")
+			for metric in ("nodes_per_sec", "positions_per_sec"):
+				if base.get(metric) and now.get(metric, 0) < base[metric] * (1 - threshold):
+					regressions.append(f"{section}/{name} {metric}: {base[metric]} -> {now.get(metric, 0)}")
+	return regressions
@@ -0,0 +1,95 @@
+"""Bitboard primitives for the 3x3 Tic-Tac-Toe search.
+
+A position is a pair of 9-bit integers `(x, o)`: bit `i` is set when cell `i`
+holds that player's mark. Win detection, fullness and symmetry folding are
+table lookups, and moves are generated by iterating the set bits of the empty
+mask. Positions are immutable ints, so "make" is `bits | (1 << i)` and "unmake"
+is simply keeping the previous value.
+"""
+
+from typing import Iterator, Tuple
+
+
+WIN_LINES = (
+	(0, 1, 2),
+	(3, 4, 5),
+	(6, 7, 8),
+	(0, 3, 6),
+	(1, 4, 7),
+	(2, 5, 8),
+	(0, 4, 8),
+	(2, 4, 6),
+)
+
+FULL = (1 << 9) - 1
+
+WIN_MASKS = tuple(sum(1 << i for i in line) for line in WIN_LINES)
+
+# WINNING[bits] is True when `bits` contains a complete line.
+WINNING = tuple(any(bits & m == m for m in WIN_MASKS) for bits in range(1 << 9))
+
+# Index of the single set bit, for bits produced by `bits & -bits`.
+BIT_INDEX = {1 << i: i for i in range(9)}
+
+
+def is_full(x: int, o: int) -> bool:
+	return (x | o) == FULL
+
+
+def moves(x: int, o: int) -> Iterator[int]:
+	"""Yield empty cell indices in ascending order."""
+	empty = FULL & ~(x | o)
+	while empty:
+		low = empty & -empty
+		yield BIT_INDEX[low]
+		empty ^= low
+
+
+def _symmetries() -> Tuple[Tuple[int, ...], ...]:
+	"""Return the 8 symmetries of the 3x3 grid as index permutations.
+
+	For a permutation `perm`, cell `i` of the transformed board is cell
+	`perm[i]` of the original.
+	"""
+	transforms = (
+		lambda r, c: (r, c),
+		lambda r, c: (c, 2 - r),
+		lambda r, c: (2 - r, 2 - c),
+		lambda r, c: (2 - c, r),
+		lambda r, c: (r, 2 - c),
+		lambda r, c: (2 - r, c),
+		lambda r, c: (c, r),
+		lambda r, c: (2 - c, 2 - r),
+	)
+	perms = []
+	for fn in transforms:
+		cells = (fn(*divmod(i, 3)) for i in range(9))
+		perms.append(tuple(3 * r + c for r, c in cells))
+	return tuple(perms)
+
+
+SYMMETRIES = _symmetries()
+
+
+def _permute(bits: int, perm: Tuple[int, ...]) -> int:
+	return sum(1 << i for i, src in enumerate(perm) if bits >> src & 1)
+
+
+# SYM_TABLES[s][bits] is `bits` transformed by SYMMETRIES[s].
+SYM_TABLES = tuple(tuple(_permute(bits, perm) for bits in range(1 << 9)) for perm in SYMMETRIES)
+
+
+def canonical(x: int, o: int) -> Tuple[int, Tuple[int, ...]]:
+	"""Return `(key, perm)` for the smallest symmetric variant of the position.
+
+	`key` packs the transformed boards as `x | o << 9`; index `i` of the
+	canonical board corresponds to index `perm[i]` of the original.
+	"""
+	best_key = -1
+	best = 0
+	for s, table in enumerate(SYM_TABLES):
+		key = table[x] | table[o] << 9
+		if best_key < 0 or key < best_key:
+			best_key = key
+			best = s
+	return best_key, SYMMETRIES[best]
@@ -0,0 +1,316 @@
+"""Time-bounded search for N x N boards with k-in-a-row wins.
+
+Used by `ai.get_best_move` for every variant other than classic 3x3, where an
+exhaustive minimax is infeasible (a 15x15 gomoku board has 225 cells).
+
+The board is a pair of bitboards over `size * size` cells, with a `LineState`
+tracking per-line counts for win detection and evaluation. Winning lines are
+generated once per `(size, win_length)` by `geometry()`. The search is a
+negamax alpha-beta with iterative deepening: each completed depth refines the
+best move, and when the millisecond budget runs out the best move found so far
+is returned, so latency is bounded no matter how large the board is.
+"""
+
+import random
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .lines import SIDE_AI, SIDE_HUMAN, Layout, LineState
+from .stats import SearchStats
+
+
+WIN_SCORE = 10 ** 18
+INF = 10 * WIN_SCORE
+
+# difficulty -> (time budget in ms, maximum depth)
+DIFFICULTY_SETTINGS: Dict[str, Tuple[int, int]] = {
+	"medium": (100, 2),
+	"hard": (500, 64),
+}
+MAX_TIME_MS = 5_000
+
+# How many nodes to visit between clock checks. A node on a large board costs
+# up to ~100 us, so this keeps the overshoot to a few milliseconds.
+_CLOCK_INTERVAL = 32
+
+
+class Geometry:
+	"""Precomputed line and neighbourhood tables for one board variant."""
+
+	def __init__(self, size: int, win_length: int):
+		self.size = size
+		self.win_length = win_length
+		self.cells = size * size
+		self.full = (1 << self.cells) - 1
+
+		lines = []
+		for r in range(size):
+			for c in range(size):
+				for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+					end_r = r + dr * (win_length - 1)
+					end_c = c + dc * (win_length - 1)
+					if 0 <= end_r < size and 0 <= end_c < size:
+						lines.append(tuple((r + dr * i) * size + c + dc * i for i in range(win_length)))
+		self.lines: Tuple[Tuple[int, ...], ...] = tuple(lines)
+		masks = tuple(sum(1 << i for i in line) for line in lines)
+		# cell -> bit masks of the lines through it, for fast win checks
+		self.cell_masks: Tuple[Tuple[int, ...], ...] = tuple(
+			tuple(masks[j] for j, line in enumerate(lines) if i in line) for i in range(self.cells)
+		)
+
+		# Only cells close to existing marks are considered as moves.
+		radius = 2 if size <= 6 else 1
+		near = []
+		for i in range(self.cells):
+			r, c = divmod(i, size)
+			mask = 0
+			for nr in range(max(0, r - radius), min(size, r + radius + 1)):
+				for nc in range(max(0, c - radius), min(size, c + radius + 1)):
+					mask |= 1 << (nr * size + nc)
+			near.append(mask)
+		self.near: Tuple[int, ...] = tuple(near)
+
+		# Cells ranked by distance from the centre, used for move ordering.
+		mid = (size - 1) / 2
+		self.rank: Tuple[int, ...] = tuple(
+			max(abs(r - mid), abs(c - mid)) * size + abs(r - mid) + abs(c - mid)
+			for r, c in (divmod(i, size) for i in range(self.cells))
+		)
+		self.center = min(range(self.cells), key=self.rank.__getitem__)
+
+		# Window weight by number of marks: open lines with more marks matter more.
+		weights = tuple(0 if n == 0 else 10 ** (n - 1) for n in range(win_length + 1))
+		self.layout = Layout(self.lines, weights, self.cells)
+
+	def wins(self, bits: int, cell: int) -> bool:
+		"""True if `bits` completes a line through `cell`."""
+		return any(bits & m == m for m in self.cell_masks[cell])
+
+	def candidates(self, occupied: int) -> List[int]:
+		"""Empty cells near existing marks, most central first."""
+		if not occupied:
+			return [self.center]
+		zone = 0
+		bits = occupied
+		while bits:
+			low = bits & -bits
+			zone |= self.near[low.bit_length() - 1]
+			bits ^= low
+		zone &= self.full & ~occupied
+		moves = []
+		while zone:
+			low = zone & -zone
+			moves.append(low.bit_length() - 1)
+			zone ^= low
+		moves.sort(key=self.rank.__getitem__)
+		return moves
+
+
+@lru_cache(maxsize=None)
+def geometry(size: int, win_length: int) -> Geometry:
+	return Geometry(size, win_length)
+
+
+class _Timeout(Exception):
+	pass
+
+
+class _Search:
+	"""One iterative-deepening search: clock, counters and move-ordering state.
+
+	Moves are tried in this order: the previous iteration's principal
+	variation move, immediate wins, forced blocks, killer moves for the ply,
+	then history score (ties keep the centre-first candidate order).
+
+	The AI moves at even plies. `state` is made/unmade alongside the
+	bitboards; after a timeout it is left mid-search and must be discarded.
+	"""
+
+	def __init__(self, geo: Geometry, state: LineState, deadline: float, ordering: bool = True):
+		self.geo = geo
+		self.state = state
+		self.deadline = deadline
+		self.ordering = ordering
+		self.stats = SearchStats()
+		self.killers: Dict[int, List[int]] = {}
+		self.history = [0] * geo.cells
+		# ply -> move of the previous iteration's principal variation
+		self.pv: Dict[int, int] = {}
+		# ply -> best line found below that ply in the current iteration
+		self.pv_lines: Dict[int, List[int]] = {}
+
+	def order(self, moves: List[int], side: int, ply: int) -> List[int]:
+		if not self.ordering:
+			return moves
+		state = self.state
+		pv_move = self.pv.get(ply)
+		killers = self.killers.get(ply, ())
+		history = self.history
+
+		def key(mv: int) -> int:
+			if mv == pv_move:
+				return 4 << 40
+			if state.completes(mv, side):
+				return 3 << 40
+			if state.completes(mv, 1 - side):
+				return 2 << 40
+			if mv in killers:
+				return 1 << 40
+			return history[mv]
+
+		moves.sort(key=key, reverse=True)
+		return moves
+
+	def cutoff(self, mv: int, depth: int, ply: int) -> None:
+		self.stats.cutoffs += 1
+		killers = self.killers.setdefault(ply, [])
+		if mv not in killers:
+			killers.insert(0, mv)
+			del killers[2:]
+		self.history[mv] += depth * depth
+
+	def negamax(self, occupied: int, depth: int, alpha: int, beta: int, ply: int) -> int:
+		stats = self.stats
+		stats.nodes += 1
+		if stats.nodes % _CLOCK_INTERVAL == 0 and time.perf_counter() >= self.deadline:
+			raise _Timeout
+
+		state = self.state
+		side = SIDE_HUMAN if ply & 1 else SIDE_AI
+		self.pv_lines[ply] = []
+		if depth == 0:
+			return state.score if side == SIDE_AI else -state.score
+
+		moves = self.geo.candidates(occupied)
+		if not moves:
+			return 0
+
+		best = -INF
+		for i, mv in enumerate(self.order(moves, side, ply)):
+			child = occupied | 1 << mv
+			state.make(mv, side)
+			if state.has_won(side):
+				score = WIN_SCORE - ply - 1
+				self.pv_lines[ply + 1] = []
+			elif i == 0:
+				score = -self.negamax(child, depth - 1, -beta, -alpha, ply + 1)
+			else:
+				# principal-variation search: prove the move is no better with
+				# a null window, re-search only if that fails
+				score = -self.negamax(child, depth - 1, -alpha - 1, -alpha, ply + 1)
+				if alpha < score < beta:
+					score = -self.negamax(child, depth - 1, -beta, -alpha, ply + 1)
+			state.unmake(mv, side)
+			if score > best:
+				best = score
+				if score > alpha:
+					alpha = score
+					self.pv_lines[ply] = [mv] + self.pv_lines.get(ply + 1, [])
+					if alpha >= beta:
+						self.cutoff(mv, depth, ply)
+						break
+		return best
+
+	def root(self, occupied: int, depth: int, moves: List[int]) -> Tuple[Optional[int], int]:
+		"""Search every root move; return the best one completed before timing out."""
+		state = self.state
+		best_move: Optional[int] = None
+		best = -INF
+		alpha = -INF
+		for i, mv in enumerate(moves):
+			if time.perf_counter() >= self.deadline:
+				return best_move, best
+			child = occupied | 1 << mv
+			state.make(mv, SIDE_AI)
+			if state.has_won(SIDE_AI):
+				score = WIN_SCORE - 1
+				self.pv_lines[1] = []
+			else:
+				try:
+					if i == 0:
+						score = -self.negamax(child, depth - 1, -INF, -alpha, 1)
+					else:
+						score = -self.negamax(child, depth - 1, -alpha - 1, -alpha, 1)
+						if score > alpha:
+							score = -self.negamax(child, depth - 1, -INF, -alpha, 1)
+				except _Timeout:
+					# moves are ordered previous-best first, so a partial
+					# iteration is still at least as informed as the last one
+					return best_move, best
+			state.unmake(mv, SIDE_AI)
+			if score > best:
+				best = score
+				best_move = mv
+				alpha = max(alpha, score)
+				self.pv_lines[0] = [mv] + self.pv_lines.get(1, [])
+		return best_move, best
+
+
+def search(
+	x: int,
+	o: int,
+	size: int,
+	win_length: int,
+	difficulty: str = "hard",
+	time_ms: Optional[int] = None,
+	ordering: bool = True,
+	pv_hint: Sequence[int] = (),
+) -> Tuple[Optional[int], SearchStats]:
+	"""Return `(move, stats)` for `o` (the AI) on a `size` x `size` board.
+
+	`x` and `o` are the human and AI bitboards, cell `i` being bit `i`.
+	`difficulty` selects the default time budget and depth cap; `time_ms`
+	overrides the budget (clamped to `MAX_TIME_MS`). `ordering=False` turns
+	off move ordering, for measuring its effect on the node count.
+
+	`pv_hint` is an expected line of play from this position (e.g. the tail
+	of the previous turn's principal variation); it seeds move ordering so
+	the first iterations re-find it cheaply. `stats.pv` returns the new one.
+	"""
+	start = time.perf_counter()
+	geo = geometry(size, win_length)
+	moves = geo.candidates(x | o)
+	if not moves:
+		return None, SearchStats()
+
+	if difficulty == "easy":
+		return random.choice(moves), SearchStats()
+
+	budget, max_depth = DIFFICULTY_SETTINGS.get(difficulty, DIFFICULTY_SETTINGS["hard"])
+	if time_ms is not None:
+		budget = max(1, min(int(time_ms), MAX_TIME_MS))
+	searcher = _Search(geo, LineState.from_bits(geo.layout, x, o), start + budget / 1000, ordering)
+	searcher.pv = dict(enumerate(pv_hint))
+	searcher.order(moves, SIDE_AI, 0)
+
+	best = moves[0]
+	empty = geo.cells - (x | o).bit_count()
+	for depth in range(1, min(max_depth, empty) + 1):
+		move, score = searcher.root(x | o, depth, moves)
+		if move is None:
+			break
+		best = move
+		timed_out = time.perf_counter() >= searcher.deadline
+		if not timed_out:
+			searcher.stats.depth = depth
+			searcher.stats.pv = searcher.pv_lines.get(0, [])
+		if abs(score) >= WIN_SCORE - depth or timed_out:
+			# forced result found, or no time left for another iteration
+			break
+		searcher.pv = dict(enumerate(searcher.pv_lines.get(0, [])))
+		moves.remove(move)
+		moves.insert(0, move)
+	return best, searcher.stats
+
+
+def best_move(
+	x: int,
+	o: int,
+	size: int,
+	win_length: int,
+	difficulty: str = "hard",
+	time_ms: Optional[int] = None,
+) -> Optional[int]:
+	"""Return the move for `o` (the AI) on a `size` x `size` board, or None."""
+	return search(x, o, size, win_length, difficulty, time_ms)[0]
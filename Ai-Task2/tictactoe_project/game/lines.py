@@ -0,0 +1,122 @@
+"""Incrementally maintained per-line mark counts.
+
+`LineState` keeps, for every winning line of a board, how many marks each
+side has in it. `make`/`unmake` touch only the lines through the played cell,
+so win detection, fullness and the open-line heuristic are O(1) reads instead
+of a rescan of the board at every search node.
+
+Sides are indices: `SIDE_HUMAN` (X) and `SIDE_AI` (O).
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+
+SIDE_HUMAN = 0
+SIDE_AI = 1
+
+
+class Layout:
+	"""Static description of a board variant shared by all its states.
+
+	`weights[n]` is the value of a line holding `n` marks of one side and none
+	of the other; the heuristic score is the sum over lines, positive for AI.
+	"""
+
+	def __init__(self, lines: Sequence[Tuple[int, ...]], weights: Sequence[int], cells: int):
+		self.lines = tuple(lines)
+		self.length = len(self.lines[0])
+		self.weights = tuple(weights)
+		self.cells = cells
+		cell_lines: List[List[int]] = [[] for _ in range(cells)]
+		for j, line in enumerate(self.lines):
+			for cell in line:
+				cell_lines[cell].append(j)
+		self.cell_lines = tuple(tuple(js) for js in cell_lines)
+
+
+class LineState:
+	"""Mutable line counts for one position of a `Layout`."""
+
+	__slots__ = ("layout", "counts", "completed", "filled", "score")
+
+	def __init__(self, layout: Layout):
+		n = len(layout.lines)
+		self.layout = layout
+		self.counts = ([0] * n, [0] * n)
+		self.completed = [0, 0]
+		self.filled = 0
+		self.score = 0
+
+	@classmethod
+	def from_bits(cls, layout: Layout, x: int, o: int) -> "LineState":
+		"""Build the state for human bitboard `x` and AI bitboard `o`."""
+		state = cls(layout)
+		for bits, side in ((x, SIDE_HUMAN), (o, SIDE_AI)):
+			while bits:
+				low = bits & -bits
+				state.make(low.bit_length() - 1, side)
+				bits ^= low
+		return state
+
+	def make(self, cell: int, side: int) -> None:
+		layout = self.layout
+		weights = layout.weights
+		k = layout.length
+		mine = self.counts[side]
+		theirs = self.counts[1 - side]
+		delta = 0
+		for j in layout.cell_lines[cell]:
+			a = mine[j]
+			b = theirs[j]
+			if not b:
+				delta += weights[a + 1] - weights[a]
+			elif not a:
+				# the opponent's open line is now blocked
+				delta += weights[b]
+			mine[j] = a + 1
+			if a + 1 == k:
+				self.completed[side] += 1
+		self.score += delta if side == SIDE_AI else -delta
+		self.filled += 1
+
+	def unmake(self, cell: int, side: int) -> None:
+		layout = self.layout
+		weights = layout.weights
+		k = layout.length
+		mine = self.counts[side]
+		theirs = self.counts[1 - side]
+		delta = 0
+		for j in layout.cell_lines[cell]:
+			a = mine[j] - 1
+			b = theirs[j]
+			if a + 1 == k:
+				self.completed[side] -= 1
+			mine[j] = a
+			if not b:
+				delta += weights[a + 1] - weights[a]
+			elif not a:
+				delta += weights[b]
+		self.score -= delta if side == SIDE_AI else -delta
+		self.filled -= 1
+
+	def has_won(self, side: int) -> bool:
+		return self.completed[side] > 0
+
+	def is_full(self) -> bool:
+		return self.filled == self.layout.cells
+
+	def completes(self, cell: int, side: int) -> bool:
+		"""True if `side` playing `cell` would complete a line."""
+		need = self.layout.length - 1
+		mine = self.counts[side]
+		theirs = self.counts[1 - side]
+		return any(mine[j] == need and not theirs[j] for j in self.layout.cell_lines[cell])
+
+	def winning_line(self, side: int) -> Optional[List[int]]:
+		if not self.completed[side]:
+			return None
+		k = self.layout.length
+		for j, count in enumerate(self.counts[side]):
+			if count == k:
+				return list(self.layout.lines[j])
+		return None
@@ -0,0 +1,51 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game import benchmark
+
+
+class Command(BaseCommand):
+	help = (
+		"Benchmark the game AI (engine latency, nodes/sec, end-to-end requests). "
+		"Optionally save the results as a baseline or fail on regressions against one."
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument("--repeat", type=int, default=3, help="Passes over the corpus (default: %(default)s)")
+		parser.add_argument("--engine-only", action="store_true", help="Skip the Django request benchmarks")
+		parser.add_argument("--save", metavar="PATH", help="Write the results to PATH as a JSON baseline")
+		parser.add_argument("--baseline", metavar="PATH", help="Compare against the JSON baseline at PATH")
+		parser.add_argument(
+			"--threshold",
+			type=float,
+			default=0.25,
+			help="Allowed relative slowdown before a metric counts as a regression (default: %(default)s)",
+		)
+		parser.add_argument("--json", action="store_true", help="Print the full results as JSON")
+
+	def handle(self, *args, **options):
+		report = benchmark.run(repeat=options["repeat"], requests=not options["engine_only"])
+
+		if options["json"]:
+			self.stdout.write(json.dumps(report, indent=2))
+		else:
+			for section in ("engine", "requests"):
+				for name, row in report.get(section, {}).items():
+					self.stdout.write(
+						f"{section:8} {name:14} p50={row['p50_ms']:>9.3f}ms p99={row['p99_ms']:>9.3f}ms "
+						f"nodes/s={row['nodes_per_sec']:>9}"
+					)
+
+		if options["save"]:
+			with open(options["save"], "w", encoding="utf-8") as fh:
+				json.dump(report, fh, indent=2)
+			self.stdout.write(self.style.SUCCESS(f"Saved baseline to {options['save']}"))
+
+		if options["baseline"]:
+			with open(options["baseline"], encoding="utf-8") as fh:
+				baseline = json.load(fh)
+			regressions = benchmark.compare(baseline, report, options["threshold"])
+			if regressions:
+				raise CommandError("Performance regressions:\n  " + "\n  ".join(regressions))
+			self.stdout.write(self.style.SUCCESS("No regressions against baseline"))
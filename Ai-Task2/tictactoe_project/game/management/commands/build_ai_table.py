@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from game import table
+
+
+class Command(BaseCommand):
+	help = "Solve every Tic-Tac-Toe position and write the perfect-play table loaded at startup."
+
+	def add_arguments(self, parser):
+		parser.add_argument(
+			"--output",
+			default=str(table.DEFAULT_PATH),
+			help="Where to write the table (default: %(default)s)",
+		)
+
+	def handle(self, *args, **options):
+		solved = table.build_table(options["output"])
+		self.stdout.write(self.style.SUCCESS(f"Wrote {solved} positions to {options['output']}"))
@@ -0,0 +1,179 @@
+"""Monte Carlo Tree Search for boards too large for minimax.
+
+UCT selects down the tree, one child is expanded per iteration (among the
+cells near existing marks, as in `game.engine`), and the result comes from a
+uniformly random playout over all empty cells on plain bitboards. Search is
+bounded by a time budget and/or a playout count.
+
+Root parallelism: each pool worker grows its own tree from the same position
+with a different seed; the parent sums the root children's visit counts and
+plays the most visited move.
+"""
+
+import math
+import multiprocessing
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .engine import MAX_TIME_MS, Geometry, geometry
+from .lines import SIDE_HUMAN
+from .stats import SearchStats
+
+
+DEFAULT_TIME_MS = 500
+EXPLORATION = 1.4
+DRAW = -1
+
+# How many playouts to run between clock checks.
+_CLOCK_INTERVAL = 16
+
+
+class _Node:
+	__slots__ = ("move", "parent", "side", "children", "untried", "visits", "wins", "winner")
+
+	def __init__(self, move: Optional[int], parent: Optional["_Node"], side: int, untried: List[int]):
+		self.move = move
+		self.parent = parent
+		# the side that played `move` to reach this node
+		self.side = side
+		self.children: List["_Node"] = []
+		self.untried = untried
+		self.visits = 0
+		# results for `side`: 1 per win, 0.5 per draw
+		self.wins = 0.0
+		# SIDE_HUMAN/SIDE_AI/DRAW for terminal nodes, else None
+		self.winner: Optional[int] = None
+
+	def select(self) -> "_Node":
+		log_n = math.log(self.visits)
+		return max(
+			self.children,
+			key=lambda c: c.wins / c.visits + EXPLORATION * math.sqrt(log_n / c.visits),
+		)
+
+
+def _playout(bits: List[int], side: int, geo: Geometry, rng: random.Random) -> int:
+	"""Play random moves from `bits` with `side` to move; return the winner."""
+	bits = list(bits)
+	empty = geo.full & ~(bits[0] | bits[1])
+	cells = []
+	while empty:
+		low = empty & -empty
+		cells.append(low.bit_length() - 1)
+		empty ^= low
+	rng.shuffle(cells)
+	cell_masks = geo.cell_masks
+	for cell in cells:
+		mine = bits[side] | 1 << cell
+		bits[side] = mine
+		for m in cell_masks[cell]:
+			if mine & m == m:
+				return side
+		side = 1 - side
+	return DRAW
+
+
+def _run(
+	x: int, o: int, size: int, win_length: int, time_ms: int, playouts: int, seed: Optional[int],
+) -> Dict[int, Tuple[int, float]]:
+	"""Grow one tree; return {root move: (visits, wins)}."""
+	geo = geometry(size, win_length)
+	rng = random.Random(seed)
+	deadline = time.perf_counter() + time_ms / 1000
+	root = _Node(None, None, SIDE_HUMAN, geo.candidates(x | o))
+
+	count = 0
+	while count < playouts:
+		if count % _CLOCK_INTERVAL == 0 and time.perf_counter() >= deadline:
+			break
+		node = root
+		# indexed by side: SIDE_HUMAN -> x, SIDE_AI -> o
+		bits = [x, o]
+
+		# selection
+		while not node.untried and node.children and node.winner is None:
+			node = node.select()
+			bits[node.side] |= 1 << node.move
+
+		# expansion
+		if node.untried and node.winner is None:
+			mv = node.untried.pop(rng.randrange(len(node.untried)))
+			side = 1 - node.side
+			bits[side] |= 1 << mv
+			occupied = bits[0] | bits[1]
+			if geo.wins(bits[side], mv):
+				child = _Node(mv, node, side, [])
+				child.winner = side
+			elif occupied == geo.full:
+				child = _Node(mv, node, side, [])
+				child.winner = DRAW
+			else:
+				child = _Node(mv, node, side, geo.candidates(occupied))
+			node.children.append(child)
+			node = child
+
+		# simulation
+		result = node.winner if node.winner is not None else _playout(bits, 1 - node.side, geo, rng)
+
+		# backpropagation
+		while node is not None:
+			node.visits += 1
+			if result == node.side:
+				node.wins += 1
+			elif result == DRAW:
+				node.wins += 0.5
+			node = node.parent
+		count += 1
+
+	return {c.move: (c.visits, c.wins) for c in root.children}
+
+
+def _run_job(job: tuple) -> Dict[int, Tuple[int, float]]:
+	return _run(*job)
+
+
+def search(
+	x: int,
+	o: int,
+	size: int,
+	win_length: int,
+	time_ms: Optional[int] = None,
+	playouts: Optional[int] = None,
+	parallel: bool = True,
+) -> Tuple[Optional[int], SearchStats]:
+	"""Return `(move, stats)` for `o` (the AI); `stats.nodes` counts playouts.
+
+	Stops after `time_ms` (default `DEFAULT_TIME_MS`, clamped to `MAX_TIME_MS`)
+	or `playouts` in total, whichever comes first. With `parallel=True` the
+	playouts are split across the shared process pool.
+	"""
+	geo = geometry(size, win_length)
+	if not geo.candidates(x | o):
+		return None, SearchStats()
+
+	budget = max(1, min(int(time_ms or DEFAULT_TIME_MS), MAX_TIME_MS))
+	total = playouts or 1 << 62
+
+	# imported here: game.workers imports game.ai, which imports this module
+	from . import workers
+
+	# never fan out from inside a pool worker
+	n = workers.POOL_SIZE if parallel and multiprocessing.parent_process() is None else 1
+	if n > 1:
+		seeds = [random.randrange(1 << 30) for _ in range(n)]
+		jobs = [(x, o, size, win_length, budget, -(-total // n), seed) for seed in seeds]
+		trees = workers.map_jobs(_run_job, jobs)
+	else:
+		trees = [_run(x, o, size, win_length, budget, total, None)]
+
+	visits: Dict[int, int] = {}
+	for tree in trees:
+		for move, (v, _) in tree.items():
+			visits[move] = visits.get(move, 0) + v
+
+	stats = SearchStats()
+	stats.nodes = sum(visits.values())
+	if not visits:
+		return geo.candidates(x | o)[0], stats
+	return max(visits, key=visits.__getitem__), stats
@@ -0,0 +1,108 @@
+"""In-process search metrics for the game service.
+
+Views call `record` once per answered move with the `SearchStats` of the
+search and its wall time; nothing is counted per node, so the overhead is a
+lock and a few additions per request. `render` formats the aggregates in the
+Prometheus text exposition format for the `metrics/` endpoint.
+
+Counters are per process: with several gunicorn workers, each worker reports
+its own numbers.
+"""
+
+import threading
+from typing import Dict, List, Tuple
+
+from .stats import SearchStats
+
+
+# Upper bounds (seconds) of the search-time histogram buckets.
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Remote addresses allowed to read the metrics endpoint.
+ALLOWED_ADDRS = ("127.0.0.1", "::1")
+
+
+class _Series:
+	__slots__ = ("moves", "nodes", "cutoffs", "tt_hits", "table_hits", "depth_max", "seconds", "buckets")
+
+	def __init__(self):
+		self.moves = 0
+		self.nodes = 0
+		self.cutoffs = 0
+		self.tt_hits = 0
+		self.table_hits = 0
+		self.depth_max = 0
+		self.seconds = 0.0
+		self.buckets = [0] * len(BUCKETS)
+
+
+class Metrics:
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._series: Dict[Tuple[str, int], _Series] = {}
+
+	def record(self, difficulty: str, size: int, stats: SearchStats, seconds: float) -> None:
+		with self._lock:
+			series = self._series.get((difficulty, size))
+			if series is None:
+				series = self._series[(difficulty, size)] = _Series()
+			series.moves += 1
+			series.nodes += stats.nodes
+			series.cutoffs += stats.cutoffs
+			series.tt_hits += stats.tt_hits
+			series.table_hits += stats.table_hits
+			series.depth_max = max(series.depth_max, stats.depth)
+			series.seconds += seconds
+			for i, bound in enumerate(BUCKETS):
+				if seconds <= bound:
+					series.buckets[i] += 1
+					break
+
+	def reset(self) -> None:
+		with self._lock:
+			self._series.clear()
+
+	def render(self) -> str:
+		with self._lock:
+			snapshot = sorted(self._series.items())
+			rows = [(key, _copy(series)) for key, series in snapshot]
+
+		out: List[str] = []
+
+		def metric(name: str, kind: str, help_text: str, attr: str) -> None:
+			out.append(f"# HELP {name} {help_text}")
+			out.append(f"# TYPE {name} {kind}")
+			for (difficulty, size), series in rows:
+				out.append(f'{name}{{difficulty="{difficulty}",size="{size}"}} {getattr(series, attr)}')
+
+		metric("game_moves_total", "counter", "AI moves computed.", "moves")
+		metric("game_search_nodes_total", "counter", "Search nodes (or MCTS playouts) visited.", "nodes")
+		metric("game_search_cutoffs_total", "counter", "Alpha-beta cutoffs.", "cutoffs")
+		metric("game_tt_hits_total", "counter", "Transposition-table hits that ended a node.", "tt_hits")
+		metric("game_table_hits_total", "counter", "Moves answered by the perfect-play table.", "table_hits")
+		metric("game_search_depth_max", "gauge", "Deepest completed search depth.", "depth_max")
+
+		name = "game_search_seconds"
+		out.append(f"# HELP {name} Wall time spent choosing a move.")
+		out.append(f"# TYPE {name} histogram")
+		for (difficulty, size), series in rows:
+			labels = f'difficulty="{difficulty}",size="{size}"'
+			cumulative = 0
+			for bound, count in zip(BUCKETS, series.buckets):
+				cumulative += count
+				out.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+			out.append(f'{name}_bucket{{{labels},le="+Inf"}} {series.moves}')
+			out.append(f"{name}_sum{{{labels}}} {series.seconds:.6f}")
+			out.append(f"{name}_count{{{labels}}} {series.moves}")
+		return "\n".join(out) + "\n"
+
+
+def _copy(series: _Series) -> _Series:
+	clone = _Series()
+	for attr in _Series.__slots__:
+		value = getattr(series, attr)
+		setattr(clone, attr, list(value) if isinstance(value, list) else value)
+	return clone
+
+
+metrics = Metrics()
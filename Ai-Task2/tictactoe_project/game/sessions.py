@@ -0,0 +1,129 @@
+"""Server-side game sessions for the optional stateful move API.
+
+A session keeps the board, its bitboards and `LineState`, and the principal
+variation of the AI's last search, so a move request only carries the human
+move: the server applies that delta instead of re-sanitising and rescanning a
+full board, and when the human plays the reply the AI expected, the rest of
+that line seeds the next search.
+
+Sessions live in a bounded in-memory store with LRU eviction and an idle
+TTL. They are local to one process, so a client that gets "unknown game"
+(e.g. after eviction or when routed to another worker) falls back to the
+stateless board-in-every-request contract.
+"""
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from . import ai, engine
+from .lines import SIDE_AI, LineState
+from .stats import SearchStats
+
+
+MAX_SESSIONS = 10_000
+SESSION_TTL = 60 * 60  # seconds since last use
+
+
+class GameSession:
+	"""State of one game. Callers must hold `lock` while playing moves."""
+
+	def __init__(self, size: int, win_length: int, difficulty: str, time_ms: Optional[int]):
+		self.game_id = secrets.token_urlsafe(12)
+		self.size = size
+		self.win_length = win_length
+		self.difficulty = difficulty
+		self.time_ms = time_ms
+		self.board = [ai.EMPTY] * (size * size)
+		self.x = 0
+		self.o = 0
+		self.state: LineState = ai.line_state(self.board, size, win_length)
+		# Expected line of play after the AI's last move: [human, ai, human, ...]
+		self.expected: List[int] = []
+		self.lock = threading.Lock()
+		self.touched = time.monotonic()
+
+	def play(self, cell: int, side: int) -> None:
+		if side == SIDE_AI:
+			self.board[cell] = ai.AI
+			self.o |= 1 << cell
+		else:
+			self.board[cell] = ai.HUMAN
+			self.x |= 1 << cell
+		self.state.make(cell, side)
+
+	def reply(self, human_move: int) -> Tuple[Optional[int], SearchStats]:
+		"""Pick the AI's answer to `human_move`, reusing the last search."""
+		if self.expected[:1] == [human_move]:
+			hint = self.expected[1:]
+		else:
+			hint = []
+		self.expected = []
+
+		if self.difficulty == "mcts" or (self.size == 3 and self.win_length == 3):
+			# No PV hint here: MCTS keeps no line of play, 'hard' 3x3 is answered
+			# by the perfect-play table, and without it the full-depth search
+			# finds the previous turn's positions in the process-wide
+			# transposition table.
+			return ai.analyse(self.board, self.difficulty, self.size, self.win_length, self.time_ms)
+
+		move, stats = engine.search(
+			self.x, self.o, self.size, self.win_length, self.difficulty, self.time_ms, pv_hint=hint,
+		)
+		if stats.pv[:1] == [move]:
+			self.expected = stats.pv[1:]
+		return move, stats
+
+
+class SessionStore:
+	"""Bounded mapping of game id -> `GameSession` with LRU and TTL eviction."""
+
+	def __init__(self, max_sessions: int = MAX_SESSIONS, ttl: float = SESSION_TTL):
+		self.max_sessions = max_sessions
+		self.ttl = ttl
+		self._sessions: "OrderedDict[str, GameSession]" = OrderedDict()
+		self._lock = threading.Lock()
+
+	def __len__(self) -> int:
+		return len(self._sessions)
+
+	def create(self, size: int, win_length: int, difficulty: str, time_ms: Optional[int]) -> GameSession:
+		session = GameSession(size, win_length, difficulty, time_ms)
+		with self._lock:
+			self._sessions[session.game_id] = session
+			self._expire(time.monotonic())
+			while len(self._sessions) > self.max_sessions:
+				self._sessions.popitem(last=False)
+		return session
+
+	def get(self, game_id) -> Optional[GameSession]:
+		if not isinstance(game_id, str):
+			return None
+		now = time.monotonic()
+		with self._lock:
+			session = self._sessions.get(game_id)
+			if session is None:
+				return None
+			if now - session.touched > self.ttl:
+				del self._sessions[game_id]
+				return None
+			session.touched = now
+			self._sessions.move_to_end(game_id)
+			return session
+
+	def discard(self, game_id: str) -> None:
+		with self._lock:
+			self._sessions.pop(game_id, None)
+
+	def _expire(self, now: float) -> None:
+		# Least recently used sessions sit at the front.
+		while self._sessions:
+			oldest = next(iter(self._sessions.values()))
+			if now - oldest.touched <= self.ttl:
+				break
+			self._sessions.popitem(last=False)
+
+
+store = SessionStore()
@@ -0,0 +1,34 @@
+"""Per-search counters shared by the 3x3 minimax and the N x N engine."""
+
+
+class SearchStats:
+	"""Counters filled in by one search.
+
+	- nodes: positions visited
+	- cutoffs: beta cutoffs (children skipped by alpha-beta)
+	- tt_hits: transposition-table entries that ended a node early
+	- table_hits: moves answered by the precomputed perfect-play table
+	- depth: deepest fully searched iteration (or the fixed depth limit)
+
+	`pv` holds the principal variation (expected line of play from the root)
+	when the search produced one.
+	"""
+
+	__slots__ = ("nodes", "cutoffs", "tt_hits", "table_hits", "depth", "pv")
+
+	COUNTERS = ("nodes", "cutoffs", "tt_hits", "table_hits", "depth")
+
+	def __init__(self):
+		self.nodes = 0
+		self.cutoffs = 0
+		self.tt_hits = 0
+		self.table_hits = 0
+		self.depth = 0
+		self.pv = []
+
+	def as_dict(self) -> dict:
+		return {name: getattr(self, name) for name in self.COUNTERS}
+
+	def __repr__(self) -> str:
+		fields = ", ".join(f"{k}={v}" for k, v in self.as_dict().items())
+		return f"SearchStats({fields})"
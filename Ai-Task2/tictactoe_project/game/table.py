@@ -0,0 +1,125 @@
+"""Precomputed perfect-play table for the 3x3 board.
+
+Every board is addressed by its base-3 index (EMPTY=0, HUMAN=1, AI=2 per cell,
+cell 0 least significant), so the table has exactly 3**9 fixed-size entries.
+`build_table` solves every position the AI can be asked to move from and
+writes them to a compact binary file; `load_table` memory-maps that file so
+all worker processes share the same pages, and `lookup` answers hard-mode
+moves without searching.
+
+File layout (little endian):
+	header: magic (4s) | version (H) | entry count (I) | crc32 of body (I)
+	body:   3**9 entries of move (B, 0xFF = not solved) | score (b)
+"""
+
+import logging
+import mmap
+import struct
+import zlib
+from pathlib import Path
+from typing import List, Optional, Union
+
+from . import ai
+
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"TTT1"
+# Bump whenever the search or its scoring changes so old files are rejected.
+VERSION = 1
+HEADER = struct.Struct("<4sHII")
+ENTRY = struct.Struct("<Bb")
+SIZE = 3 ** 9
+NO_MOVE = 0xFF
+
+DEFAULT_PATH = Path(__file__).resolve().parent / "data" / "perfect_play.bin"
+
+_CELL_VALUE = {ai.EMPTY: 0, ai.HUMAN: 1, ai.AI: 2}
+_POWERS = tuple(3 ** i for i in range(9))
+
+# Memory-mapped body of the loaded table, or None when unavailable.
+_table: Optional[mmap.mmap] = None
+
+
+def board_index(board: List[str]) -> int:
+	return sum(_CELL_VALUE.get(cell, 0) * p for cell, p in zip(board, _POWERS))
+
+
+def _board_from_index(index: int) -> List[str]:
+	cells = (ai.EMPTY, ai.HUMAN, ai.AI)
+	board = []
+	for _ in range(9):
+		index, value = divmod(index, 3)
+		board.append(cells[value])
+	return board
+
+
+def _needs_move(board: List[str]) -> bool:
+	"""True for positions get_best_move can be asked about in normal play."""
+	diff = board.count(ai.HUMAN) - board.count(ai.AI)
+	if diff not in (0, 1):
+		return False
+	if ai.is_winner(board, ai.HUMAN) or ai.is_winner(board, ai.AI):
+		return False
+	return not ai.is_full(board)
+
+
+def build_table(path: Union[str, Path] = DEFAULT_PATH) -> int:
+	"""Solve every reachable AI-to-move position and write the table to `path`.
+
+	Returns the number of solved positions.
+	"""
+	body = bytearray(ENTRY.pack(NO_MOVE, 0) * SIZE)
+	solved = 0
+	for index in range(SIZE):
+		board = _board_from_index(index)
+		if not _needs_move(board):
+			continue
+		x, o = ai._to_bits(board)
+		move, score = ai._minimax(x, o, depth=0, alpha=-10_000, beta=10_000, maximizing=True, depth_limit=9)
+		if move is None:
+			continue
+		ENTRY.pack_into(body, index * ENTRY.size, move, score)
+		solved += 1
+
+	path = Path(path)
+	path.parent.mkdir(parents=True, exist_ok=True)
+	tmp = path.with_suffix(path.suffix + ".tmp")
+	with open(tmp, "wb") as fh:
+		fh.write(HEADER.pack(MAGIC, VERSION, SIZE, zlib.crc32(body)))
+		fh.write(body)
+	tmp.replace(path)
+	return solved
+
+
+def load_table(path: Union[str, Path] = DEFAULT_PATH) -> bool:
+	"""Memory-map the table at `path`; return False if missing or stale."""
+	global _table
+	_table = None
+	try:
+		with open(path, "rb") as fh:
+			mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+	except (OSError, ValueError):
+		return False
+
+	expected = HEADER.size + SIZE * ENTRY.size
+	if len(mapped) != expected:
+		logger.warning("ignoring perfect-play table %s: unexpected size", path)
+		mapped.close()
+		return False
+	magic, version, count, crc = HEADER.unpack_from(mapped, 0)
+	if magic != MAGIC or version != VERSION or count != SIZE or zlib.crc32(mapped[HEADER.size:]) != crc:
+		logger.warning("ignoring stale perfect-play table %s; rebuild with `manage.py build_ai_table`", path)
+		mapped.close()
+		return False
+
+	_table = mapped
+	return True
+
+
+def lookup(board: List[str]) -> Optional[int]:
+	"""Return the solved move for `board`, or None if no table entry exists."""
+	if _table is None:
+		return None
+	move, _ = ENTRY.unpack_from(_table, HEADER.size + board_index(board) * ENTRY.size)
+	return None if move == NO_MOVE else move
@@ -1,3 +1,449 @@
-from django.test import TestCase
+import json
+import random
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from . import ai, benchmark, engine, mcts, sessions, table, views, workers
+from .lines import SIDE_AI, SIDE_HUMAN, LineState
+from .metrics import Metrics
+from .stats import SearchStats
+
+
+def _positions():
+	"""Every position the AI can be asked to move from on 3x3 (4520 boards)."""
+	for index in range(table.SIZE):
+		board = table._board_from_index(index)
+		if table._needs_move(board):
+			yield board
+
+
+@lru_cache(maxsize=None)
+def _plain_value(board: str, depth: int, maximizing: bool) -> int:
+	"""Plain minimax over a string board: no pruning, no table, no bitboards."""
+	cells = list(board)
+	if ai.is_winner(cells, ai.AI):
+		return 10 - depth
+	if ai.is_winner(cells, ai.HUMAN):
+		return -10 + depth
+	if ai.EMPTY not in cells:
+		return 0
+	mark = ai.AI if maximizing else ai.HUMAN
+	values = [
+		_plain_value(board[:i] + mark + board[i + 1:], depth + 1, not maximizing)
+		for i, cell in enumerate(board)
+		if cell == ai.EMPTY
+	]
+	return max(values) if maximizing else min(values)
+
+
+def _move_scores(board):
+	"""Plain minimax score of every AI move from `board`."""
+	text = "".join(board)
+	return {
+		i: _plain_value(text[:i] + ai.AI + text[i + 1:], 1, False)
+		for i, cell in enumerate(board)
+		if cell == ai.EMPTY
+	}
+
+
+class PerfectPlayTests(SimpleTestCase):
+	"""The table, the transposition table and PVS all agree with plain minimax."""
+
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		cls.positions = list(_positions())
+		cls.expected = [_move_scores(board) for board in cls.positions]
+
+	def setUp(self):
+		ai._TT.clear()
+
+	def test_covers_every_reachable_position(self):
+		self.assertEqual(len(self.positions), 4520)
+
+	def _check_search(self, ordering):
+		for board, scores in zip(self.positions, self.expected):
+			best = max(scores.values())
+			x, o = ai._to_bits(board)
+			ctx = ai._Context(x, o, ordering)
+			move, score = ai._minimax(x, o, depth=0, alpha=-10_000, beta=10_000, maximizing=True, depth_limit=9, ctx=ctx)
+			self.assertEqual(score, best, board)
+			self.assertEqual(scores[move], best, board)
+
+	def test_minimax_with_ordering_matches_plain_minimax(self):
+		self._check_search(ordering=True)
+
+	def test_minimax_without_ordering_matches_plain_minimax(self):
+		self._check_search(ordering=False)
+
+	def _search(self, board):
+		x, o = ai._to_bits(board)
+		ctx = ai._Context(x, o)
+		move, _ = ai._minimax(x, o, depth=0, alpha=-10_000, beta=10_000, maximizing=True, depth_limit=9, ctx=ctx)
+		return move, ctx.stats
+
+	def test_next_turn_reuses_transposition_entries(self):
+		first = [ai.HUMAN] + [ai.EMPTY] * 8
+		move, _ = self._search(first)
+		second = list(first)
+		second[move] = ai.AI
+		second[ai.available_moves(second)[0]] = ai.HUMAN
+		warm_move, warm = self._search(second)
+		ai._TT.clear()
+		cold_move, cold = self._search(second)
+		self.assertGreater(warm.tt_hits, 0)
+		self.assertLess(warm.nodes, cold.nodes)
+		scores = _move_scores(second)
+		self.assertEqual(scores[warm_move], scores[cold_move])
+
+	def test_transposition_table_is_thread_safe(self):
+		tt = ai.TranspositionTable(max_entries=64)
+		errors = []
+
+		def worker(seed):
+			rng = random.Random(seed)
+			try:
+				for _ in range(5000):
+					key = (rng.randrange(200),)
+					if rng.random() < 0.5:
+						tt.store(key, tt.EXACT, 0, None)
+					else:
+						tt.get(key)
+			except Exception as exc:
+				errors.append(exc)
+
+		threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(8)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual(errors, [])
+		self.assertLessEqual(len(tt), 64)
+
+	def test_table_matches_plain_minimax(self):
+		loaded = table._table
+		try:
+			with tempfile.TemporaryDirectory() as tmp:
+				path = Path(tmp) / "perfect_play.bin"
+				self.assertEqual(table.build_table(path), len(self.positions))
+				self.assertTrue(table.load_table(path))
+				for board, scores in zip(self.positions, self.expected):
+					move = table.lookup(board)
+					self.assertEqual(scores[move], max(scores.values()), board)
+					self.assertEqual(ai.get_best_move(board, "hard"), move)
+				table._table.close()
+		finally:
+			table._table = loaded
+
+	def test_table_rejects_corrupt_file(self):
+		loaded = table._table
+		try:
+			with tempfile.TemporaryDirectory() as tmp:
+				path = Path(tmp) / "perfect_play.bin"
+				table.build_table(path)
+				data = bytearray(path.read_bytes())
+				data[-1] ^= 0xFF
+				path.write_bytes(bytes(data))
+				with self.assertLogs("game.table", "WARNING"):
+					self.assertFalse(table.load_table(path))
+		finally:
+			table._table = loaded
+
+
+def _snapshot(state):
+	return (
+		[list(c) for c in state.counts],
+		list(state.completed),
+		state.filled,
+		state.score,
+	)
+
+
+class LineStateTests(SimpleTestCase):
+	LAYOUTS = (
+		("3x3", ai._LAYOUT, 3),
+		("7x7 k=5", engine.geometry(7, 5).layout, 7),
+		("15x15 k=5", engine.geometry(15, 5).layout, 15),
+	)
+
+	def test_make_unmake_round_trips(self):
+		rng = random.Random(7)
+		for name, layout, size in self.LAYOUTS:
+			with self.subTest(layout=name):
+				for _ in range(20):
+					state = LineState(layout)
+					cells = list(range(size * size))
+					rng.shuffle(cells)
+					history = []
+					bits = [0, 0]
+					for n, cell in enumerate(cells[:rng.randint(1, len(cells))]):
+						side = SIDE_HUMAN if n % 2 == 0 else SIDE_AI
+						history.append((cell, side, _snapshot(state)))
+						state.make(cell, side)
+						bits[side] |= 1 << cell
+						# incremental counts equal a rebuild from the bitboards
+						self.assertEqual(_snapshot(state), _snapshot(LineState.from_bits(layout, *bits)))
+					for cell, side, before in reversed(history):
+						state.unmake(cell, side)
+						self.assertEqual(_snapshot(state), before)
+					self.assertEqual(_snapshot(state), _snapshot(LineState(layout)))
+
+	def test_wins_match_board_scan(self):
+		for board in _positions():
+			state = ai.line_state(board)
+			for cell in ai.available_moves(board):
+				for side, mark in ((SIDE_AI, ai.AI), (SIDE_HUMAN, ai.HUMAN)):
+					after = board[:cell] + [mark] + board[cell + 1:]
+					self.assertEqual(state.completes(cell, side), ai.is_winner(after, mark))
+					state.make(cell, side)
+					self.assertEqual(state.has_won(side), ai.is_winner(after, mark))
+					state.unmake(cell, side)
+
+
+class BenchmarkTests(SimpleTestCase):
+	BASELINE = {
+		"engine": {
+			"3x3-hard": {"p50_ms": 1.0, "p99_ms": 2.0, "nodes_per_sec": 1000},
+			"removed": {"p50_ms": 1.0, "p99_ms": 2.0, "nodes_per_sec": 1000},
+		},
+		"requests": {
+			"batch-medium": {"p50_ms": 10.0, "p99_ms": 20.0, "nodes_per_sec": 0, "positions_per_sec": 500},
+		},
+	}
+
+	def test_compare_within_threshold(self):
+		current = {
+			"engine": {"3x3-hard": {"p50_ms": 1.2, "p99_ms": 1.0, "nodes_per_sec": 800}},
+			"requests": {"batch-medium": {"p50_ms": 12.0, "p99_ms": 24.0, "nodes_per_sec": 0, "positions_per_sec": 400}},
+		}
+		self.assertEqual(benchmark.compare(self.BASELINE, current, 0.2), [])
+
+	def test_compare_reports_regressions(self):
+		current = {
+			"engine": {
+				"3x3-hard": {"p50_ms": 1.3, "p99_ms": 2.0, "nodes_per_sec": 700},
+				"added": {"p50_ms": 99.0, "p99_ms": 99.0, "nodes_per_sec": 1},
+			},
+			"requests": {"batch-medium": {"p50_ms": 10.0, "p99_ms": 25.0, "nodes_per_sec": 0, "positions_per_sec": 300}},
+		}
+		self.assertEqual(benchmark.compare(self.BASELINE, current, 0.2), [
+			"engine/3x3-hard p50_ms: 1.0 -> 1.3",
+			"engine/3x3-hard nodes_per_sec: 1000 -> 700",
+			"requests/batch-medium p99_ms: 20.0 -> 25.0",
+			"requests/batch-medium positions_per_sec: 500 -> 300",
+		])
+
+	def test_bench_requests_fails_on_error_status(self):
+		with mock.patch.object(views, "MAX_BATCH", 1):
+			with self.assertRaisesMessage(RuntimeError, "move/batch/ returned 400"):
+				benchmark.bench_requests(repeat=1)
+
+
+class MetricsTests(SimpleTestCase):
+	def _stats(self, nodes, depth):
+		stats = SearchStats()
+		stats.nodes = nodes
+		stats.cutoffs = 2
+		stats.tt_hits = 3
+		stats.depth = depth
+		return stats
+
+	def test_render(self):
+		registry = Metrics()
+		registry.record("hard", 15, self._stats(100, 4), 0.003)
+		registry.record("hard", 15, self._stats(50, 6), 0.2)
+		registry.record("easy", 3, SearchStats(), 9.0)
+		lines = registry.render().splitlines()
+		self.assertIn("# TYPE game_moves_total counter", lines)
+		self.assertIn('game_moves_total{difficulty="hard",size="15"} 2', lines)
+		self.assertIn('game_search_nodes_total{difficulty="hard",size="15"} 150', lines)
+		self.assertIn('game_tt_hits_total{difficulty="hard",size="15"} 6', lines)
+		self.assertIn('game_search_depth_max{difficulty="hard",size="15"} 6', lines)
+		# histogram buckets are cumulative, and +Inf counts every move
+		self.assertIn('game_search_seconds_bucket{difficulty="hard",size="15",le="0.001"} 0', lines)
+		self.assertIn('game_search_seconds_bucket{difficulty="hard",size="15",le="0.005"} 1', lines)
+		self.assertIn('game_search_seconds_bucket{difficulty="hard",size="15",le="0.25"} 2', lines)
+		self.assertIn('game_search_seconds_bucket{difficulty="easy",size="3",le="5.0"} 0', lines)
+		self.assertIn('game_search_seconds_bucket{difficulty="easy",size="3",le="+Inf"} 1', lines)
+		self.assertIn('game_search_seconds_sum{difficulty="hard",size="15"} 0.203000', lines)
+		self.assertIn('game_search_seconds_count{difficulty="hard",size="15"} 2', lines)
+		registry.reset()
+		self.assertNotIn("difficulty=", registry.render())
+
+	def test_endpoint_is_local_only(self):
+		url = reverse("game:metrics")
+		response = self.client.get(url)
+		self.assertEqual(response.status_code, 200)
+		self.assertTrue(response["Content-Type"].startswith("text/plain"))
+		self.assertIn("# TYPE game_search_seconds histogram", response.content.decode())
+		self.assertEqual(self.client.get(url, REMOTE_ADDR="::1").status_code, 200)
+		self.assertEqual(self.client.get(url, REMOTE_ADDR="203.0.113.7").status_code, 404)
+
+
+def _board(size, human=(), ai_cells=()):
+	board = [ai.EMPTY] * (size * size)
+	for cell in human:
+		board[cell] = ai.HUMAN
+	for cell in ai_cells:
+		board[cell] = ai.AI
+	return board
+
+
+class MctsTests(SimpleTestCase):
+	# (size, win_length, human cells, AI cells, the only good move)
+	WIN = (
+		(3, 3, (0, 1, 8), (3, 4), 5),
+		(4, 4, (0, 1, 2, 15), (4, 5, 6), 7),
+	)
+	BLOCK = (
+		(3, 3, (0, 1), (4,), 2),
+		(4, 4, (0, 5, 10), (1, 2, 3), 15),
+	)
+
+	def _check(self, cases):
+		for size, win_length, human, ai_cells, expected in cases:
+			with self.subTest(size=size, human=human):
+				x, o = ai._to_bits(_board(size, human, ai_cells))
+				move, stats = mcts.search(x, o, size, win_length, time_ms=2000, playouts=3000, parallel=False)
+				self.assertEqual(move, expected)
+				self.assertEqual(stats.nodes, 3000)
+
+	def test_takes_the_win(self):
+		self._check(self.WIN)
+
+	def test_blocks_the_loss(self):
+		self._check(self.BLOCK)
+
+	def test_keeps_to_time_budget(self):
+		board = _board(7, human=(24,))
+		for size, cells in ((3, board[:9]), (7, board)):
+			with self.subTest(size=size):
+				start = time.perf_counter()
+				move, _ = ai.analyse(cells, "mcts", size, None, 20)
+				elapsed = time.perf_counter() - start
+				self.assertIn(move, ai.available_moves(cells))
+				self.assertLess(elapsed, 0.2)
+
+	def test_session_uses_mcts_within_budget(self):
+		for size in (3, 7):
+			with self.subTest(size=size):
+				session = sessions.GameSession(size, ai.default_win_length(size), "mcts", 20)
+				session.play(0, SIDE_HUMAN)
+				with mock.patch.object(mcts, "search", wraps=mcts.search) as search:
+					start = time.perf_counter()
+					move, _ = session.reply(0)
+					elapsed = time.perf_counter() - start
+				self.assertEqual(search.call_args.args[4], 20)
+				self.assertIn(move, ai.available_moves(session.board))
+				self.assertLess(elapsed, 0.2)
+
+	def test_runs_in_pool(self):
+		size, win_length, human, ai_cells, expected = self.WIN[1]
+		future = workers.submit(workers.analyse, (_board(size, human, ai_cells), "mcts", size, win_length, 300))
+		move, stats = future.result(timeout=30)
+		self.assertEqual(move, expected)
+		self.assertGreater(stats.nodes, 0)
+
+
+class ViewTests(SimpleTestCase):
+	EMPTY_3X3 = [ai.EMPTY] * 9
+
+	def post(self, name, payload, raw=False):
+		body = payload if raw else json.dumps(payload)
+		return self.client.post(reverse(name), body, content_type="application/json")
+
+	def test_move(self):
+		board = [ai.HUMAN] + [ai.EMPTY] * 8
+		response = self.post("game:move", {"board": board, "difficulty": "hard"})
+		self.assertEqual(response.status_code, 200)
+		self.assertIn(response.json()["aiMove"], ai.available_moves(board))
+
+	def test_move_large_board(self):
+		board = [ai.EMPTY] * 49
+		board[24] = ai.HUMAN
+		response = self.post("game:move", {"board": board, "size": 7, "timeMs": 50})
+		self.assertEqual(response.status_code, 200)
+		self.assertIn(response.json()["aiMove"], ai.available_moves(board))
+
+	def test_move_rejects_bad_input(self):
+		self.assertEqual(self.post("game:move", "{", raw=True).status_code, 400)
+		self.assertEqual(self.post("game:move", {"board": [ai.EMPTY] * 8}).status_code, 400)
+		self.assertEqual(self.post("game:move", {"board": self.EMPTY_3X3, "size": 99}).status_code, 400)
+
+	def test_batch(self):
+		corner = [ai.HUMAN] + [ai.EMPTY] * 8
+		mirrored = [ai.EMPTY] * 2 + [ai.HUMAN] + [ai.EMPTY] * 6
+		items = [{"board": corner}, {"board": [ai.EMPTY] * 8}, {"board": mirrored}]
+		response = self.post("game:move-batch", {"items": items})
+		self.assertEqual(response.status_code, 200)
+		results = response.json()["results"]
+		self.assertEqual(len(results), 3)
+		self.assertEqual(results[0]["aiMove"], ai.get_best_move(corner))
+		self.assertIn("error", results[1])
+		self.assertIn(results[2]["aiMove"], ai.available_moves(mirrored))
+
+	def test_batch_limits(self):
+		self.assertEqual(self.post("game:move-batch", {"items": "nope"}).status_code, 400)
+		with mock.patch.object(views, "MAX_BATCH", 2):
+			items = [{"board": self.EMPTY_3X3}] * 3
+			self.assertEqual(self.post("game:move-batch", {"items": items}).status_code, 400)
+		big = [ai.EMPTY] * 225
+		items = [
+			{"board": big[:i] + [ai.HUMAN] + big[i + 1:], "size": 15, "timeMs": 5000}
+			for i in range(views.MAX_BATCH_TIME_MS // 5000 + 1)
+		]
+		self.assertEqual(self.post("game:move-batch", {"items": items}).status_code, 400)
+
+	def test_batch_keys_3x3_mcts_by_budget(self):
+		board = [ai.HUMAN] + [ai.EMPTY] * 8
+		short, _, _ = views._batch_key(board, "mcts", 3, 3, 50)
+		long, _, _ = views._batch_key(board, "mcts", 3, 3, 400)
+		self.assertNotEqual(short, long)
+		hard_short, _, _ = views._batch_key(board, "hard", 3, 3, 50)
+		hard_long, _, _ = views._batch_key(board, "hard", 3, 3, 400)
+		self.assertEqual(hard_short, hard_long)
+
+	def test_session(self):
+		response = self.post("game:session", {"difficulty": "hard"})
+		self.assertEqual(response.status_code, 200)
+		game_id = response.json()["gameId"]
+
+		response = self.post("game:move", {"gameId": game_id, "move": 4})
+		self.assertEqual(response.status_code, 200)
+		self.assertIsNotNone(response.json()["aiMove"])
+		self.assertEqual(self.post("game:move", {"gameId": game_id, "move": 4}).status_code, 400)
+		self.assertEqual(self.post("game:move", {"gameId": "missing", "move": 0}).status_code, 404)
+		self.assertEqual(self.post("game:session", "[]", raw=True).status_code, 400)
+
+	def test_session_reuses_transposition_table(self):
+		ai._TT.clear()
+		session = sessions.GameSession(3, 3, "hard", None)
+		with mock.patch.object(table, "lookup", return_value=None):
+			for cell in (0, 8):
+				if session.board[cell] != ai.EMPTY:
+					cell = ai.available_moves(session.board)[0]
+				session.play(cell, SIDE_HUMAN)
+				move, stats = session.reply(cell)
+				session.play(move, SIDE_AI)
+		self.assertGreater(stats.tt_hits, 0)
+
+	def test_async_move(self):
+		board = [ai.HUMAN] + [ai.EMPTY] * 8
+		response = self.post("game:move-async", {"board": board})
+		self.assertEqual(response.status_code, 200)
+		self.assertIn(response.json()["aiMove"], ai.available_moves(board))
+		self.assertEqual(self.post("game:move-async", "{", raw=True).status_code, 400)
+
+	def test_async_move_sheds_load(self):
+		board = [ai.HUMAN] + [ai.EMPTY] * 8
+		with mock.patch.object(workers, "MAX_PENDING", 0):
+			response = self.post("game:move-async", {"board": board})
+		self.assertEqual(response.status_code, 503)
+		self.assertEqual(response["Retry-After"], "1")
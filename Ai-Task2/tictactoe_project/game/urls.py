@@ -6,4 +6,8 @@ app_name = "game"
 urlpatterns = [
     path("", views.game_view, name="game"),
     path("move/", views.move_view, name="move"),
+    path("move/async/", views.move_async_view, name="move-async"),
+    path("move/batch/", views.batch_move_view, name="move-batch"),
+    path("session/", views.session_view, name="session"),
+    path("metrics/", views.metrics_view, name="metrics"),
 ]
@@ -1,11 +1,31 @@
-from django.http import JsonResponse, HttpRequest
+from django.http import Http404, HttpResponse, JsonResponse, HttpRequest
 from django.shortcuts import render
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
+import asyncio
 import json
-from typing import List, Optional
+import time
+from typing import List, Optional, Tuple
 
-from . import ai
+from . import ai, sessions, workers
+from . import bitboard as bb
+from .lines import SIDE_AI, SIDE_HUMAN, LineState
+from .metrics import ALLOWED_ADDRS, metrics
+from .stats import SearchStats
+
+
+DIFFICULTIES = ("easy", "medium", "hard", "mcts")
+
+# Seconds an async move request waits for its search before giving up.
+ASYNC_TIMEOUT = 10.0
+
+# Upper bound on items per batch request.
+MAX_BATCH = 10_000
+# Upper bound on the summed search budgets of a batch's distinct positions, in
+# ms (see `ai.time_budget_ms`); classic 3x3 searches do not count.
+MAX_BATCH_TIME_MS = 30_000
+# Batches with at least this many distinct positions use the process pool.
+POOL_THRESHOLD = 64
 
 
 def game_view(request: HttpRequest):
@@ -13,11 +33,66 @@ def game_view(request: HttpRequest):
 	return render(request, "game.html")
 
 
-def _find_winning_line(board: List[str], player: str) -> Optional[List[int]]:
-	for line in ai.WIN_LINES:
-		if all(board[i] == player for i in line):
-			return list(line)
-	return None
+def _result(state: LineState) -> Tuple[str, Optional[List[int]], bool]:
+	"""Return (winner, winningLine, gameOver) from incremental line counts."""
+	if state.has_won(SIDE_AI):
+		return ai.AI, state.winning_line(SIDE_AI), True
+	if state.has_won(SIDE_HUMAN):
+		return ai.HUMAN, state.winning_line(SIDE_HUMAN), True
+	if state.is_full():
+		return "draw", None, True
+	return "none", None, False
+
+
+def _debug(stats: SearchStats, elapsed: float) -> dict:
+	"""Search counters for the opt-in "debug" field of move responses."""
+	return {**stats.as_dict(), "ms": round(elapsed * 1000, 3)}
+
+
+def _parse_options(payload: dict) -> Tuple[str, int, int, Optional[int]]:
+	"""Validate the game options of a payload.
+
+	Returns (difficulty, size, win_length, time_ms); raises ValueError with a
+	client-facing message when an option is invalid.
+	"""
+	difficulty = payload.get("difficulty", "hard")
+	size = payload.get("size", 3)
+	win_length = payload.get("winLength")
+	time_ms = payload.get("timeMs")
+
+	if not isinstance(size, int) or not ai.MIN_SIZE <= size <= ai.MAX_SIZE:
+		raise ValueError(f"size must be between {ai.MIN_SIZE} and {ai.MAX_SIZE}")
+	win_length = win_length or ai.default_win_length(size)
+	if not isinstance(win_length, int) or not 3 <= win_length <= size:
+		raise ValueError("winLength must be between 3 and size")
+	if time_ms is not None and not isinstance(time_ms, int):
+		raise ValueError("timeMs must be an integer")
+	difficulty = difficulty.lower() if isinstance(difficulty, str) else "hard"
+	if difficulty not in DIFFICULTIES:
+		# the engines treat any unknown difficulty as hard; normalising here
+		# also keeps metric labels bounded
+		difficulty = "hard"
+	return difficulty, size, win_length, time_ms
+
+
+def _parse_position(payload: dict) -> Tuple[List[str], str, int, int, Optional[int]]:
+	"""Validate one position payload.
+
+	Returns (board, difficulty, size, win_length, time_ms); raises ValueError
+	with a client-facing message when the payload is invalid.
+	"""
+	if not isinstance(payload, dict):
+		raise ValueError("position must be an object")
+	difficulty, size, win_length, time_ms = _parse_options(payload)
+
+	board = payload.get("board")
+	cells = size * size
+	if not isinstance(board, list) or len(board) != cells:
+		raise ValueError(f"board must be a list of {cells} elements")
+
+	# sanitize board values
+	board = [b if b in (ai.HUMAN, ai.AI, ai.EMPTY) else ai.EMPTY for b in board]
+	return board, difficulty, size, win_length, time_ms
 
 
 @csrf_exempt
@@ -26,70 +101,290 @@ def move_view(request: HttpRequest) -> JsonResponse:
 	"""Handle AJAX POST to compute the AI move and return game state as JSON.
 
 	Expects JSON body: { "board": [...], "difficulty": "easy|medium|hard" }
+
+	Larger variants add "size" (board is size*size cells), optionally
+	"winLength" (marks in a row needed to win) and "timeMs" (search budget).
+
+	Session mode: { "gameId": "...", "move": <cell> } plays the human move in
+	a game created by `session_view`; see `_session_move`.
+
+	Either form accepts "debug": true to add the search counters and wall
+	time of this move to the response.
 	"""
 	try:
 		payload = json.loads(request.body.decode("utf-8"))
 	except Exception:
 		return JsonResponse({"error": "invalid json"}, status=400)
 
-	board = payload.get("board")
-	difficulty = payload.get("difficulty", "hard")
+	if isinstance(payload, dict) and "gameId" in payload:
+		return _session_move(payload)
 
-	if not isinstance(board, list) or len(board) != 9:
-		return JsonResponse({"error": "board must be a list of 9 elements"}, status=400)
+	try:
+		board, difficulty, size, win_length, time_ms = _parse_position(payload)
+	except ValueError as exc:
+		return JsonResponse({"error": str(exc)}, status=400)
 
-	# sanitize board values
-	board = [b if b in (ai.HUMAN, ai.AI, ai.EMPTY) else ai.EMPTY for b in board]
+	# one pass over the board; results below are read off the line counts
+	state = ai.line_state(board, size, win_length)
 
 	# If human already won or board is full, don't make a move
-	if ai.is_winner(board, ai.HUMAN):
-		winning_line = _find_winning_line(board, ai.HUMAN)
+	winner, winning_line, game_over = _result(state)
+	if game_over:
 		return JsonResponse({
 			"aiMove": None,
-			"winner": ai.HUMAN,
+			"winner": winner,
 			"gameOver": True,
 			"winningLine": winning_line,
 		})
 
-	if ai.is_full(board):
+	# compute AI move
+	try:
+		start = time.perf_counter()
+		ai_move, stats = ai.analyse(board, difficulty, size, win_length, time_ms)
+		elapsed = time.perf_counter() - start
+	except Exception:
+		return JsonResponse({"error": "ai computation failed"}, status=500)
+	return _move_response(payload, state, difficulty, size, ai_move, stats, elapsed)
+
+
+def _move_response(
+	payload: dict,
+	state: LineState,
+	difficulty: str,
+	size: int,
+	ai_move: Optional[int],
+	stats: SearchStats,
+	elapsed: float,
+) -> JsonResponse:
+	"""Record metrics, apply the AI move and build the move response."""
+	metrics.record(difficulty, size, stats, elapsed)
+
+	if ai_move is not None:
+		state.make(ai_move, SIDE_AI)
+
+	# determine result
+	winner, winning_line, game_over = _result(state)
+
+	response = {
+		"aiMove": ai_move,
+		"winner": winner,
+		"gameOver": game_over,
+		"winningLine": winning_line,
+	}
+	if payload.get("debug") is True:
+		response["debug"] = _debug(stats, elapsed)
+	return JsonResponse(response)
+
+
+@csrf_exempt
+@require_POST
+async def move_async_view(request: HttpRequest) -> JsonResponse:
+	"""Asynchronous variant of `move_view` (stateless form only).
+
+	The search runs in the shared process pool while the event loop keeps
+	serving other requests; deploy under ASGI (`tictactoe_project.asgi`) to
+	benefit. When `workers.MAX_PENDING` searches are already queued or running
+	the request is rejected with 503 and Retry-After, and a search that takes
+	longer than `ASYNC_TIMEOUT` seconds is answered with 504.
+	"""
+	try:
+		payload = json.loads(request.body.decode("utf-8"))
+	except Exception:
+		return JsonResponse({"error": "invalid json"}, status=400)
+
+	try:
+		board, difficulty, size, win_length, time_ms = _parse_position(payload)
+	except ValueError as exc:
+		return JsonResponse({"error": str(exc)}, status=400)
+
+	state = ai.line_state(board, size, win_length)
+	winner, winning_line, game_over = _result(state)
+	if game_over:
 		return JsonResponse({
 			"aiMove": None,
-			"winner": "draw",
+			"winner": winner,
 			"gameOver": True,
-			"winningLine": None,
+			"winningLine": winning_line,
 		})
 
-	# compute AI move
+	start = time.perf_counter()
+	try:
+		future = workers.submit(workers.analyse, (board, difficulty, size, win_length, time_ms))
+	except workers.Saturated:
+		response = JsonResponse({"error": "server busy"}, status=503)
+		response["Retry-After"] = "1"
+		return response
+
 	try:
-		ai_move = ai.get_best_move(board, difficulty)
+		ai_move, stats = await asyncio.wait_for(asyncio.wrap_future(future), ASYNC_TIMEOUT)
+	except asyncio.TimeoutError:
+		return JsonResponse({"error": "ai computation timed out"}, status=504)
 	except Exception:
 		return JsonResponse({"error": "ai computation failed"}, status=500)
+	elapsed = time.perf_counter() - start
 
-	if ai_move is not None:
-		board[ai_move] = ai.AI
+	return _move_response(payload, state, difficulty, size, ai_move, stats, elapsed)
 
-	# determine result
-	if ai.is_winner(board, ai.AI):
-		winner = ai.AI
-		winning_line = _find_winning_line(board, ai.AI)
-		game_over = True
-	elif ai.is_winner(board, ai.HUMAN):
-		winner = ai.HUMAN
-		winning_line = _find_winning_line(board, ai.HUMAN)
-		game_over = True
-	elif ai.is_full(board):
-		winner = "draw"
-		winning_line = None
-		game_over = True
-	else:
-		winner = "none"
-		winning_line = None
-		game_over = False
-
-	return JsonResponse({
+
+@csrf_exempt
+@require_POST
+def session_view(request: HttpRequest) -> JsonResponse:
+	"""Start a server-side game and return its id.
+
+	Accepts the optional "difficulty", "size", "winLength" and "timeMs" fields
+	of `move_view` and returns { "gameId": ..., "board": [...] }. Moves are
+	then posted to `move_view` as { "gameId": ..., "move": <cell> }.
+	"""
+	try:
+		payload = json.loads(request.body.decode("utf-8") or "{}")
+	except Exception:
+		return JsonResponse({"error": "invalid json"}, status=400)
+	if not isinstance(payload, dict):
+		return JsonResponse({"error": "invalid json"}, status=400)
+
+	try:
+		difficulty, size, win_length, time_ms = _parse_options(payload)
+	except ValueError as exc:
+		return JsonResponse({"error": str(exc)}, status=400)
+
+	session = sessions.store.create(size, win_length, difficulty, time_ms)
+	return JsonResponse({"gameId": session.game_id, "board": session.board})
+
+
+def _session_move(payload: dict) -> JsonResponse:
+	"""Apply the human move to a stored game and answer with the AI move.
+
+	Returns 404 for unknown or expired games, so clients can fall back to
+	posting the full board.
+	"""
+	session = sessions.store.get(payload.get("gameId"))
+	if session is None:
+		return JsonResponse({"error": "unknown game"}, status=404)
+
+	move = payload.get("move")
+	with session.lock:
+		if not isinstance(move, int) or not 0 <= move < len(session.board) or session.board[move] != ai.EMPTY:
+			return JsonResponse({"error": "move must be the index of an empty cell"}, status=400)
+		_, _, game_over = _result(session.state)
+		if game_over:
+			return JsonResponse({"error": "game is over"}, status=409)
+
+		session.play(move, SIDE_HUMAN)
+		ai_move = None
+		winner, winning_line, game_over = _result(session.state)
+		if not game_over:
+			try:
+				start = time.perf_counter()
+				ai_move, stats = session.reply(move)
+				elapsed = time.perf_counter() - start
+			except Exception:
+				return JsonResponse({"error": "ai computation failed"}, status=500)
+			metrics.record(session.difficulty, session.size, stats, elapsed)
+			if ai_move is not None:
+				session.play(ai_move, SIDE_AI)
+			winner, winning_line, game_over = _result(session.state)
+
+	if game_over:
+		sessions.store.discard(session.game_id)
+
+	response = {
+		"gameId": session.game_id,
 		"aiMove": ai_move,
 		"winner": winner,
 		"gameOver": game_over,
 		"winningLine": winning_line,
-	})
+	}
+	if payload.get("debug") is True and ai_move is not None:
+		response["debug"] = _debug(stats, elapsed)
+	return JsonResponse(response)
+
+
+def _batch_key(board: List[str], difficulty: str, size: int, win_length: int, time_ms: Optional[int]):
+	"""Return (dedup key, canonical board, perm) for one batch item.
+
+	Classic 3x3 boards are folded over their 8 symmetries; `perm` maps a move
+	on the canonical board back to the item's own board. Other variants are
+	only deduplicated when identical.
+	"""
+	if size == 3 and win_length == 3:
+		canon, perm = bb.canonical(*ai._to_bits(board))
+		# only MCTS uses the time budget on 3x3
+		budget = time_ms if difficulty == "mcts" else None
+		return (canon, difficulty, budget), [board[i] for i in perm], perm
+	return (tuple(board), difficulty, size, win_length, time_ms), board, None
+
+
+@csrf_exempt
+@require_POST
+def batch_move_view(request: HttpRequest) -> JsonResponse:
+	"""Compute AI moves for many positions in one request.
+
+	Expects JSON body: { "items": [{ "board": [...], "difficulty": ... }, ...] }
+	(a bare array of items is accepted too). Each item takes the same fields
+	as `move_view`. Identical and symmetric boards are searched once, large
+	batches are spread over a process pool, and results come back in order as
+	{ "results": [...] }; invalid items get an "error" entry of their own.
+	A batch whose distinct searches add up to more than `MAX_BATCH_TIME_MS`
+	of search budget is rejected with 400.
+	"""
+	try:
+		payload = json.loads(request.body.decode("utf-8"))
+	except Exception:
+		return JsonResponse({"error": "invalid json"}, status=400)
+
+	items = payload.get("items") if isinstance(payload, dict) else payload
+	if not isinstance(items, list):
+		return JsonResponse({"error": "items must be a list"}, status=400)
+	if len(items) > MAX_BATCH:
+		return JsonResponse({"error": f"at most {MAX_BATCH} items per batch"}, status=400)
+
+	results: List[Optional[dict]] = [None] * len(items)
+	states = {}
+	pending = {}  # dedup key -> (job args, [(item index, perm), ...])
+	budget_ms = 0
+	for n, item in enumerate(items):
+		try:
+			board, difficulty, size, win_length, time_ms = _parse_position(item)
+		except ValueError as exc:
+			results[n] = {"error": str(exc)}
+			continue
+		state = ai.line_state(board, size, win_length)
+		winner, winning_line, game_over = _result(state)
+		if game_over:
+			results[n] = {"aiMove": None, "winner": winner, "gameOver": True, "winningLine": winning_line}
+			continue
+		states[n] = state
+		key, search_board, perm = _batch_key(board, difficulty, size, win_length, time_ms)
+		if key not in pending:
+			budget_ms += ai.time_budget_ms(difficulty, size, win_length, time_ms)
+			if budget_ms > MAX_BATCH_TIME_MS:
+				return JsonResponse(
+					{"error": f"batch search budget exceeds {MAX_BATCH_TIME_MS} ms"},
+					status=400,
+				)
+			pending[key] = ((search_board, difficulty, size, win_length, time_ms), [])
+		pending[key][1].append((n, perm))
+
+	jobs = list(pending.values())
+	try:
+		moves = workers.best_moves([args for args, _ in jobs], parallel=len(jobs) >= POOL_THRESHOLD)
+	except Exception:
+		return JsonResponse({"error": "ai computation failed"}, status=500)
+
+	for (_, targets), move in zip(jobs, moves):
+		for n, perm in targets:
+			ai_move = perm[move] if perm is not None and move is not None else move
+			state = states[n]
+			if ai_move is not None:
+				state.make(ai_move, SIDE_AI)
+			winner, winning_line, game_over = _result(state)
+			results[n] = {"aiMove": ai_move, "winner": winner, "gameOver": game_over, "winningLine": winning_line}
+
+	return JsonResponse({"results": results})
+
 
+def metrics_view(request: HttpRequest) -> HttpResponse:
+	"""Expose search metrics in Prometheus text format to local scrapers."""
+	if request.META.get("REMOTE_ADDR") not in ALLOWED_ADDRS:
+		raise Http404
+	return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4")
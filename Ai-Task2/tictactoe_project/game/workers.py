@@ -0,0 +1,125 @@
+"""Process pool for spreading engine searches across CPU cores.
+
+The pool is created lazily on first use and shared by every view in the
+process. Worker processes map the perfect-play table themselves, since they
+do not go through Django's app loading.
+
+`submit` is the bounded entry point for request handlers: it refuses new
+work with `Saturated` once `MAX_PENDING` jobs are queued or running, so
+callers can shed load instead of queueing without limit. All other pool
+work (batch moves, MCTS trees) goes through `map_jobs`, which is never
+refused but counts every chunk it queues, so `submit` sees that load too.
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from . import ai
+from .stats import SearchStats
+
+
+# Number of worker processes; defaults to one per CPU.
+POOL_SIZE = int(os.environ.get("GAME_POOL_WORKERS", 0)) or os.cpu_count() or 1
+# Jobs allowed in the pool (queued + running) before `submit` refuses more.
+MAX_PENDING = int(os.environ.get("GAME_POOL_MAX_PENDING", 0)) or POOL_SIZE * 4
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+class Saturated(Exception):
+	"""Raised by `submit` when `MAX_PENDING` jobs are already in the pool."""
+
+Job = Tuple[List[str], str, int, int, Optional[int]]
+
+
+def _init_worker() -> None:
+	from . import table
+
+	table.load_table()
+
+
+def get_pool() -> ProcessPoolExecutor:
+	global _pool
+	with _pool_lock:
+		if _pool is None:
+			_pool = ProcessPoolExecutor(max_workers=POOL_SIZE, initializer=_init_worker)
+		return _pool
+
+
+def pending() -> int:
+	"""Jobs (and `map_jobs` chunks) in the pool that have not finished yet."""
+	return _pending
+
+
+def _release(_future: Future) -> None:
+	global _pending
+	with _pending_lock:
+		_pending -= 1
+
+
+def _submit(fn: Callable, args: tuple, bounded: bool) -> Future:
+	global _pending
+	with _pending_lock:
+		if bounded and _pending >= MAX_PENDING:
+			raise Saturated
+		_pending += 1
+	try:
+		future = get_pool().submit(fn, *args)
+	except BaseException:
+		_release(None)
+		raise
+	future.add_done_callback(_release)
+	return future
+
+
+def submit(fn: Callable, *args) -> Future:
+	"""Run `fn(*args)` in the pool, or raise `Saturated` if it is full.
+
+	A job counts against `MAX_PENDING` until it actually finishes, even if the
+	caller stopped waiting for it.
+	"""
+	return _submit(fn, args, bounded=True)
+
+
+def _run_chunk(fn: Callable, items: Sequence) -> list:
+	return [fn(item) for item in items]
+
+
+def map_jobs(fn: Callable, items: Sequence, chunksize: int = 1) -> list:
+	"""Return `[fn(item) for item in items]`, computed in the pool.
+
+	Like `ProcessPoolExecutor.map`, but each chunk counts as one pending job.
+	Callers wait for the result, so this is not refused when the pool is full.
+	"""
+	futures = [
+		_submit(_run_chunk, (fn, items[i:i + chunksize]), bounded=False)
+		for i in range(0, len(items), chunksize)
+	]
+	return [result for future in futures for result in future.result()]
+
+
+def best_move(job: Job) -> Optional[int]:
+	"""Run `ai.get_best_move` for one `(board, difficulty, size, win_length, time_ms)`."""
+	return ai.get_best_move(*job)
+
+
+def analyse(job: Job) -> Tuple[Optional[int], SearchStats]:
+	"""Run `ai.analyse` for one `(board, difficulty, size, win_length, time_ms)`."""
+	return ai.analyse(*job)
+
+
+def best_moves(jobs: Sequence[Job], parallel: bool = False) -> List[Optional[int]]:
+	"""Return the AI move for every job, in order.
+
+	With `parallel=True` the jobs are fanned out over the shared pool in
+	chunks, amortising the per-task pickling overhead.
+	"""
+	if not parallel or POOL_SIZE < 2:
+		return [best_move(job) for job in jobs]
+	chunksize = max(1, len(jobs) // (POOL_SIZE * 4))
+	return map_jobs(best_move, list(jobs), chunksize=chunksize)
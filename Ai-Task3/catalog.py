@@ -0,0 +1,275 @@
+# Columnar movie catalog with vectorized recommendation scoring (needs NumPy)
+# - genres as integer codes into a small name table
+# - years as an int16 array
+# - titles as one UTF-8 buffer plus offsets (a string table)
+# - scoring is a few array operations; top-N uses argpartition
+# - a binary snapshot next to the CSV is memory-mapped on later runs
+
+import hashlib
+import json
+import os
+import struct
+import tempfile
+from bisect import bisect_right
+
+try:
+    import numpy as np
+except ImportError:  # optional; main.py falls back to MovieIndex
+    np = None
+
+from movie_index import year_ranges
+
+
+SNAPSHOT_MAGIC = b'MOVSNAP1'
+SNAPSHOT_VERSION = 1
+ALIGN = 64
+COLUMNS = ('genre_codes', 'years', 'title_bytes', 'title_offsets', 'rank', 'title_order')
+# years the int16 year column can hold; read_movies_csv skips rows outside it
+MIN_YEAR, MAX_YEAR = -2 ** 15, 2 ** 15 - 1
+
+
+def available():
+    return np is not None
+
+
+def snapshot_path(csv_path):
+    return csv_path + '.snapshot'
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_header(path):
+    """Return the snapshot header dict, or None if missing or unreadable."""
+    try:
+        with open(path, 'rb') as fh:
+            if fh.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                return None
+            fh.seek(-8, os.SEEK_END)
+            (size,) = struct.unpack('<Q', fh.read(8))
+            fh.seek(-8 - size, os.SEEK_END)
+            header = json.loads(fh.read(size).decode('utf-8'))
+    except (OSError, ValueError, struct.error):
+        return None
+    if header.get('version') != SNAPSHOT_VERSION:
+        return None
+    return header
+
+
+def load_cached(csv_path, parse):
+    """Catalog for `csv_path`, from its snapshot when that is still current.
+
+    The snapshot is trusted when the CSV's size and mtime match; if only the
+    mtime changed the CSV is hashed, so touching or copying it does not force
+    a rebuild. Otherwise `parse(csv_path)` (a list of movie dicts) is turned
+    into a Catalog and a fresh snapshot is written.
+    """
+    snap = snapshot_path(csv_path)
+    st = os.stat(csv_path)
+    header = _read_header(snap)
+    if header is not None and header['source']['size'] == st.st_size:
+        if header['source']['mtime_ns'] == st.st_mtime_ns:
+            return Catalog.load(snap, header)
+        digest = file_hash(csv_path)
+        if header['source']['sha256'] == digest:
+            cat = Catalog.load(snap, header)
+            cat.try_save(snap, {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest})
+            return cat
+
+    cat = Catalog.from_movies(parse(csv_path))
+    cat.try_save(snap, {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': file_hash(csv_path)})
+    return cat
+
+
+def _file_mode(path):
+    """Permission bits for a file replacing `path`: its own, else the umask default."""
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+class Catalog:
+    """Read-only movie catalog stored column by column.
+
+    Behaves like a list of movie dicts (len, indexing, iteration), so code
+    written for load_movies() output keeps working, and has the same
+    recommend() as MovieIndex.
+    """
+
+    def __init__(self, genres, genre_codes, years, title_bytes, title_offsets, rank, title_order):
+        self.genres = list(genres)
+        self.genre_code = {g: i for i, g in enumerate(self.genres)}
+        self.genre_codes = genre_codes
+        self.years = years
+        self.title_bytes = title_bytes
+        self.title_offsets = title_offsets
+        # position of each movie in ascending (year, title) order; ties keep
+        # the earlier movie higher, like a stable sort with reverse=True
+        self.rank = rank
+        # movie ids sorted by (title, id), for title lookups
+        self.title_order = title_order
+        if len(years):
+            self.min_year = int(years.min())
+            self.max_year = int(years.max())
+        else:
+            self.min_year = self.max_year = 0
+
+    @classmethod
+    def from_movies(cls, movies):
+        n = len(movies)
+        titles = [m['title'] for m in movies]
+        encoded = [t.encode('utf-8') for t in titles]
+
+        genres = []
+        genre_code = {}
+        genre_codes = np.empty(n, dtype=np.int16)
+        for i, m in enumerate(movies):
+            code = genre_code.get(m['genre'])
+            if code is None:
+                code = genre_code[m['genre']] = len(genres)
+                genres.append(m['genre'])
+            genre_codes[i] = code
+
+        years = np.fromiter((m['year'] for m in movies), dtype=np.int16, count=n)
+        title_offsets = np.zeros(n + 1, dtype=np.int64)
+        title_offsets[1:] = np.cumsum([len(b) for b in encoded])
+        title_bytes = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+        # sort titles once in Python, then rank with integer keys only
+        title_order = np.array(sorted(range(n), key=titles.__getitem__), dtype=np.int64)
+        title_rank = np.empty(n, dtype=np.int64)
+        dense, previous = -1, None
+        for i in title_order.tolist():
+            if titles[i] != previous:
+                dense += 1
+                previous = titles[i]
+            title_rank[i] = dense
+        ids = np.arange(n, dtype=np.int64)
+        rank = np.empty(n, dtype=np.int64)
+        rank[np.lexsort((-ids, title_rank, years))] = ids
+
+        return cls(genres, genre_codes, years, title_bytes, title_offsets, rank, title_order)
+
+    @classmethod
+    def load(cls, path, header):
+        """Memory-map the columns of a snapshot written by save()."""
+        columns = {}
+        for name in COLUMNS:
+            dtype, length, offset = header['columns'][name]
+            if length:
+                columns[name] = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(length,))
+            else:
+                columns[name] = np.zeros(0, dtype=dtype)
+        return cls(header['genres'], **columns)
+
+    def save(self, path, source):
+        """Write the catalog to `path` atomically; `source` describes the CSV."""
+        arrays = [np.ascontiguousarray(getattr(self, name)) for name in COLUMNS]
+        header = {'version': SNAPSHOT_VERSION, 'source': source, 'genres': self.genres, 'columns': {}}
+        # layout: magic, columns (each 64-byte aligned), JSON header, header length
+        offset = ALIGN
+        for name, arr in zip(COLUMNS, arrays):
+            header['columns'][name] = [arr.dtype.str, len(arr), offset]
+            offset += -(-arr.nbytes // ALIGN) * ALIGN
+        raw = json.dumps(header).encode('utf-8')
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.snapshot-')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                # mkstemp creates the file as 0600
+                os.fchmod(fh.fileno(), _file_mode(path))
+                fh.write(SNAPSHOT_MAGIC)
+                for name, arr in zip(COLUMNS, arrays):
+                    fh.seek(header['columns'][name][2])
+                    fh.write(arr.tobytes())
+                fh.seek(offset)
+                fh.write(raw + struct.pack('<Q', len(raw)))
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def try_save(self, path, source):
+        try:
+            self.save(path, source)
+        except OSError:
+            # read-only checkout etc.; the catalog still works from memory
+            pass
+
+    def __len__(self):
+        return len(self.years)
+
+    def __getitem__(self, i):
+        return {'title': self.title(i), 'genre': self.genres[self.genre_codes[i]], 'year': int(self.years[i])}
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def title(self, i):
+        return self.title_bytes[self.title_offsets[i]:self.title_offsets[i + 1]].tobytes().decode('utf-8')
+
+    def titles(self):
+        """All titles as a list of str (decodes the whole string table once)."""
+        raw = self.title_bytes.tobytes()
+        bounds = self.title_offsets.tolist()
+        return [raw[bounds[i]:bounds[i + 1]].decode('utf-8') for i in range(len(self))]
+
+    def find(self, title):
+        """Id of the last movie called `title` (like a title -> movie dict), or None."""
+        order = self.title_order
+        pos = bisect_right(order, title, key=self.title) - 1
+        if pos >= 0 and self.title(order[pos]) == title:
+            return int(order[pos])
+        return None
+
+    def find_movie(self, title):
+        i = self.find(title)
+        return None if i is None else self[i]
+
+    def liked_years(self, ratings):
+        """Years of the movies rated 4 or higher (unknown titles and year 0 skipped)."""
+        years = []
+        for t, r in ratings.items():
+            i = self.find(t) if r >= 4 else None
+            if i is not None and self.years[i]:
+                years.append(int(self.years[i]))
+        return years
+
+    def recommend(self, prefs, ratings, limit=None):
+        """Scored (score, movie) pairs, best first; same ranking as MovieIndex."""
+        n = len(self)
+        # scores are 0..3, so int8 columns keep the passes over the catalog cheap
+        wanted = np.zeros(len(self.genres) or 1, dtype=np.int8)
+        wanted[[self.genre_code[g] for g in set(prefs or ()) if g in self.genre_code]] = 2
+        score = wanted[self.genre_codes] if n else np.zeros(0, dtype=np.int8)
+
+        high_years = self.liked_years(ratings)
+        if high_years and n:
+            # one lookup table over the catalog's year span instead of a
+            # comparison per liked year
+            near = np.zeros(self.max_year - self.min_year + 1, dtype=np.int8)
+            for lo, hi in year_ranges(high_years):
+                lo = max(lo, self.min_year)
+                hi = min(hi, self.max_year)
+                if lo <= hi:
+                    near[lo - self.min_year:hi - self.min_year + 1] = 1
+            # int32: the span between the oldest and newest year can exceed int16
+            score += near[self.years.astype(np.int32) - self.min_year]
+
+        ids = np.flatnonzero(score) if prefs else np.arange(n)
+        key = score[ids].astype(np.int64) * max(n, 1) + self.rank[ids]
+        if limit is not None and limit < len(ids):
+            top = np.argpartition(-key, limit - 1)[:limit]
+            ids, key = ids[top], key[top]
+        ids = ids[np.argsort(-key, kind='stable')]
+        return [(int(score[i]), self[i]) for i in ids]
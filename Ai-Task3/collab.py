@@ -0,0 +1,256 @@
+# Item-item collaborative filtering for the movie recommender (needs NumPy)
+# - ratings.csv: multi-user ratings store (user,title,rating), append-only,
+#   last rating per (user, title) wins
+# - offline job: adjusted-cosine similarity between titles, keeping the
+#   top-K neighbours per title in CSR form (offsets / neighbour ids / sims)
+# - online: collaborative scores from the neighbours of the titles a user
+#   rated, so the cost depends on the user's ratings, not the catalog
+#
+# Build the index with:  python collab.py [--ratings ratings.csv] [--out similarity.npz] [-k 20]
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:  # optional; recommendations stay content-only
+    np = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+RATINGS_CSV = os.path.join(BASE_DIR, 'ratings.csv')
+SIMILARITY_FILE = os.path.join(BASE_DIR, 'similarity.npz')
+
+TOP_K = 20
+MIN_COMMON = 2        # co-raters needed before two titles count as similar
+SHRINK = 10           # damps similarities backed by few co-raters
+MAX_USER_ITEMS = 500  # cap on a user's ratings used for pairs (cost is quadratic)
+PAIR_CHUNK = 5_000_000
+
+
+def available():
+    return np is not None
+
+
+class RatingsStore:
+    """Append-only CSV of (user, title, rating) rows."""
+
+    def __init__(self, path=RATINGS_CSV):
+        self.path = path
+
+    def add(self, user, title, rating):
+        new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, 'a', newline='', encoding='utf-8') as fh:
+            writer = csv.writer(fh)
+            if new:
+                writer.writerow(['user', 'title', 'rating'])
+            writer.writerow([user, title, rating])
+
+    def load(self):
+        """Return {(user, title): rating}, later rows overriding earlier ones."""
+        ratings = {}
+        if not os.path.exists(self.path):
+            return ratings
+        with open(self.path, newline='', encoding='utf-8') as fh:
+            for row in csv.DictReader(fh):
+                try:
+                    user = row['user'].strip()
+                    title = row['title'].strip()
+                    rating = float(row['rating'])
+                except (KeyError, AttributeError, TypeError, ValueError):
+                    continue
+                if user and title:
+                    ratings[(user, title)] = rating
+        return ratings
+
+
+def _string_table(strings):
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def build_similarity(ratings, k=TOP_K, min_common=MIN_COMMON, shrink=SHRINK):
+    """Top-k adjusted-cosine neighbours per title from {(user, title): rating}.
+
+    Returns (titles, offsets, neighbours, sims): the neighbours of title i
+    are neighbours[offsets[i]:offsets[i + 1]], best first.
+    """
+    users = {}
+    titles = {}
+    u = np.empty(len(ratings), dtype=np.int64)
+    i = np.empty(len(ratings), dtype=np.int64)
+    r = np.empty(len(ratings), dtype=np.float64)
+    for n, ((user, title), rating) in enumerate(ratings.items()):
+        u[n] = users.setdefault(user, len(users))
+        i[n] = titles.setdefault(title, len(titles))
+        r[n] = rating
+    n_items = len(titles)
+
+    # centre each user's ratings on their mean (adjusted cosine)
+    counts = np.bincount(u, minlength=len(users))
+    means = np.bincount(u, weights=r, minlength=len(users)) / np.maximum(counts, 1)
+    r = r - means[u]
+    norms = np.sqrt(np.bincount(i, weights=r * r, minlength=n_items))
+
+    order = np.argsort(u, kind='stable')
+    u, i, r = u[order], i[order], r[order]
+    bounds = np.flatnonzero(np.diff(u)) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [len(u)]))
+
+    # accumulate dot products and co-rater counts per (a, b) pair, a < b
+    pair_keys, pair_dots, pair_counts = [], [], []
+    keys, dots = [], []
+    pending = 0
+    triu = {}
+
+    def flush():
+        if not keys:
+            return
+        key = np.concatenate(keys)
+        uniq, inverse = np.unique(key, return_inverse=True)
+        pair_keys.append(uniq)
+        pair_dots.append(np.bincount(inverse, weights=np.concatenate(dots)))
+        pair_counts.append(np.bincount(inverse).astype(np.int64))
+        keys.clear()
+        dots.clear()
+
+    for start, end in zip(starts, ends):
+        items, values = i[start:end], r[start:end]
+        if len(items) > MAX_USER_ITEMS:
+            # keep the ratings that say the most about this user's taste
+            keep = np.argsort(-np.abs(values), kind='stable')[:MAX_USER_ITEMS]
+            items, values = items[keep], values[keep]
+        m = len(items)
+        if m < 2:
+            continue
+        if m not in triu:
+            triu[m] = np.triu_indices(m, 1)
+        x, y = triu[m]
+        a, b = items[x], items[y]
+        lo, hi = np.minimum(a, b), np.maximum(a, b)
+        keys.append(lo * n_items + hi)
+        dots.append(values[x] * values[y])
+        pending += len(x)
+        if pending >= PAIR_CHUNK:
+            flush()
+            pending = 0
+    flush()
+
+    if pair_keys:
+        key = np.concatenate(pair_keys)
+        uniq, inverse = np.unique(key, return_inverse=True)
+        dot = np.bincount(inverse, weights=np.concatenate(pair_dots))
+        common = np.bincount(inverse, weights=np.concatenate(pair_counts))
+    else:
+        uniq = np.zeros(0, dtype=np.int64)
+        dot = common = np.zeros(0)
+
+    a, b = uniq // max(n_items, 1), uniq % max(n_items, 1)
+    denom = norms[a] * norms[b]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sim = np.where(denom > 0, dot / denom, 0.0) * (common / (common + shrink))
+    keep = (common >= min_common) & (sim > 0)
+    a, b, sim = a[keep], b[keep], sim[keep]
+
+    # both directions, then the best k per source title
+    src = np.concatenate((a, b))
+    dst = np.concatenate((b, a))
+    sim = np.concatenate((sim, sim))
+    order = np.lexsort((-sim, src))
+    src, dst, sim = src[order], dst[order], sim[order]
+    first = np.searchsorted(src, np.arange(n_items))
+    position = np.arange(len(src)) - first[src]
+    top = position < k
+    src, dst, sim = src[top], dst[top], sim[top]
+
+    offsets = np.zeros(n_items + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(src, minlength=n_items))
+    return list(titles), offsets, dst.astype(np.int32), sim.astype(np.float32)
+
+
+def save_similarity(path, titles, offsets, neighbours, sims):
+    title_bytes, title_offsets = _string_table(titles)
+    with open(path + '.tmp', 'wb') as fh:
+        np.savez(fh, title_bytes=title_bytes, title_offsets=title_offsets,
+                 offsets=offsets, neighbours=neighbours, sims=sims)
+    os.replace(path + '.tmp', path)
+
+
+class SimilarityIndex:
+    """Precomputed top-K neighbours per title, loaded from save_similarity()."""
+
+    def __init__(self, titles, offsets, neighbours, sims):
+        self.titles = titles
+        self.title_id = {t: n for n, t in enumerate(titles)}
+        self.offsets = offsets
+        self.neighbours = neighbours
+        self.sims = sims
+
+    @classmethod
+    def load(cls, path=SIMILARITY_FILE):
+        """Return the index at `path`, or None if it is missing or numpy is not installed."""
+        if np is None or not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            raw = data['title_bytes'].tobytes()
+            bounds = data['title_offsets'].tolist()
+            titles = [raw[bounds[n]:bounds[n + 1]].decode('utf-8') for n in range(len(bounds) - 1)]
+            return cls(titles, data['offsets'], data['neighbours'], data['sims'])
+
+    def neighbours_of(self, title):
+        n = self.title_id.get(title)
+        if n is None:
+            return []
+        lo, hi = self.offsets[n], self.offsets[n + 1]
+        return [(self.titles[j], float(s)) for j, s in zip(self.neighbours[lo:hi], self.sims[lo:hi])]
+
+    def scores(self, ratings):
+        """Collaborative score per title from the user's {title: rating}.
+
+        Weighted average of the user's mean-centred ratings over the rated
+        neighbours of each candidate, in [-range, +range] of the ratings.
+        Only neighbours of rated titles are touched.
+        """
+        rated = [(self.title_id[t], v) for t, v in ratings.items() if t in self.title_id]
+        if not rated:
+            return {}
+        mean = sum(v for _, v in rated) / len(rated)
+        total = {}
+        weight = {}
+        for n, v in rated:
+            lo, hi = self.offsets[n], self.offsets[n + 1]
+            for j, s in zip(self.neighbours[lo:hi].tolist(), self.sims[lo:hi].tolist()):
+                total[j] = total.get(j, 0.0) + s * (v - mean)
+                weight[j] = weight.get(j, 0.0) + s
+        return {self.titles[j]: total[j] / weight[j] for j in total if weight[j] > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the item-item similarity index from ratings.csv.')
+    parser.add_argument('--ratings', default=RATINGS_CSV)
+    parser.add_argument('--out', default=SIMILARITY_FILE)
+    parser.add_argument('-k', type=int, default=TOP_K, help='neighbours kept per title')
+    parser.add_argument('--min-common', type=int, default=MIN_COMMON)
+    args = parser.parse_args()
+
+    if np is None:
+        print('numpy is required to build the similarity index.')
+        sys.exit(1)
+
+    start = time.perf_counter()
+    ratings = RatingsStore(args.ratings).load()
+    print(f'Loaded {len(ratings)} ratings in {time.perf_counter() - start:.1f}s')
+    titles, offsets, neighbours, sims = build_similarity(ratings, k=args.k, min_common=args.min_common)
+    save_similarity(args.out, titles, offsets, neighbours, sims)
+    print(f'Wrote {len(neighbours)} neighbours for {len(titles)} titles to {args.out} '
+          f'in {time.perf_counter() - start:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
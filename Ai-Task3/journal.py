@@ -0,0 +1,168 @@
+# Append-only journal for user preferences and ratings (history.txt)
+# - one line per change, same PREF:/RATING: format as before
+# - replayed on load with last-writer-wins
+# - fsync batched every few records / fraction of a second
+# - compacted into a fresh snapshot once stale lines dominate
+# - a last line without its newline is an append cut short by a crash; it is
+#   ignored on load and cut off before the next append
+
+import os
+import tempfile
+import time
+
+
+def parse_line(line, prefs, ratings):
+    """Apply one history line to prefs/ratings; returns the new prefs."""
+    line = line.strip()
+    if line.startswith('PREF:'):
+        raw = line[len('PREF:'):]
+        prefs = [p.strip() for p in raw.split(',') if p.strip()]
+    elif line.startswith('RATING:'):
+        raw = line[len('RATING:'):]
+        parts = raw.split('|')
+        if len(parts) >= 2:
+            title = parts[0].strip()
+            try:
+                rating = int(parts[1])
+            except Exception:
+                rating = 0
+            ratings[title] = rating
+    return prefs
+
+
+def read_history(path):
+    """Replay `path`; returns (prefs, ratings, number of records)."""
+    prefs = []
+    ratings = {}
+    records = 0
+    if not os.path.exists(path):
+        return prefs, ratings, records
+
+    with open(path, encoding='utf-8') as fh:
+        for line in fh:
+            if line.strip() and line.endswith('\n'):
+                prefs = parse_line(line, prefs, ratings)
+                records += 1
+    return prefs, ratings, records
+
+
+def _drop_torn_tail(path):
+    """Truncate `path` after its last newline, dropping a partly written record."""
+    with open(path, 'rb+') as fh:
+        end = pos = fh.seek(0, os.SEEK_END)
+        while pos > 0:
+            step = min(4096, pos)
+            fh.seek(pos - step)
+            newline = fh.read(step).rfind(b'\n')
+            if newline >= 0:
+                pos += newline + 1 - step
+                break
+            pos -= step
+        if pos != end:
+            fh.truncate(pos)
+
+
+def snapshot_lines(prefs, ratings):
+    lines = []
+    if prefs:
+        lines.append('PREF:' + ','.join(prefs) + '\n')
+    for title, rating in ratings.items():
+        lines.append(f'RATING:{title}|{rating}\n')
+    return lines
+
+
+def _file_mode(path):
+    """Permission bits for a file replacing `path`: its own, else the umask default."""
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def write_snapshot(path, prefs, ratings):
+    """Atomically replace `path` with one line per live preference/rating."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.history-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+            # mkstemp creates the file as 0600
+            os.fchmod(fh.fileno(), _file_mode(path))
+            fh.writelines(snapshot_lines(prefs, ratings))
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class HistoryJournal:
+    """Appends history changes to `path` instead of rewriting it.
+
+    Each record is written and flushed immediately, but only fsynced every
+    `sync_every` records or `sync_interval` seconds (and on close), so a
+    crash can lose at most that last batch. When the file holds more than
+    `compact_min` records and over twice as many as are live, it is
+    compacted into a snapshot.
+    """
+
+    def __init__(self, path, sync_every=32, sync_interval=1.0, compact_min=1000):
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_min = compact_min
+        self.prefs = []
+        self.ratings = {}
+        self.records = 0
+        self._fh = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def load(self):
+        """Replay the journal; returns (prefs, ratings)."""
+        self.prefs, self.ratings, self.records = read_history(self.path)
+        return list(self.prefs), dict(self.ratings)
+
+    def set_prefs(self, prefs):
+        self.prefs = list(prefs)
+        self._append('PREF:' + ','.join(prefs) + '\n')
+
+    def rate(self, title, rating):
+        self.ratings[title] = rating
+        self._append(f'RATING:{title}|{rating}\n')
+
+    def _append(self, line):
+        if self._fh is None:
+            # don't glue the first record onto a torn last line
+            if os.path.exists(self.path):
+                _drop_torn_tail(self.path)
+            self._fh = open(self.path, 'a', encoding='utf-8')
+        self._fh.write(line)
+        self._fh.flush()
+        self.records += 1
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+            self.sync()
+        live = len(self.ratings) + (1 if self.prefs else 0)
+        if self.records > self.compact_min and self.records > 2 * live:
+            self.compact()
+
+    def sync(self):
+        if self._fh is not None and self._unsynced:
+            os.fsync(self._fh.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def compact(self):
+        """Rewrite the journal as a snapshot of the live state."""
+        self.close()
+        write_snapshot(self.path, self.prefs, self.ratings)
+        self.records = len(self.ratings) + (1 if self.prefs else 0)
+
+    def close(self):
+        if self._fh is not None:
+            self.sync()
+            self._fh.close()
+            self._fh = None
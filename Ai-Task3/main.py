@@ -7,26 +7,52 @@ import csv
 import os
 import sys
 
+import catalog
+import collab
+import journal
+from movie_index import MovieIndex, content_score, year_ranges
+from title_search import TitleIndex
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 MOVIES_CSV = os.path.join(BASE_DIR, 'movies.csv')
 HISTORY_FILE = os.path.join(BASE_DIR, 'history.txt')
 
+# Ratings are also recorded under this user in the multi-user store
+# (collab.RATINGS_CSV) that `python collab.py` builds the similarity index from.
+USER_ID = os.environ.get('MOVIE_USER', 'local')
+# How much one point of collaborative score is worth against the content score
+COLLAB_WEIGHT = 0.5
+
 
 def load_movies():
-    """Load movies from MOVIES_CSV into a list of dicts."""
-    movies = []
+    """Load movies from MOVIES_CSV.
+
+    With numpy installed this is a Catalog memory-mapped from the binary
+    snapshot next to the CSV (rebuilt when the CSV changes); otherwise a
+    list of dicts.
+    """
     if not os.path.exists(MOVIES_CSV):
         print('movies.csv not found in this folder.')
-        return movies
+        return []
 
-    with open(MOVIES_CSV, newline='', encoding='utf-8') as fh:
+    if catalog.available():
+        return catalog.load_cached(MOVIES_CSV, read_movies_csv)
+    return read_movies_csv(MOVIES_CSV)
+
+
+def read_movies_csv(path):
+    """Parse a movies CSV into a list of dicts, skipping invalid rows."""
+    movies = []
+    with open(path, newline='', encoding='utf-8') as fh:
         reader = csv.DictReader(fh)
         for row in reader:
             try:
                 title = row.get('title', '').strip()
                 genre = row.get('genre', '').strip()
                 year = int(row.get('year', 0))
+                if not catalog.MIN_YEAR <= year <= catalog.MAX_YEAR:
+                    continue
                 if title and genre:
                     movies.append({
                         'title': title,
@@ -41,39 +67,13 @@ def load_movies():
 
 def load_history():
     """Load user preferences and ratings from HISTORY_FILE."""
-    prefs = []
-    ratings = {}
-    if not os.path.exists(HISTORY_FILE):
-        return prefs, ratings
-
-    with open(HISTORY_FILE, encoding='utf-8') as fh:
-        for line in fh:
-            line = line.strip()
-            if not line:
-                continue
-            if line.startswith('PREF:'):
-                raw = line[len('PREF:'):]
-                prefs = [p.strip() for p in raw.split(',') if p.strip()]
-            elif line.startswith('RATING:'):
-                raw = line[len('RATING:'):]
-                parts = raw.split('|')
-                if len(parts) >= 2:
-                    title = parts[0].strip()
-                    try:
-                        rating = int(parts[1])
-                    except Exception:
-                        rating = 0
-                    ratings[title] = rating
+    prefs, ratings, _ = journal.read_history(HISTORY_FILE)
     return prefs, ratings
 
 
 def save_history(prefs, ratings):
-    """Save preferences and ratings to HISTORY_FILE."""
-    with open(HISTORY_FILE, 'w', encoding='utf-8') as fh:
-        if prefs:
-            fh.write('PREF:' + ','.join(prefs) + '\n')
-        for title, rating in ratings.items():
-            fh.write(f'RATING:{title}|{rating}\n')
+    """Save preferences and ratings to HISTORY_FILE as a compact snapshot."""
+    journal.write_snapshot(HISTORY_FILE, prefs, ratings)
 
 
 def set_preferences():
@@ -83,32 +83,59 @@ def set_preferences():
     return prefs
 
 
-def recommend(movies, prefs, ratings):
-    """Get recommendations sorted by score."""
+def build_index(movies):
+    """Columnar NumPy catalog when numpy is installed, else the pure-Python index."""
+    if isinstance(movies, catalog.Catalog):
+        return movies
+    if catalog.available():
+        return catalog.Catalog.from_movies(movies)
+    return MovieIndex(movies)
+
+
+def recommend(movies, prefs, ratings, limit=None, index=None, similarity=None):
+    """Get recommendations sorted by score (at most `limit` of them).
+
+    Pass a prebuilt index (see build_index) to avoid re-indexing per call,
+    and a collab.SimilarityIndex to blend in collaborative scores.
+    """
     if not movies:
         print('No movies available to recommend.')
         return []
 
-    title_to_year = {m['title']: m['year'] for m in movies}
-    high_years = [title_to_year.get(t) for t, r in ratings.items() if r >= 4 and title_to_year.get(t)]
+    if index is None:
+        index = build_index(movies)
+    if similarity is not None:
+        collab_scores = {t: c for t, c in similarity.scores(ratings).items() if t not in ratings}
+        if collab_scores:
+            return blend(index, prefs, ratings, limit, collab_scores)
+    return index.recommend(prefs, ratings, limit)
 
-    scored = []
-    for m in movies:
-        s = 0
 
-        if prefs and m['genre'] in prefs:
-            s += 2
+def blend(index, prefs, ratings, limit, collab_scores):
+    """Content ranking with COLLAB_WEIGHT * collaborative score added.
 
-        for hy in high_years:
-            if abs(m['year'] - hy) <= 5:
-                s += 1
-                break
+    Only the titles with a collaborative score can move, so it is enough to
+    take `limit + len(collab_scores)` content results and score those titles
+    individually; the work grows with the user's ratings, not the catalog.
+    """
+    base = index.recommend(prefs, ratings, None if limit is None else limit + len(collab_scores))
+    ranges = year_ranges(index.liked_years(ratings))
 
+    scored = []
+    for s, m in base:
+        if m['title'] in collab_scores:
+            continue
+        scored.append((s, m))
+    for title, c in collab_scores.items():
+        m = index.find_movie(title)
+        if m is None:
+            continue
+        s = round(content_score(m, prefs, ranges) + COLLAB_WEIGHT * c, 2)
         if s > 0 or not prefs:
             scored.append((s, m))
 
     scored.sort(key=lambda x: (x[0], x[1]['year'], x[1]['title']), reverse=True)
-    return scored
+    return scored if limit is None else scored[:limit]
 
 
 def show_recommendations(scored):
@@ -119,18 +146,35 @@ def show_recommendations(scored):
         print(f'{idx}. {m["title"]} ({m["year"]}) - {m["genre"]} [score={s}]')
 
 
-def search_movie(movies):
-    q = input('Enter movie name to search: ').strip().lower()
+def build_title_index(movies):
+    if isinstance(movies, catalog.Catalog):
+        return TitleIndex(movies.titles())
+    return TitleIndex([m['title'] for m in movies])
+
+
+def search_movie(movies, title_index=None):
+    q = input('Enter movie name to search (end with * to match the start of titles): ').strip()
     if not q:
         print('Empty query.')
         return
 
-    found = [m for m in movies if q in m['title'].lower()]
-    if not found:
-        print('No matching movies found.')
-        return
+    if title_index is None:
+        title_index = build_title_index(movies)
+    if q.endswith('*') and q[:-1].strip():
+        found = title_index.search(q[:-1].strip(), prefix=True)
+    else:
+        found = title_index.search(q)
 
-    for m in found:
+    if not found:
+        close = title_index.fuzzy(q.rstrip('*'))
+        if not close:
+            print('No matching movies found.')
+            return
+        print('No exact match. Did you mean:')
+        found = [i for _, i in close]
+
+    for i in found:
+        m = movies[i]
         print(f"Title: {m['title']}\nGenre: {m['genre']}\nYear: {m['year']}\n---")
 
 
@@ -158,7 +202,13 @@ def prompt_int(prompt, default=None, minv=None, maxv=None):
 
 def main():
     movies = load_movies()
-    prefs, ratings = load_history()
+    index = build_index(movies)
+    history = journal.HistoryJournal(HISTORY_FILE)
+    prefs, ratings = history.load()
+    ratings_store = collab.RatingsStore()
+    similarity = collab.SimilarityIndex.load()
+    # built on the first search, so startup stays fast on large catalogs
+    title_index = None
 
     print('Welcome to the Movie Recommendation System')
 
@@ -172,12 +222,11 @@ def main():
 
         if choice == '1':
             prefs = set_preferences()
-            save_history(prefs, ratings)
+            history.set_prefs(prefs)
 
         elif choice == '2':
-            scored = recommend(movies, prefs, ratings)
             n = prompt_int('How many recommendations do you want? (e.g. 3): ', default=3, minv=1)
-            top = scored[:n]
+            top = recommend(movies, prefs, ratings, limit=n, index=index, similarity=similarity)
             show_recommendations(top)
 
             if top:
@@ -196,15 +245,18 @@ def main():
                     title = top[i - 1][1]['title']
                     r = prompt_int(f'Rate "{title}" (1-5): ', minv=1, maxv=5)
                     ratings[title] = r
-                    save_history(prefs, ratings)
+                    history.rate(title, r)
+                    ratings_store.add(USER_ID, title, r)
                     print(f'Rating saved for {title}.')
 
         elif choice == '3':
-            search_movie(movies)
+            if title_index is None:
+                title_index = build_title_index(movies)
+            search_movie(movies, title_index)
 
         elif choice == '4':
             print('Goodbye.')
-            save_history(prefs, ratings)
+            history.close()
             break
 
         else:
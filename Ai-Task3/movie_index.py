@@ -0,0 +1,110 @@
+# Prebuilt lookup structures for the movie recommender
+# - genre -> movie ids
+# - movies sorted by year, for bisect range lookups around liked years
+# - movies pre-sorted by (year, title), for filling results without scoring
+# - heap-based top-N so a small request never sorts the whole catalog
+
+import heapq
+from bisect import bisect_left, bisect_right
+
+YEAR_WINDOW = 5
+
+
+def year_ranges(liked_years):
+    """Merge [year - YEAR_WINDOW, year + YEAR_WINDOW] around every liked year."""
+    ranges = []
+    for y in sorted(set(liked_years)):
+        lo, hi = y - YEAR_WINDOW, y + YEAR_WINDOW
+        if ranges and lo <= ranges[-1][1]:
+            ranges[-1][1] = hi
+        else:
+            ranges.append([lo, hi])
+    return ranges
+
+
+def content_score(movie, prefs, ranges):
+    """Score of one movie: 2 for a preferred genre, 1 if inside a liked-year range."""
+    s = 2 if prefs and movie['genre'] in prefs else 0
+    if any(lo <= movie['year'] <= hi for lo, hi in ranges):
+        s += 1
+    return s
+
+
+class MovieIndex:
+    """Indexes over a list of movie dicts (title, genre, year)."""
+
+    def __init__(self, movies):
+        self.movies = movies
+        self.by_genre = {}
+        for i, m in enumerate(movies):
+            self.by_genre.setdefault(m['genre'], []).append(i)
+
+        self.by_year = sorted(range(len(movies)), key=lambda i: movies[i]['year'])
+        self.years = [movies[i]['year'] for i in self.by_year]
+
+        # best-first order for movies that score 0
+        self.ranked = sorted(range(len(movies)), key=lambda i: (movies[i]['year'], movies[i]['title']), reverse=True)
+
+        # last movie with each title, like a title -> movie dict comprehension
+        self.title_to_id = {m['title']: i for i, m in enumerate(movies)}
+
+    def find_movie(self, title):
+        i = self.title_to_id.get(title)
+        return None if i is None else self.movies[i]
+
+    def liked_years(self, ratings):
+        """Years of the movies rated 4 or higher (unknown titles and year 0 skipped)."""
+        years = []
+        for t, r in ratings.items():
+            m = self.find_movie(t) if r >= 4 else None
+            if m and m['year']:
+                years.append(m['year'])
+        return years
+
+    def near_years(self, liked_years):
+        """Ids of movies within YEAR_WINDOW years of any liked year."""
+        ids = set()
+        for lo, hi in year_ranges(liked_years):
+            start = bisect_left(self.years, lo)
+            end = bisect_right(self.years, hi)
+            ids.update(self.by_year[start:end])
+        return ids
+
+    def recommend(self, prefs, ratings, limit=None):
+        """Scored (score, movie) pairs, best first; same ranking as a full scan.
+
+        A movie scores 2 for a preferred genre and 1 for being released near a
+        movie rated 4 or higher. With preferences only movies that score are
+        returned; without them every movie is, zero scores included.
+        """
+        movies = self.movies
+        near = self.near_years(self.liked_years(ratings))
+
+        genre_ids = set()
+        for genre in set(prefs or ()):
+            genre_ids.update(self.by_genre.get(genre, ()))
+
+        scored = [((2 if i in genre_ids else 0) + (1 if i in near else 0), i) for i in genre_ids | near]
+
+        def key(item):
+            # -i: among equal (score, year, title) the earlier movie ranks
+            # higher, as in a stable sort with reverse=True
+            s, i = item
+            return (s, movies[i]['year'], movies[i]['title'], -i)
+
+        if limit is None:
+            scored.sort(key=key, reverse=True)
+        else:
+            scored = heapq.nlargest(limit, scored, key=key)
+
+        if not prefs:
+            # every other movie scores 0 and ranks after the scored ones
+            wanted = len(movies) if limit is None else limit
+            taken = {i for _, i in scored}
+            for i in self.ranked:
+                if len(scored) >= wanted:
+                    break
+                if i not in taken:
+                    scored.append((0, i))
+
+        return [(s, movies[i]) for s, i in scored]
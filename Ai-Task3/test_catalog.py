@@ -0,0 +1,140 @@
+# Checks the columnar Catalog against the original full-scan recommender,
+# and when its on-disk snapshot is reused or rebuilt.
+# Run with:  python -m unittest  (from this folder)
+
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+import catalog
+import main
+from test_movie_index import full_scan, random_catalog, random_query
+
+
+@unittest.skipUnless(catalog.available(), 'numpy is not installed')
+class CatalogTest(unittest.TestCase):
+    def test_matches_full_scan(self):
+        rng = random.Random(21)
+        for _ in range(300):
+            movies = random_catalog(rng, rng.randint(0, 60))
+            cat = catalog.Catalog.from_movies(movies)
+            self.assertEqual(list(cat), movies)
+            prefs, ratings = random_query(rng, movies)
+            expected = full_scan(movies, prefs, ratings)
+            self.assertEqual(cat.recommend(prefs, ratings), expected)
+            for limit in (0, 1, 5, len(movies) + 3):
+                self.assertEqual(cat.recommend(prefs, ratings, limit), expected[:limit])
+
+    def test_find_returns_last_with_title(self):
+        movies = [
+            {'title': 'B', 'genre': 'Action', 'year': 1990},
+            {'title': 'A', 'genre': 'Drama', 'year': 2000},
+            {'title': 'B', 'genre': 'Comedy', 'year': 2010},
+        ]
+        cat = catalog.Catalog.from_movies(movies)
+        self.assertEqual(cat.find('B'), 2)
+        self.assertEqual(cat.find('A'), 1)
+        self.assertIsNone(cat.find('C'))
+        self.assertEqual(cat.titles(), ['B', 'A', 'B'])
+
+    def test_year_span_wider_than_int16(self):
+        movies = [
+            {'title': 'Old', 'genre': 'Action', 'year': catalog.MIN_YEAR},
+            {'title': 'New', 'genre': 'Drama', 'year': catalog.MAX_YEAR},
+            {'title': 'Now', 'genre': 'Action', 'year': 1999},
+        ]
+        cat = catalog.Catalog.from_movies(movies)
+        ratings = {'Old': 5, 'New': 5}
+        self.assertEqual(cat.recommend(['Action'], ratings), full_scan(movies, ['Action'], ratings))
+
+
+@unittest.skipUnless(catalog.available(), 'numpy is not installed')
+class LoadCachedTest(unittest.TestCase):
+    CSV = 'title,genre,year\nAlien,Horror,1979\nUp,Comedy,2009\n'
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'movies.csv')
+        self.parsed = 0
+        self.write(self.CSV, mtime_ns=1_000_000_000_000)
+
+    def write(self, text, mtime_ns):
+        with open(self.path, 'w', encoding='utf-8', newline='') as fh:
+            fh.write(text)
+        os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def parse(self, path):
+        self.parsed += 1
+        return main.read_movies_csv(path)
+
+    def load(self):
+        """Load through the snapshot; return (movies, whether the CSV was parsed)."""
+        before = self.parsed
+        cat = catalog.load_cached(self.path, self.parse)
+        return list(cat), self.parsed > before
+
+    def test_reuses_snapshot_when_unchanged(self):
+        movies, parsed = self.load()
+        self.assertTrue(parsed)
+        self.assertTrue(os.path.exists(catalog.snapshot_path(self.path)))
+        self.assertEqual(self.load(), (movies, False))
+        self.assertEqual(movies, main.read_movies_csv(self.path))
+
+    def test_touch_only_rehashes(self):
+        movies, _ = self.load()
+        os.utime(self.path, ns=(2_000_000_000_000, 2_000_000_000_000))
+        self.assertEqual(self.load(), (movies, False))
+        # the new mtime was recorded, so the next load skips the hash
+        with mock.patch.object(catalog, 'file_hash', side_effect=AssertionError('hashed')):
+            self.assertEqual(self.load(), (movies, False))
+
+    def test_rebuilds_when_size_changes(self):
+        self.load()
+        self.write(self.CSV + 'Heat,Crime,1995\n', mtime_ns=1_000_000_000_000)
+        movies, parsed = self.load()
+        self.assertTrue(parsed)
+        self.assertEqual([m['title'] for m in movies], ['Alien', 'Up', 'Heat'])
+        self.assertEqual(self.load(), (movies, False))
+
+    def test_rebuilds_after_same_size_edit(self):
+        self.load()
+        edited = self.CSV.replace('1979', '1986')
+        self.assertEqual(len(edited), len(self.CSV))
+        self.write(edited, mtime_ns=3_000_000_000_000)
+        movies, parsed = self.load()
+        self.assertTrue(parsed)
+        self.assertEqual(movies[0], {'title': 'Alien', 'genre': 'Horror', 'year': 1986})
+
+    def test_rebuilds_corrupt_snapshot(self):
+        movies, _ = self.load()
+        with open(catalog.snapshot_path(self.path), 'wb') as fh:
+            fh.write(b'junk')
+        self.assertEqual(self.load(), (movies, True))
+        self.assertEqual(self.load(), (movies, False))
+
+    def test_empty_csv(self):
+        for text in ('', 'title,genre,year\n'):
+            with self.subTest(text=text):
+                self.write(text, mtime_ns=4_000_000_000_000 + len(text))
+                self.assertEqual(self.load(), ([], True))
+                self.assertEqual(self.load(), ([], False))
+                cat = catalog.load_cached(self.path, self.parse)
+                self.assertEqual(cat.recommend(['Horror'], {}), [])
+                self.assertIsNone(cat.find('Alien'))
+
+
+class ReadMoviesCsvTest(unittest.TestCase):
+    def test_skips_invalid_rows(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'movies.csv')
+            with open(path, 'w', encoding='utf-8') as fh:
+                fh.write('title,genre,year\nA,Action,1999\nB,Drama,40000\nC,Drama,abc\n,Drama,2000\nD,Comedy,-40000\n')
+            movies = main.read_movies_csv(path)
+        self.assertEqual(movies, [{'title': 'A', 'genre': 'Action', 'year': 1999}])
+
+
+if __name__ == '__main__':
+    unittest.main()
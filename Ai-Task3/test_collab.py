@@ -0,0 +1,164 @@
+# Checks the item-item similarity index and the blended ranking against
+# brute-force versions.
+# Run with:  python -m unittest  (from this folder)
+
+import math
+import os
+import random
+import tempfile
+import unittest
+
+import catalog
+import collab
+import main
+from movie_index import MovieIndex, content_score, year_ranges
+from test_movie_index import GENRES
+
+
+def random_ratings(rng, users, titles, per_user):
+    ratings = {}
+    for u in range(users):
+        for t in rng.sample(range(titles), rng.randint(0, min(per_user, titles))):
+            ratings[(f'u{u}', f'T{t}')] = float(rng.randint(1, 5))
+    return ratings
+
+
+def brute_similarity(ratings, min_common, shrink):
+    """{(a, b): adjusted-cosine similarity} for every title pair, both ways."""
+    by_user = {}
+    for (user, title), r in ratings.items():
+        by_user.setdefault(user, {})[title] = r
+    centred = {}
+    for user, items in by_user.items():
+        mean = sum(items.values()) / len(items)
+        for title, r in items.items():
+            centred.setdefault(title, {})[user] = r - mean
+    norm = {t: math.sqrt(sum(v * v for v in users.values())) for t, users in centred.items()}
+
+    sims = {}
+    for a in centred:
+        for b in centred:
+            if a == b:
+                continue
+            common = set(centred[a]) & set(centred[b])
+            if len(common) < min_common or not norm[a] or not norm[b]:
+                continue
+            dot = sum(centred[a][u] * centred[b][u] for u in common)
+            sim = dot / (norm[a] * norm[b]) * len(common) / (len(common) + shrink)
+            if sim > 0:
+                sims[(a, b)] = sim
+    return sims
+
+
+def brute_blend(movies, prefs, ratings, collab_scores):
+    """Full scan with COLLAB_WEIGHT * collaborative score added (unique titles)."""
+    ranges = year_ranges([m['year'] for m in movies if ratings.get(m['title'], 0) >= 4 and m['year']])
+    scored = []
+    for m in movies:
+        s = content_score(m, prefs, ranges)
+        if m['title'] in collab_scores:
+            s = round(s + main.COLLAB_WEIGHT * collab_scores[m['title']], 2)
+        if s > 0 or not prefs:
+            scored.append((s, m))
+    scored.sort(key=lambda x: (x[0], x[1]['year'], x[1]['title']), reverse=True)
+    return scored
+
+
+@unittest.skipUnless(collab.available(), 'numpy is not installed')
+class SimilarityTest(unittest.TestCase):
+    def test_matches_brute_force(self):
+        rng = random.Random(24)
+        for _ in range(30):
+            ratings = random_ratings(rng, rng.randint(1, 25), rng.randint(2, 15), 8)
+            titles, offsets, neighbours, sims = collab.build_similarity(ratings, k=100, min_common=2, shrink=10)
+            expected = brute_similarity(ratings, min_common=2, shrink=10)
+            got = {}
+            for i, a in enumerate(titles):
+                row = sims[offsets[i]:offsets[i + 1]].tolist()
+                self.assertEqual(row, sorted(row, reverse=True))
+                for j, s in zip(neighbours[offsets[i]:offsets[i + 1]].tolist(), row):
+                    got[(a, titles[j])] = s
+            self.assertEqual(set(got), set(expected))
+            for pair, s in expected.items():
+                self.assertAlmostEqual(got[pair], s, places=5)
+
+    def test_keeps_top_k(self):
+        rng = random.Random(25)
+        ratings = random_ratings(rng, 40, 20, 12)
+        expected = brute_similarity(ratings, min_common=2, shrink=10)
+        titles, offsets, neighbours, sims = collab.build_similarity(ratings, k=3, min_common=2, shrink=10)
+        for i, a in enumerate(titles):
+            row = sorted((s for (x, _), s in expected.items() if x == a), reverse=True)
+            kept = sims[offsets[i]:offsets[i + 1]].tolist()
+            self.assertEqual(len(kept), min(3, len(row)))
+            for got, want in zip(kept, row):
+                self.assertAlmostEqual(got, want, places=5)
+
+    def test_scores_after_save_and_load(self):
+        rng = random.Random(26)
+        ratings = random_ratings(rng, 30, 15, 10)
+        built = collab.build_similarity(ratings, k=5)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'similarity.npz')
+            collab.save_similarity(path, *built)
+            index = collab.SimilarityIndex.load(path)
+        titles, offsets, neighbours, sims = built
+        self.assertEqual(index.titles, titles)
+
+        mine = {'T0': 5, 'T3': 1, 'T7': 4, 'Unknown': 2}
+        rated = {t: v for t, v in mine.items() if t in titles}
+        mean = sum(rated.values()) / len(rated)
+        total, weight = {}, {}
+        for t, v in rated.items():
+            for other, s in index.neighbours_of(t):
+                total[other] = total.get(other, 0.0) + s * (v - mean)
+                weight[other] = weight.get(other, 0.0) + s
+        expected = {t: total[t] / weight[t] for t in total if weight[t] > 0}
+        got = index.scores(mine)
+        self.assertEqual(set(got), set(expected))
+        for t, s in expected.items():
+            self.assertAlmostEqual(got[t], s, places=6)
+
+
+class RatingsStoreTest(unittest.TestCase):
+    def test_last_rating_wins(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = collab.RatingsStore(os.path.join(tmp, 'ratings.csv'))
+            self.assertEqual(store.load(), {})
+            store.add('u1', 'A', 3)
+            store.add('u1', 'A', 5)
+            store.add('u2', 'A, the sequel', 4)
+            self.assertEqual(store.load(), {('u1', 'A'): 5.0, ('u2', 'A, the sequel'): 4.0})
+
+
+class BlendTest(unittest.TestCase):
+    def test_matches_brute_force(self):
+        rng = random.Random(27)
+        for _ in range(200):
+            n = rng.randint(1, 40)
+            movies = [{
+                'title': f'Movie {i}',
+                'genre': rng.choice(GENRES),
+                'year': rng.randint(1980, 2020),
+            } for i in range(n)]
+            indexes = [MovieIndex(movies)]
+            if catalog.available():
+                indexes.append(catalog.Catalog.from_movies(movies))
+            prefs = rng.sample(GENRES, rng.randint(0, 2))
+            ratings = {m['title']: rng.randint(1, 5) for m in rng.sample(movies, rng.randint(0, min(4, n)))}
+            collab_scores = {
+                m['title']: round(rng.uniform(-4, 4), 2)
+                for m in rng.sample(movies, rng.randint(1, min(6, n)))
+                if m['title'] not in ratings
+            }
+            if not collab_scores:
+                continue
+            expected = brute_blend(movies, prefs, ratings, collab_scores)
+            for index in indexes:
+                self.assertEqual(main.blend(index, prefs, ratings, None, collab_scores), expected)
+                for limit in (1, 3, n):
+                    self.assertEqual(main.blend(index, prefs, ratings, limit, collab_scores), expected[:limit])
+
+
+if __name__ == '__main__':
+    unittest.main()
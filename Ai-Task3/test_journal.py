@@ -0,0 +1,133 @@
+# Checks the append-only history journal: replay, torn writes, fsync batching
+# and compaction.
+# Run with:  python -m unittest  (from this folder)
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import journal
+from journal import HistoryJournal, read_history
+
+
+class HistoryJournalTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'history.txt')
+
+    def open_journal(self, **kwargs):
+        j = HistoryJournal(self.path, **kwargs)
+        self.addCleanup(j.close)
+        j.load()
+        return j
+
+    def read(self):
+        with open(self.path, encoding='utf-8') as fh:
+            return fh.read()
+
+    def write(self, text):
+        with open(self.path, 'w', encoding='utf-8') as fh:
+            fh.write(text)
+
+    def test_replays_after_reopen(self):
+        j = self.open_journal()
+        j.set_prefs(['Action', 'Drama'])
+        j.rate('Alien', 5)
+        j.rate('Up, the movie', 3)
+        j.close()
+        self.assertEqual(self.open_journal().load(), (['Action', 'Drama'], {'Alien': 5, 'Up, the movie': 3}))
+
+    def test_last_writer_wins(self):
+        j = self.open_journal()
+        j.rate('Alien', 2)
+        j.set_prefs(['Action'])
+        j.rate('Up', 4)
+        j.rate('Alien', 5)
+        j.set_prefs(['Drama'])
+        j.close()
+        self.assertEqual(read_history(self.path), (['Drama'], {'Alien': 5, 'Up': 4}, 5))
+
+    def test_ignores_torn_last_line(self):
+        self.write('PREF:Action\nRATING:Alien|5\nRATING:Alien|')
+        self.assertEqual(read_history(self.path), (['Action'], {'Alien': 5}, 2))
+
+    def test_append_drops_torn_last_line(self):
+        self.write('RATING:Alien|5\nRATING:Up|4\nRATING:Al')
+        j = self.open_journal()
+        self.assertEqual(j.load(), ([], {'Alien': 5, 'Up': 4}))
+        j.rate('Heat', 3)
+        j.close()
+        self.assertEqual(self.read(), 'RATING:Alien|5\nRATING:Up|4\nRATING:Heat|3\n')
+
+    def test_append_to_file_without_newlines(self):
+        self.write('RATING:Al')
+        j = self.open_journal()
+        j.rate('Heat', 3)
+        j.close()
+        self.assertEqual(self.read(), 'RATING:Heat|3\n')
+
+    def test_corrupt_lines_are_skipped_or_zeroed(self):
+        self.write('garbage\nRATING:no separator\nRATING:Alien|five\nPREF:Action\n\n')
+        self.assertEqual(read_history(self.path), (['Action'], {'Alien': 0}, 4))
+
+    def test_fsync_batched_by_count(self):
+        with mock.patch.object(journal.os, 'fsync') as fsync:
+            j = self.open_journal(sync_every=4, sync_interval=3600)
+            for n in range(10):
+                j.rate(f'T{n}', 3)
+            self.assertEqual(fsync.call_count, 2)
+            j.close()
+            # close syncs the rest
+            self.assertEqual(fsync.call_count, 3)
+            j.close()
+            self.assertEqual(fsync.call_count, 3)
+
+    def test_fsync_batched_by_time(self):
+        clock = [100.0]
+        with mock.patch.object(journal.os, 'fsync') as fsync, \
+                mock.patch.object(journal.time, 'monotonic', side_effect=lambda: clock[0]):
+            j = self.open_journal(sync_every=1000, sync_interval=1.0)
+            j.rate('A', 1)
+            j.rate('B', 2)
+            self.assertEqual(fsync.call_count, 0)
+            clock[0] += 1.5
+            j.rate('C', 3)
+            self.assertEqual(fsync.call_count, 1)
+            j.rate('D', 4)
+            self.assertEqual(fsync.call_count, 1)
+
+    def test_compaction_keeps_exactly_the_live_records(self):
+        j = self.open_journal(compact_min=10)
+        j.set_prefs(['Action'])
+        for n in range(30):
+            j.rate(f'T{n % 3}', n % 5 + 1)
+        j.set_prefs(['Drama', 'Comedy'])
+        expected = (['Drama', 'Comedy'], {'T0': 3, 'T1': 4, 'T2': 5})
+        self.assertEqual((j.prefs, j.ratings), expected)
+        j.close()
+
+        lines = self.read().splitlines()
+        self.assertLessEqual(len(lines), 10)
+        self.assertEqual(read_history(self.path)[:2], expected)
+
+        j.compact()
+        self.assertEqual(sorted(self.read().splitlines()), ['PREF:Drama,Comedy', 'RATING:T0|3', 'RATING:T1|4', 'RATING:T2|5'])
+        self.assertEqual(j.records, 4)
+        # appends after a compaction go to the new file
+        j.rate('T3', 2)
+        j.close()
+        self.assertEqual(self.open_journal().load(), (['Drama', 'Comedy'], {'T0': 3, 'T1': 4, 'T2': 5, 'T3': 2}))
+
+    def test_compaction_keeps_file_mode(self):
+        self.write('')
+        os.chmod(self.path, 0o640)
+        j = self.open_journal()
+        j.rate('Alien', 5)
+        j.compact()
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o640)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+# Checks MovieIndex.recommend against the original full-scan recommender.
+# Run with:  python -m unittest  (from this folder)
+
+import random
+import unittest
+
+from movie_index import MovieIndex, year_ranges
+
+GENRES = ['Action', 'Drama', 'Comedy', 'Sci-Fi', 'Horror']
+
+
+def full_scan(movies, prefs, ratings):
+    """The recommender before indexing: score every movie, then sort."""
+    title_to_year = {m['title']: m['year'] for m in movies}
+    high_years = [title_to_year.get(t) for t, r in ratings.items() if r >= 4 and title_to_year.get(t)]
+
+    scored = []
+    for m in movies:
+        s = 0
+        if prefs and m['genre'] in prefs:
+            s += 2
+        for hy in high_years:
+            if abs(m['year'] - hy) <= 5:
+                s += 1
+                break
+        if s > 0 or not prefs:
+            scored.append((s, m))
+
+    scored.sort(key=lambda x: (x[0], x[1]['year'], x[1]['title']), reverse=True)
+    return scored
+
+
+def random_catalog(rng, n):
+    """Movies with repeated titles and years (including 0), like a messy CSV."""
+    return [{
+        'title': f'Movie {rng.randrange(n)}',
+        'genre': rng.choice(GENRES),
+        'year': rng.choice([0, rng.randint(1950, 2024)]),
+    } for _ in range(n)]
+
+
+def random_query(rng, movies):
+    prefs = rng.sample(GENRES + ['Western'], rng.randint(0, 3))
+    ratings = {}
+    for _ in range(rng.randint(0, 6)):
+        title = rng.choice(movies)['title'] if movies and rng.random() < 0.8 else 'Unknown'
+        ratings[title] = rng.randint(1, 5)
+    return prefs, ratings
+
+
+class YearRangesTest(unittest.TestCase):
+    def test_merges_overlapping_windows(self):
+        self.assertEqual(year_ranges([2000, 2008, 2030]), [[1995, 2013], [2025, 2035]])
+        self.assertEqual(year_ranges([]), [])
+
+
+class MovieIndexTest(unittest.TestCase):
+    def test_matches_full_scan(self):
+        rng = random.Random(20)
+        for _ in range(300):
+            movies = random_catalog(rng, rng.randint(0, 60))
+            index = MovieIndex(movies)
+            prefs, ratings = random_query(rng, movies)
+            expected = full_scan(movies, prefs, ratings)
+            self.assertEqual(index.recommend(prefs, ratings), expected)
+            for limit in (0, 1, 5, len(movies) + 3):
+                self.assertEqual(index.recommend(prefs, ratings, limit), expected[:limit])
+
+    def test_find_movie_returns_last_with_title(self):
+        movies = [
+            {'title': 'A', 'genre': 'Action', 'year': 1990},
+            {'title': 'A', 'genre': 'Drama', 'year': 2000},
+        ]
+        index = MovieIndex(movies)
+        self.assertIs(index.find_movie('A'), movies[1])
+        self.assertIsNone(index.find_movie('B'))
+
+
+if __name__ == '__main__':
+    unittest.main()
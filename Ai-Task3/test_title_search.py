@@ -0,0 +1,112 @@
+# Checks the trigram title index against a linear scan, with and without numpy.
+# Run with:  python -m unittest  (from this folder)
+
+import random
+import unittest
+from unittest import mock
+
+import title_search
+from title_search import TitleIndex, edit_distance
+
+WORDS = ['the', 'matrix', 'star', 'wars', 'amélie', 'up', 'it', 'alien', 'aliens', 'x', 'café', '2001']
+
+
+def random_titles(rng, n):
+    return [' '.join(rng.choices(WORDS, k=rng.randint(1, 4))).title() for _ in range(n)]
+
+
+def random_query(rng, titles):
+    if titles and rng.random() < 0.7:
+        # a slice of an existing title, so most queries have matches
+        t = rng.choice(titles).lower()
+        start = rng.randrange(len(t))
+        return t[start:start + rng.randint(1, 8)]
+    return ''.join(rng.choices('aeilmnrstux é', k=rng.randint(1, 5)))
+
+
+def osa_distance(a, b):
+    """Optimal string alignment distance, straight from the definition."""
+    d = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+    for i in range(len(a) + 1):
+        d[i][0] = i
+    for j in range(len(b) + 1):
+        d[0][j] = j
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[len(a)][len(b)]
+
+
+class TitleSearchMixin:
+    def test_search_matches_linear_scan(self):
+        rng = random.Random(25)
+        for _ in range(100):
+            titles = random_titles(rng, rng.randint(0, 50))
+            index = TitleIndex(titles)
+            lower = [t.lower() for t in titles]
+            for _ in range(10):
+                q = random_query(rng, titles)
+                self.assertEqual(index.search(q), [i for i, t in enumerate(lower) if q in t], q)
+                self.assertEqual(index.search(q, prefix=True), [i for i, t in enumerate(lower) if t.startswith(q)], q)
+
+    def test_search_ignores_case(self):
+        index = TitleIndex(['The Matrix', 'Amélie', 'Matrix Reloaded'])
+        self.assertEqual(index.search('MATRIX'), [0, 2])
+        self.assertEqual(index.search('ÉLIE'), [1])
+        self.assertEqual(index.search('matrix', prefix=True), [2])
+        self.assertEqual(index.search(''), [])
+
+    def test_single_byte_queries_use_the_index(self):
+        titles = ['The Matrix', 'Amélie', 'Up', 'X', '', 'Alien 2', 'up']
+        lower = [t.lower() for t in titles]
+        queries = {c for t in lower for c in t} | {'z', 'U'}
+        for q in sorted(queries):
+            index = TitleIndex(titles)
+            if len(q.encode('utf-8')) == 1:
+                # answered from one posting list, without reading any title
+                index.lower = None
+            self.assertEqual(index.search(q), [i for i, t in enumerate(lower) if q.lower() in t], q)
+            self.assertEqual(index.search(q, prefix=True), [i for i, t in enumerate(lower) if t.startswith(q.lower())], q)
+
+    def test_fuzzy_finds_typos(self):
+        index = TitleIndex(['The Matrix', 'Star Wars', 'Alien', 'Aliens', 'Up'])
+        self.assertEqual(index.fuzzy('matirx')[0], (1, 0))
+        self.assertEqual(index.fuzzy('star wasr')[0], (1, 1))
+        self.assertEqual([i for _, i in index.fuzzy('alienz')][:2], [2, 3])
+        self.assertEqual(index.fuzzy('zzzzzz'), [])
+
+
+class TitleIndexTest(TitleSearchMixin, unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        if title_search.np is None:
+            raise unittest.SkipTest('numpy is not installed')
+
+
+class TitleIndexWithoutNumpyTest(TitleSearchMixin, unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(title_search, 'np', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class EditDistanceTest(unittest.TestCase):
+    def test_matches_definition(self):
+        rng = random.Random(26)
+        for _ in range(2000):
+            a = ''.join(rng.choices('abcé', k=rng.randint(0, 7)))
+            b = ''.join(rng.choices('abcé', k=rng.randint(0, 7)))
+            d = osa_distance(a, b)
+            self.assertEqual(edit_distance(a, b), d, (a, b))
+            for limit in range(4):
+                got = edit_distance(a, b, limit)
+                if d <= limit:
+                    self.assertEqual(got, d, (a, b, limit))
+                else:
+                    self.assertGreater(got, limit, (a, b, limit))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,234 @@
+# Trigram index for movie title search
+# - inverted index: byte/bigram/trigram of the lowercased UTF-8 title, plus
+#   its first byte, -> sorted movie ids (CSR arrays built with NumPy, or dict
+#   of lists without it)
+# - substring / prefix queries intersect the posting lists of the query's
+#   trigrams, then confirm on the candidates only; one-byte queries read a
+#   single posting list, which is already the answer
+# - fuzzy queries rank titles by shared trigrams and re-rank the best
+#   candidates by edit distance. Their cost grows with the posting lists of
+#   the query's trigrams (capped at COMMON_GRAM_SHARE of the titles), so on
+#   a million titles expect a few ms, up to ~20 ms for queries made of
+#   common fragments; titles made only of such fragments are not found
+
+try:
+    import numpy as np
+except ImportError:  # optional; a dict of posting lists is used instead
+    np = None
+
+FUZZY_CANDIDATES = 100
+# trigrams found in more titles than this share are skipped when ranking
+# fuzzy candidates; they say little and cost the most
+COMMON_GRAM_SHARE = 0.05
+
+
+# mark bigram, single-byte and first-byte codes so they never collide with
+# trigram codes (< 2 ** 24) or each other
+BIGRAM_FLAG = 1 << 24
+BYTE_FLAG = 1 << 25
+FIRST_BYTE_FLAG = 1 << 26
+
+
+def grams(data):
+    """Trigram codes of a bytes object (3 bytes packed into one int)."""
+    return {data[k] << 16 | data[k + 1] << 8 | data[k + 2] for k in range(len(data) - 2)}
+
+
+def bigrams(data):
+    return {BIGRAM_FLAG | data[k] << 8 | data[k + 1] for k in range(len(data) - 1)}
+
+
+def single_bytes(data):
+    codes = {BYTE_FLAG | byte for byte in data}
+    if data:
+        codes.add(FIRST_BYTE_FLAG | data[0])
+    return codes
+
+
+def edit_distance(a, b, limit=None):
+    """Edit distance counting a swap of adjacent characters as one edit.
+
+    (Optimal string alignment; "matirx" is 1 away from "matrix".) Stops
+    early once the result must exceed `limit`.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    before = None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            d = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if before is not None and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                d = min(d, before[j - 2] + 1)
+            current.append(d)
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+def window_distance(query, title, limit=None, cache=None):
+    """Edit distance from `query` to the closest run of as many words in `title`.
+
+    `cache` (a dict) remembers distances to windows shared between titles.
+    """
+    words = title.split()
+    size = max(1, len(query.split()))
+    if len(words) <= size:
+        windows = [title]
+    else:
+        windows = [' '.join(words[k:k + size]) for k in range(len(words) - size + 1)]
+    best = None
+    for w in windows:
+        if cache is not None and w in cache:
+            d = cache[w]
+        else:
+            d = edit_distance(query, w, limit)
+            if cache is not None:
+                cache[w] = d
+        if best is None or d < best:
+            best = d
+    return best
+
+
+class TitleIndex:
+    def __init__(self, titles):
+        self.lower = [t.lower() for t in titles]
+        if np is not None:
+            self._build_arrays()
+        else:
+            self.postings = {}
+            self.lengths = []
+            for i, t in enumerate(self.lower):
+                data = t.encode('utf-8')
+                self.lengths.append(len(data))
+                for g in grams(data) | bigrams(data) | single_bytes(data):
+                    self.postings.setdefault(g, []).append(i)
+
+    def _build_arrays(self):
+        encoded = [t.encode('utf-8') for t in self.lower]
+        n = max(len(encoded), 1)
+        lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+        buf = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.int64)
+        owner = np.repeat(np.arange(len(encoded), dtype=np.int64), lengths)
+
+        # (gram, title) keys for every byte, bigram and trigram that stays
+        # inside one title, and for each title's first byte; the flags keep
+        # them apart in one index
+        parts = [(BYTE_FLAG | buf) * n + owner]
+        nonempty = np.flatnonzero(lengths)
+        if len(nonempty):
+            first = (np.cumsum(lengths) - lengths)[nonempty]
+            parts.append((FIRST_BYTE_FLAG | buf[first]) * n + nonempty)
+        if len(buf) >= 2:
+            valid = owner[:-1] == owner[1:]
+            codes = BIGRAM_FLAG | buf[:-1] << 8 | buf[1:]
+            parts.append(codes[valid] * n + owner[:-1][valid])
+        if len(buf) >= 3:
+            valid = owner[:-2] == owner[2:]
+            codes = buf[:-2] << 16 | buf[1:-1] << 8 | buf[2:]
+            parts.append(codes[valid] * n + owner[:-2][valid])
+        keys = np.concatenate(parts)
+        keys.sort()
+        if len(keys):
+            keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+
+        gram_of_key = keys // n
+        first = np.concatenate(([True], gram_of_key[1:] != gram_of_key[:-1])) if len(keys) else np.zeros(0, dtype=bool)
+        starts = np.flatnonzero(first)
+        self.grams = gram_of_key[starts]
+        self.offsets = np.append(starts, len(keys)).astype(np.int64)
+        self.ids = (keys % n).astype(np.int32)
+        self.lengths = lengths
+
+    def posting(self, gram):
+        if np is None:
+            return self.postings.get(gram, [])
+        k = np.searchsorted(self.grams, gram)
+        if k == len(self.grams) or self.grams[k] != gram:
+            return self.ids[:0]
+        return self.ids[self.offsets[k]:self.offsets[k + 1]]
+
+    def search(self, query, prefix=False):
+        """Ids (ascending) of titles containing `query` (or starting with it)."""
+        q = query.lower()
+        if not q:
+            return []
+        if prefix:
+            match = lambda t: t.startswith(q)
+        else:
+            match = lambda t: q in t
+        data = q.encode('utf-8')
+        qgrams = grams(data) or bigrams(data)
+        if not qgrams:
+            # a single byte: its posting list is the answer
+            ids = self.posting((FIRST_BYTE_FLAG if prefix else BYTE_FLAG) | data[0])
+            return list(ids) if np is None else ids.tolist()
+
+        lists = sorted((self.posting(g) for g in qgrams), key=len)
+        if np is None:
+            candidates = set(lists[0])
+            for other in lists[1:]:
+                candidates.intersection_update(other)
+            candidates = sorted(candidates)
+        else:
+            candidates = lists[0]
+            for other in lists[1:]:
+                if not len(candidates):
+                    break
+                # both sorted: binary-search the (smaller) candidates in `other`
+                pos = np.searchsorted(other, candidates)
+                pos[pos == len(other)] = 0
+                candidates = candidates[other[pos] == candidates]
+            candidates = candidates.tolist()
+        if len(data) <= 3 and not prefix:
+            # the query is a single indexed gram: its posting list is exact
+            return list(candidates)
+        return [i for i in candidates if match(self.lower[i])]
+
+    def fuzzy(self, query, limit=5, max_distance=None):
+        """Closest titles to `query` as (distance, id), for typo-tolerant lookup."""
+        q = query.lower().strip()
+        if not q:
+            return []
+        if max_distance is None:
+            max_distance = max(1, len(q) // 4)
+
+        cap = max(FUZZY_CANDIDATES, int(len(self.lower) * COMMON_GRAM_SHARE))
+        data = q.encode('utf-8')
+        padded = f' {q} '.encode('utf-8')
+        lists = [self.posting(g) for g in grams(data) | grams(padded)]
+        lists = [ids for ids in lists if 0 < len(ids) <= cap]
+        if not lists:
+            return []
+        # shared grams relative to title length, so short close titles beat
+        # long ones that merely share common fragments
+        if np is not None:
+            ids = np.sort(np.concatenate(lists))
+            starts = np.flatnonzero(np.concatenate(([True], ids[1:] != ids[:-1])))
+            counts = np.diff(np.append(starts, len(ids)))
+            ids = ids[starts]
+            score = counts / (self.lengths[ids] + len(data))
+            if len(ids) > FUZZY_CANDIDATES:
+                top = np.argpartition(-score, FUZZY_CANDIDATES - 1)[:FUZZY_CANDIDATES]
+                ids, score = ids[top], score[top]
+            best = [i for _, i in sorted(zip((-score).tolist(), ids.tolist()))]
+        else:
+            counts = {}
+            for ids in lists:
+                for i in ids:
+                    counts[i] = counts.get(i, 0) + 1
+            score = lambda i: counts[i] / (self.lengths[i] + len(data))
+            best = sorted(counts, key=lambda i: (-score(i), i))[:FUZZY_CANDIDATES]
+
+        ranked = []
+        cache = {}
+        for i in best:
+            d = window_distance(q, self.lower[i], max_distance, cache)
+            if d <= max_distance:
+                ranked.append((d, len(self.lower[i]), i))
+        ranked.sort()
+        return [(d, i) for d, _, i in ranked[:limit]]